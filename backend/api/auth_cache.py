@@ -0,0 +1,159 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set
+
+# Bounded in-process cache for bearer token -> identity resolution.
+# Entries never outlive the session's expiresAt, and are additionally capped
+# by a short TTL so sessions revoked by the auth server are picked up quickly.
+# What's cached is the session -> User lookup (and the NearishUser id); the NearishUser and partner
+# rows are still read on every request, since most handlers update them.
+# Each worker has its own cache: main.py broadcasts invalidations over the SSE event bus.
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+
+
+def hash_token(token: str) -> str:
+    # Never keep raw bearer tokens in memory longer than the request needs them
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class AuthCacheEntry:
+    __slots__ = ("user_id", "user_data", "nearish_user_id", "session_expires_at", "cached_until")
+
+    def __init__(self, user_id: str, user_data: dict, session_expires_at: datetime, cached_until: float):
+        self.user_id = user_id
+        # Plain column snapshot of the User row (ORM instances can't be shared across sessions)
+        self.user_data = user_data
+        self.nearish_user_id: Optional[str] = None
+        self.session_expires_at = session_expires_at
+        self.cached_until = cached_until
+
+    def is_valid(self) -> bool:
+        if time.monotonic() >= self.cached_until:
+            return False
+        return datetime.now(timezone.utc) < self.session_expires_at
+
+
+class AuthCache:
+    def __init__(self, max_entries: int = AUTH_CACHE_MAX_ENTRIES, ttl_seconds: float = AUTH_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # token hash -> entry, kept in LRU order (oldest first)
+        self._entries: "OrderedDict[str, AuthCacheEntry]" = OrderedDict()
+        # better-auth user id -> token hashes, so we can invalidate every device of a user
+        self._tokens_by_user: Dict[str, Set[str]] = {}
+        # Sync routes resolve identity from the threadpool, so guard with a real lock
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[AuthCacheEntry]:
+        key = hash_token(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if not entry.is_valid():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, token: str, session_expires_at: datetime, user_id: str, user_data: dict) -> AuthCacheEntry:
+        if session_expires_at.tzinfo is None:
+            session_expires_at = session_expires_at.replace(tzinfo=timezone.utc)
+        key = hash_token(token)
+        entry = AuthCacheEntry(user_id, user_data, session_expires_at, time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._tokens_by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+        return entry
+
+    def get_nearish_user_id(self, user_id: str) -> Optional[str]:
+        with self._lock:
+            for key in self._tokens_by_user.get(user_id, ()):
+                entry = self._entries.get(key)
+                if entry is not None and entry.nearish_user_id:
+                    return entry.nearish_user_id
+        return None
+
+    def set_nearish_user_id(self, user_id: str, nearish_user_id: str):
+        with self._lock:
+            for key in self._tokens_by_user.get(user_id, ()):
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.nearish_user_id = nearish_user_id
+
+    # --- Invalidation hooks ---
+
+    def invalidate_token(self, token: str):
+        self.invalidate_token_hash(hash_token(token))
+
+    def invalidate_token_hash(self, key: str):
+        # For invalidations from other workers, which only ever see the hash
+        with self._lock:
+            if self._remove(key):
+                self.invalidations += 1
+
+    def invalidate_user(self, user_id: str):
+        with self._lock:
+            for key in list(self._tokens_by_user.get(user_id, ())):
+                if self._remove(key):
+                    self.invalidations += 1
+
+    def invalidate_nearish_user(self, nearish_user_id: str):
+        with self._lock:
+            keys = [k for k, e in self._entries.items() if e.nearish_user_id == nearish_user_id]
+            for key in keys:
+                if self._remove(key):
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "ttlSeconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key: str) -> bool:
+        # Caller must hold the lock
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        keys = self._tokens_by_user.get(entry.user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tokens_by_user[entry.user_id]
+        return True
+
+
+auth_cache = AuthCache()
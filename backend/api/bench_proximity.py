@@ -0,0 +1,75 @@
+"""
+Compares the scalar haversine from main.py with the vectorized proximity engine on a synthetic
+pair of location series (two people wandering around a city, meeting now and then).
+
+Usage:
+    python3 bench_proximity.py --points 1000000
+
+Doesn't import main.py (that connects to the database), so the scalar function is copied here.
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+from proximity import EARTH_RADIUS_MILES, WITH_YOU_MILES, haversine_many, together_stats
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    # Same as main.haversine
+    R = EARTH_RADIUS_MILES
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
+    c = 2*math.atan2(math.sqrt(a), math.sqrt(1-a))
+    return R * c
+
+
+def random_walk(rng, n, lat0, lon0, step_deg):
+    lats = lat0 + np.cumsum(rng.normal(0, step_deg, n))
+    lons = lon0 + np.cumsum(rng.normal(0, step_deg, n))
+    return lats, lons
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--step-seconds", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    lat_a, lon_a = random_walk(rng, args.points, 40.75, -73.98, 0.0005)
+    lat_b, lon_b = random_walk(rng, args.points, 40.75, -73.97, 0.0005)
+    # Drop some samples, like phones that stop reporting
+    lat_b[rng.random(args.points) < 0.05] = np.nan
+
+    def scalar():
+        distances = []
+        for a1, o1, a2, o2 in zip(lat_a.tolist(), lon_a.tolist(), lat_b.tolist(), lon_b.tolist()):
+            distances.append(float("nan") if a2 != a2 else haversine(a1, o1, a2, o2))
+        return sum(1 for d in distances if d < WITH_YOU_MILES)
+
+    def vectorized():
+        return int(np.count_nonzero(haversine_many(lat_a, lon_a, lat_b, lon_b) < WITH_YOU_MILES))
+
+    scalar_together, scalar_seconds = timed(scalar)
+    vector_together, vector_seconds = timed(vectorized)
+    distances = haversine_many(lat_a, lon_a, lat_b, lon_b)
+    stats, stats_seconds = timed(lambda: together_stats(distances, args.step_seconds))
+
+    print(f"{args.points:,} point pairs")
+    print(f"  scalar haversine:     {scalar_seconds * 1000:9.1f} ms  ({args.points / scalar_seconds / 1e6:.2f} M pairs/s)")
+    print(f"  vectorized haversine: {vector_seconds * 1000:9.1f} ms  ({args.points / vector_seconds / 1e6:.2f} M pairs/s)"
+          f"  speedup x{scalar_seconds / vector_seconds:.0f}")
+    print(f"  together_stats:       {stats_seconds * 1000:9.1f} ms")
+    print(f"  samples together: scalar={scalar_together} vectorized={vector_together}")
+    print(f"  stats: {stats}")
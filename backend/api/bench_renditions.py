@@ -0,0 +1,75 @@
+"""
+Measures thumbnail/preview rendering throughput of the rendition pipeline, per worker process.
+
+Runs render_renditions() directly (no server, no bucket) over a set of images, once per
+worker count, so the numbers show how far the process pool scales on this machine.
+
+Usage:
+    python3 bench_renditions.py photo1.jpg photo2.jpg ... --workers 1 2 4 --repeat 20
+    python3 bench_renditions.py --synthetic 4032x3024 --workers 1 2 4
+
+With no images, a synthetic 12 MP photo (a typical phone camera) is generated in memory.
+"""
+import argparse
+import io
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from image_renditions import render_renditions, RENDITION_FORMAT
+
+
+def synthetic_image(width, height):
+    # Noise compresses like a real photo; a flat colour would make encoding unrealistically cheap
+    image = Image.frombytes("RGB", (width, height), os.urandom(width * height * 3))
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+def render_timed(data):
+    started = time.perf_counter()
+    rendered = render_renditions(data)
+    return time.perf_counter() - started, sum(len(body) for body in rendered.values())
+
+
+def run(images, workers, repeat):
+    jobs = images * repeat
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Warm the pool so process start-up and the Pillow import aren't counted
+        list(pool.map(render_timed, images[:1] * workers))
+        started = time.perf_counter()
+        results = list(pool.map(render_timed, jobs))
+        elapsed = time.perf_counter() - started
+
+    per_image_ms = [seconds * 1000 for seconds, _ in results]
+    throughput = len(jobs) / elapsed
+    print(f"workers={workers}: {len(jobs)} images in {elapsed:.2f}s  "
+          f"throughput={throughput:.1f} img/s  per-core={throughput / workers:.1f} img/s  "
+          f"render ms p50={statistics.median(per_image_ms):.1f} max={max(per_image_ms):.1f}  "
+          f"output={sum(size for _, size in results) / len(results) / 1024:.0f} KiB/img")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*")
+    parser.add_argument("--synthetic", default="4032x3024")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.images:
+        images = []
+        for path in args.images:
+            with open(path, "rb") as f:
+                images.append(f.read())
+    else:
+        width, height = (int(v) for v in args.synthetic.lower().split("x"))
+        images = [synthetic_image(width, height)]
+
+    print(f"Rendering {len(images)} source image(s) x {args.repeat} as {RENDITION_FORMAT}")
+    for workers in args.workers:
+        run(images, workers, args.repeat)
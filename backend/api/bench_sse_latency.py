@@ -0,0 +1,120 @@
+"""
+Measures SSE delivery latency on /api/events while the async write endpoints are under load.
+
+Needs two accounts that are connected as partners:
+  - LISTENER keeps an /api/events stream open and records when each nudge arrives.
+  - SENDER sends a nudge every --probe-interval seconds (the latency probe).
+  - Load workers hammer POST /api/status as the LISTENER (those events go to the
+    sender, so they don't pollute the listener's stream).
+
+Usage:
+    python3 bench_sse_latency.py --base-url http://localhost:8000 \
+        --listener-token <token A> --sender-token <token B> --concurrency 50 --duration 30
+
+Run once against a build where the handlers use the sync Session and once against the
+async engine to compare: a blocked event loop shows up directly as nudge latency.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def listen(client, base_url, token, received, ready, stop):
+    headers = {"Authorization": f"Bearer {token}"}
+    async with client.stream("GET", f"{base_url}/api/events", headers=headers, timeout=None) as response:
+        ready.set()
+        event_type = None
+        async for line in response.aiter_lines():
+            if stop.is_set():
+                break
+            if line.startswith("event:"):
+                event_type = line.split(":", 1)[1].strip()
+            elif line.startswith("data:") and event_type == "nudge":
+                received.append(time.perf_counter())
+                event_type = None
+
+
+async def probe(client, base_url, token, sent, stop, interval):
+    headers = {"Authorization": f"Bearer {token}"}
+    while not stop.is_set():
+        sent.append(time.perf_counter())
+        await client.post(f"{base_url}/api/partner/nudge", headers=headers)
+        await asyncio.sleep(interval)
+
+
+async def load_worker(client, base_url, token, stop, counters):
+    headers = {"Authorization": f"Bearer {token}"}
+    i = 0
+    while not stop.is_set():
+        i += 1
+        start = time.perf_counter()
+        try:
+            response = await client.post(f"{base_url}/api/status", headers=headers,
+                                         json={"emoji": "🏋️", "text": f"bench {i}"})
+            if response.status_code == 200:
+                counters["ok"] += 1
+            else:
+                counters["errors"] += 1
+        except httpx.HTTPError:
+            counters["errors"] += 1
+        counters["latencies"].append(time.perf_counter() - start)
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency + 10)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        received, sent = [], []
+        counters = {"ok": 0, "errors": 0, "latencies": []}
+        ready, stop = asyncio.Event(), asyncio.Event()
+
+        listener = asyncio.create_task(listen(client, args.base_url, args.listener_token, received, ready, stop))
+        await asyncio.wait_for(ready.wait(), timeout=10)
+
+        tasks = [asyncio.create_task(probe(client, args.base_url, args.sender_token, sent, stop, args.probe_interval))]
+        for _ in range(args.concurrency):
+            tasks.append(asyncio.create_task(load_worker(client, args.base_url, args.listener_token, stop, counters)))
+
+        await asyncio.sleep(args.duration)
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Give in-flight nudges a moment to arrive
+        await asyncio.sleep(1)
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+
+    # Nudges are delivered in order, so pair them up positionally
+    delivery_ms = [(r - s) * 1000 for s, r in zip(sent, received)]
+    load_ms = [l * 1000 for l in counters["latencies"]]
+
+    print(f"Load: {args.concurrency} workers on POST /api/status for {args.duration}s")
+    print(f"  requests ok={counters['ok']} errors={counters['errors']} "
+          f"throughput={counters['ok'] / args.duration:.1f} req/s")
+    if load_ms:
+        print(f"  request latency ms: p50={percentile(load_ms, 50):.1f} p95={percentile(load_ms, 95):.1f} "
+              f"p99={percentile(load_ms, 99):.1f}")
+    print(f"SSE nudge delivery: sent={len(sent)} received={len(received)}")
+    if delivery_ms:
+        print(f"  delivery latency ms: mean={statistics.mean(delivery_ms):.1f} p50={percentile(delivery_ms, 50):.1f} "
+              f"p95={percentile(delivery_ms, 95):.1f} p99={percentile(delivery_ms, 99):.1f} max={max(delivery_ms):.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--listener-token", required=True)
+    parser.add_argument("--sender-token", required=True)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--probe-interval", type=float, default=0.25)
+    asyncio.run(run(parser.parse_args()))
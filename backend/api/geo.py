@@ -0,0 +1,109 @@
+import math
+from typing import List, Tuple
+
+from proximity import EARTH_RADIUS_MILES
+
+# Geohash cells for indexing memories by place. A cell's hash is a prefix of every hash inside
+# it, so "everything in this cell" is a single index range scan on the geohash column.
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9  # ~5 m cells
+
+# (min_lat, min_lon, max_lat, max_lon)
+Box = Tuple[float, float, float, float]
+
+# Upper bound for a prefix range: sorts after every geohash character (byte order, C collation)
+PREFIX_RANGE_END = "{"
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, value, even = 0, 0, True
+    while len(chars) < precision:
+        # Bits alternate longitude, latitude, starting with longitude
+        rng, coord = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if coord >= mid:
+            value = (value << 1) | 1
+            rng[0] = mid
+        else:
+            value <<= 1
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """(height, width) of a geohash cell in degrees."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def covering_cells(min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+                   max_cells: int = 32) -> List[str]:
+    """
+    Geohash cells that together cover the bounding box, at the finest precision that needs at
+    most max_cells of them. Cells can stick out past the box, so results still need a bounds check.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = math.floor(max_lat / height) - math.floor(min_lat / height) + 1
+        cols = math.floor(max_lon / width) - math.floor(min_lon / width) + 1
+        if rows * cols <= max_cells:
+            break
+
+    cells = set()
+    # Sample one point per cell: start at the box corner and step a cell at a time, clamped to the box
+    lat = min_lat
+    while True:
+        lon = min_lon
+        while True:
+            cells.add(geohash_encode(lat, lon, precision))
+            if lon >= max_lon:
+                break
+            lon = min(lon + width, max_lon)
+        if lat >= max_lat:
+            break
+        lat = min(lat + height, max_lat)
+    return sorted(cells)
+
+
+def split_at_antimeridian(min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[Box]:
+    """
+    Boxes that never cross longitude ±180, for a box given with min_lon > max_lon (it wraps
+    eastward across the antimeridian) or with longitudes outside [-180, 180].
+    """
+    if max_lon - min_lon >= 360:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+    if min_lon > max_lon:
+        max_lon += 360
+    # Shift so min_lon is in [-180, 180)
+    shift = math.floor((min_lon + 180) / 360) * 360
+    min_lon, max_lon = min_lon - shift, max_lon - shift
+    if max_lon <= 180:
+        return [(min_lat, min_lon, max_lat, max_lon)]
+    return [(min_lat, min_lon, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lon - 360)]
+
+
+def radius_boxes(latitude: float, longitude: float, radius_miles: float) -> List[Box]:
+    """
+    Bounding boxes around a circle (two when it crosses the antimeridian); haversine does the exact check.
+    Longitude span is the circle's true widest point, which lies poleward of the centre.
+    """
+    angular = radius_miles / EARTH_RADIUS_MILES
+    dlat = math.degrees(angular)
+    min_lat, max_lat = latitude - dlat, latitude + dlat
+    if min_lat <= -90 or max_lat >= 90:
+        # The circle covers a pole, so every longitude
+        return [(max(-90.0, min_lat), -180.0, min(90.0, max_lat), 180.0)]
+
+    ratio = math.sin(angular) / math.cos(math.radians(latitude))
+    if ratio >= 1:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+    dlon = math.degrees(math.asin(ratio))
+    return split_at_antimeridian(min_lat, longitude - dlon, max_lat, longitude + dlon)
@@ -0,0 +1,93 @@
+import asyncio
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+from s3_client import download_file_from_s3_async, upload_file_to_s3_async
+
+# Downscaled copies of memory photos so the grid doesn't pull full-resolution originals.
+# Decoding and resizing is CPU-bound and holds the GIL, so it runs in a process pool
+# rather than the storage threadpool or the event loop.
+RENDITION_WORKERS = int(os.getenv("RENDITION_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+RENDITION_FORMAT = os.getenv("RENDITION_FORMAT", "WEBP").upper()
+RENDITION_QUALITY = int(os.getenv("RENDITION_QUALITY", "80"))
+
+# name -> longest edge in pixels
+RENDITION_SIZES = {
+    "thumb": int(os.getenv("RENDITION_THUMB_EDGE", "320")),
+    "preview": int(os.getenv("RENDITION_PREVIEW_EDGE", "1280")),
+}
+
+_FORMAT_INFO = {
+    "WEBP": ("webp", "image/webp"),
+    "JPEG": ("jpg", "image/jpeg"),
+}
+
+_render_pool = None
+
+
+def _get_render_pool():
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = ProcessPoolExecutor(max_workers=RENDITION_WORKERS)
+    return _render_pool
+
+
+def rendition_key(object_name: str, name: str, image_format: str = RENDITION_FORMAT) -> str:
+    """`{user}/{uuid}.jpg` -> `{user}/{uuid}_thumb.webp`, next to the original."""
+    base = object_name.rsplit(".", 1)[0]
+    return f"{base}_{name}.{_FORMAT_INFO[image_format][0]}"
+
+
+def render_renditions(data: bytes, sizes: dict = None, image_format: str = RENDITION_FORMAT,
+                      quality: int = RENDITION_QUALITY) -> dict:
+    """Decode once and encode each size, largest first. Runs in a worker process."""
+    sizes = sizes or RENDITION_SIZES
+    with Image.open(io.BytesIO(data)) as original:
+        # Let the JPEG decoder downscale by a power of two while decoding instead of
+        # materializing the full 12 MP frame (no-op for other formats)
+        largest = max(sizes.values())
+        original.draft("RGB", (largest, largest))
+        # Phones store rotation in EXIF; bake it in since the renditions drop metadata
+        image = ImageOps.exif_transpose(original)
+        if image_format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+        results = {}
+        # Each smaller size is resized from the previous one, which is much cheaper than from the original
+        for name, edge in sorted(sizes.items(), key=lambda item: -item[1]):
+            image = image.copy()
+            image.thumbnail((edge, edge), Image.LANCZOS)
+            out = io.BytesIO()
+            if image_format == "WEBP":
+                image.save(out, format="WEBP", quality=quality, method=4)
+            else:
+                image.save(out, format=image_format, quality=quality, optimize=True)
+            results[name] = out.getvalue()
+        return results
+
+
+async def create_renditions(object_name: str) -> dict:
+    """Render and upload every rendition of an uploaded original. Returns name -> object key (empty on failure)."""
+    data = await download_file_from_s3_async(object_name)
+    if data is None:
+        return {}
+
+    try:
+        rendered = await asyncio.get_running_loop().run_in_executor(_get_render_pool(), render_renditions, data)
+    except Exception as e:
+        # Unsupported formats (e.g. HEIC without a decoder) keep serving the original
+        print(f"Error rendering {object_name}: {e}")
+        return {}
+
+    content_type = _FORMAT_INFO[RENDITION_FORMAT][1]
+    keys = {}
+    for name, body in rendered.items():
+        key = await upload_file_to_s3_async(io.BytesIO(body), rendition_key(object_name, name), content_type)
+        if key:
+            keys[name] = key
+    return keys
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+# Optional on-disk cache of LLM responses, keyed by a hash of the model, messages and parameters
+# (including the caller's batch number, so repeated requests for the same prompt stay distinct).
+#   off     - no caching (default)
+#   on      - serve hits, call the API on a miss and store the response
+#   record  - always call the API and store (overwrite) the response
+#   replay  - serve hits only; a miss is an error, so runs are deterministic and never hit the network
+LLM_CACHE_MODES = ("off", "on", "record", "replay")
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "off").lower()
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_cache.sqlite3"))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "64"))
+# Evict down to this fraction of the limit, so we don't evict again on the very next insert
+LLM_CACHE_EVICT_TO = 0.9
+
+
+def cache_key(model: str, messages: list, params: dict) -> str:
+    payload = json.dumps({"model": model, "messages": messages, "params": params},
+                         sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path: str = LLM_CACHE_PATH, mode: str = LLM_CACHE_MODE, max_mb: float = LLM_CACHE_MAX_MB):
+        if mode not in LLM_CACHE_MODES:
+            raise ValueError(f"LLM_CACHE_MODE must be one of {', '.join(LLM_CACHE_MODES)}, got {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        # Used from the LLM loop, read for stats from the API's threadpool
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened lazily, so importing llm_service never touches the disk when the cache is off
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, model TEXT NOT NULL, content TEXT NOT NULL,"
+                " size INTEGER NOT NULL, created_at REAL NOT NULL, last_used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used_at ON responses (last_used_at)")
+            self._bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        if self.mode not in ("on", "replay"):
+            return None
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT content FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            conn.execute("UPDATE responses SET last_used_at = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def put(self, key: str, model: str, content: str):
+        if self.mode not in ("on", "record"):
+            return
+        size = len(content.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            old = conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, content, size, created_at, last_used_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, content, size, now, now)
+            )
+            self._bytes += size - (old[0] if old else 0)
+            self.writes += 1
+            if self._bytes > self.max_bytes:
+                self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        # Least recently used first, until we're back under the target size
+        target = self.max_bytes * LLM_CACHE_EVICT_TO
+        rows = conn.execute("SELECT key, size FROM responses ORDER BY last_used_at").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._bytes <= target:
+                break
+            evicted.append((key,))
+            self._bytes -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                "mode": self.mode,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "maxBytes": self.max_bytes,
+            }
+            if self._conn is not None:
+                stats["bytes"] = self._bytes
+                stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return stats
+
+
+llm_cache = LLMCache()
@@ -1,7 +1,13 @@
 import openai
+import asyncio
 import json
 import os
-from typing import List
+import random
+import threading
+import time
+from typing import List, Tuple
+
+from llm_cache import cache_key, llm_cache
 
 # Load env from sibling directory if not found locally (similar to s3_client)
 from dotenv import load_dotenv
@@ -10,25 +16,251 @@ load_dotenv(env_path)
 
 # You can also set OPENAI_API_KEY in backend/api/.env or export it
 api_key = os.getenv("OPENAI_API_KEY")
-client = openai.OpenAI(api_key=api_key)
 
-def generate_questions(system_prompt: str, existing_questions: List[str] = [], count: int = 10) -> List[str]:
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1"))
+LLM_BACKOFF_MAX_SECONDS = 30
+
+# Worth another attempt: rate limits, timeouts, dropped connections and 5xx
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                    openai.InternalServerError, asyncio.TimeoutError)
+
+
+class LLMError(Exception):
+    pass
+
+
+# Every call, sync or async, runs on one dedicated event loop, so the concurrency cap and the
+# HTTP connection pool are shared by the API's threadpool, background tasks and seed scripts alike.
+_loop = None
+_loop_lock = threading.Lock()
+_client = None
+_semaphore = None
+
+def _get_loop():
+    global _loop, _semaphore
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="llm", daemon=True)
+            thread.start()
+            try:
+                async def make_semaphore():
+                    return asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+                semaphore = asyncio.run_coroutine_threadsafe(make_semaphore(), loop).result()
+            except BaseException:
+                loop.call_soon_threadsafe(loop.stop)
+                thread.join()
+                loop.close()
+                raise
+            _semaphore, _loop = semaphore, loop
+        return _loop
+
+
+def _get_client() -> openai.AsyncOpenAI:
+    """The API client, built on first use (on the LLM loop) so cache replay works without an API key."""
+    global _client
+    if _client is None:
+        try:
+            # The SDK retries on its own by default; we do it here so backoff and accounting are ours
+            _client = openai.AsyncOpenAI(api_key=api_key, timeout=LLM_TIMEOUT_SECONDS, max_retries=0)
+        except openai.OpenAIError as e:
+            raise LLMError(f"LLM client unavailable: {e!r}") from e
+    return _client
+
+
+class LLMStats:
+    """Call, retry, token and latency accounting for the admin dashboard."""
+
+    def __init__(self):
+        # Updated on the LLM loop, read from the API's threadpool
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float, ok: bool, retries: int, usage=None):
+        with self._lock:
+            self.requests += 1
+            if not ok:
+                self.errors += 1
+            self.retries += retries
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            if usage:
+                self.prompt_tokens += usage.prompt_tokens or 0
+                self.completion_tokens += usage.completion_tokens or 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "model": LLM_MODEL,
+                "maxConcurrency": LLM_MAX_CONCURRENCY,
+                "requests": self.requests,
+                "errors": self.errors,
+                "retries": self.retries,
+                "promptTokens": self.prompt_tokens,
+                "completionTokens": self.completion_tokens,
+                "avgSeconds": round(self.total_seconds / self.requests, 3) if self.requests else 0.0,
+                "maxSeconds": round(self.max_seconds, 3),
+                "cache": llm_cache.stats(),
+            }
+
+
+llm_stats = LLMStats()
+
+
+def _backoff_seconds(attempt: int, error: Exception) -> float:
+    # Honour the server's Retry-After on rate limits when it sends one
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), LLM_BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    delay = min(LLM_BACKOFF_BASE_SECONDS * 2 ** attempt, LLM_BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def _chat(messages: list, temperature: float, cache: bool = True, batch: int = 0) -> str:
     """
-    Generates unique questions based on the system_prompt.
-    Tries to avoid questions in `existing_questions` (though context window might limit this).
+    One chat completion with a concurrency slot, timeout and retries. Runs on the LLM loop.
+    `batch` only goes into the cache key: callers asking the same prompt repeatedly for different
+    items number their requests, so each one gets (and replays) its own response.
     """
-    
+    key = None
+    # Replay never goes to the network, even for callers that otherwise want a fresh response
+    if llm_cache.enabled and (cache or llm_cache.mode == "replay"):
+        key = cache_key(LLM_MODEL, messages, {"temperature": temperature, "batch": batch})
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+        if llm_cache.mode == "replay":
+            raise LLMError("No cached LLM response to replay (LLM_CACHE_MODE=replay)")
+
+    client = _get_client()
+    started = time.perf_counter()
+    attempt = 0
+    async with _semaphore:
+        while True:
+            try:
+                response = await asyncio.wait_for(
+                    client.chat.completions.create(model=LLM_MODEL, messages=messages, temperature=temperature),
+                    LLM_TIMEOUT_SECONDS
+                )
+                content = response.choices[0].message.content
+                llm_stats.record(time.perf_counter() - started, content is not None, attempt, response.usage)
+                if content is None:
+                    raise LLMError(f"LLM returned no content (finish_reason={response.choices[0].finish_reason})")
+                if key:
+                    llm_cache.put(key, LLM_MODEL, content)
+                return content
+            except RETRYABLE_ERRORS as e:
+                if attempt >= LLM_MAX_RETRIES:
+                    llm_stats.record(time.perf_counter() - started, False, attempt)
+                    raise LLMError(f"LLM request failed after {attempt + 1} attempts: {e!r}") from e
+                await asyncio.sleep(_backoff_seconds(attempt, e))
+                attempt += 1
+            except openai.OpenAIError as e:
+                llm_stats.record(time.perf_counter() - started, False, attempt)
+                raise LLMError(f"LLM request failed: {e!r}") from e
+
+
+def _question_messages(system_prompt: str, count: int) -> list:
     prompt = f"""
     Generate {count} unique, engaging, and thoughtful items for the game.
-    
+
     Context/Rules: {system_prompt}
-    
-    The output must be a valid JSON array. 
+
+    The output must be a valid JSON array.
     It can be an array of strings OR an array of JSON objects, depending on the rules above.
     Do not output anything else.
     """
+    return [
+        {"role": "system", "content": "You are a helpful relationship coach assistant."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _parse_items(content: str) -> list:
+    # Clean up code blocks if present
+    if content.startswith("```json"):
+        content = content.replace("```json", "").replace("```", "")
+    try:
+        items = json.loads(content)
+    except ValueError as e:
+        raise LLMError(f"LLM returned invalid JSON: {e}") from e
+    if not isinstance(items, list):
+        raise LLMError(f"LLM returned a JSON {type(items).__name__}, expected an array")
+    return items
+
+
+async def _generate(system_prompt: str, count: int, cache: bool = True, batch: int = 0) -> list:
+    return _parse_items(await _chat(_question_messages(system_prompt, count), temperature=0.7, cache=cache, batch=batch))
+
+
+def _submit(coro):
+    """Schedule coro on the LLM loop; setup errors surface as LLMError."""
+    try:
+        loop = _get_loop()
+    except Exception as e:
+        coro.close()
+        raise LLMError(f"LLM client unavailable: {e!r}") from e
+    return asyncio.run_coroutine_threadsafe(coro, loop)
+
+
+async def _generate_many(requests: List[Tuple[str, int]], batch: int) -> list:
+    return await asyncio.gather(*(_generate(prompt, count, batch=batch) for prompt, count in requests),
+                                return_exceptions=True)
+
+
+async def generate_questions_async(system_prompt: str, existing_questions: List[str] = [], count: int = 10,
+                                   cache: bool = True, batch: int = 0) -> list:
+    """
+    Async generate_questions for code on another event loop (e.g. FastAPI handlers).
+    Raises LLMError instead of returning [] so callers can tell "failed" from "nothing new".
+    Pass cache=False when the caller needs items it hasn't seen before, or a distinct `batch` number
+    for each of several requests with the same prompt.
+    """
+    return await asyncio.wrap_future(_submit(_generate(system_prompt, count, cache, batch)))
+
+
+async def generate_many_async(requests: List[Tuple[str, int]], batch: int = 0) -> list:
+    """Run several (system_prompt, count) generations in parallel, within the concurrency cap.
+    Returns one list of items per request, or the LLMError for requests that failed."""
+    try:
+        future = _submit(_generate_many(requests, batch))
+    except LLMError as e:
+        return [e] * len(requests)
+    return await asyncio.wrap_future(future)
+
+
+def generate_many(requests: List[Tuple[str, int]], batch: int = 0) -> list:
+    """Blocking generate_many_async, for scripts and sync routes."""
+    try:
+        future = _submit(_generate_many(requests, batch))
+    except LLMError as e:
+        return [e] * len(requests)
+    return future.result()
+
+
+def generate_questions(system_prompt: str, existing_questions: List[str] = [], count: int = 10,
+                       cache: bool = True, batch: int = 0) -> List[str]:
+    """
+    Generates unique questions based on the system_prompt.
+    Tries to avoid questions in `existing_questions` (though context window might limit this).
+    Blocking wrapper around the async client; returns [] on failure (the error is logged and counted).
+    """
 
-    # If we have a lot of existing questions, we might want to mention them to avoid duplicates, 
+    # If we have a lot of existing questions, we might want to mention them to avoid duplicates,
     # but for now let's rely on the temperature and variations.
     if existing_questions:
         # Taking a random sample of existing questions to tell the LLM what NOT to generate might help
@@ -36,23 +268,8 @@ def generate_questions(system_prompt: str, existing_questions: List[str] = [], c
         pass
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo", # Or gpt-4o if available/preferred
-            messages=[
-                {"role": "system", "content": "You are a helpful relationship coach assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-        )
-        
-        content = response.choices[0].message.content
-        # Clean up code blocks if present
-        if content.startswith("```json"):
-            content = content.replace("```json", "").replace("```", "")
-        
-        questions = json.loads(content)
-        return questions
-        
+        return _submit(_generate(system_prompt, count, cache, batch)).result()
     except Exception as e:
+        # Callers (start_game's inline fallback, the replenisher, seed scripts) treat [] as "nothing new"
         print(f"Error generating questions: {e}")
         return []
@@ -0,0 +1,122 @@
+import os
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+# Location pings only need the latest value per user, so they land here and are written
+# to nearish_user in one batch every LOCATION_FLUSH_INTERVAL_SECONDS instead of per ping.
+LOCATION_FLUSH_INTERVAL_SECONDS = float(os.getenv("LOCATION_FLUSH_INTERVAL_SECONDS", "5"))
+
+# A ping is pushed to the partner over SSE only once the user has moved this far since the
+# last push, or when the "With You / Nearby / N miles" bucket changes.
+PARTNER_LOCATION_PUSH_MILES = float(os.getenv("PARTNER_LOCATION_PUSH_MILES", "0.1"))
+LOCATION_PUSH_TRACKER_MAX_USERS = int(os.getenv("LOCATION_PUSH_TRACKER_MAX_USERS", "10000"))
+
+# Every ping is also appended to location_history on the same flush. If the database is down,
+# at most this many points wait in memory (oldest dropped first).
+LOCATION_HISTORY_MAX_PENDING = int(os.getenv("LOCATION_HISTORY_MAX_PENDING", "100000"))
+
+# (latitude, longitude, updated_at)
+Location = Tuple[float, float, datetime]
+
+
+class LocationBuffer:
+    def __init__(self):
+        # user id -> latest location not yet known to be in the database
+        self._latest: Dict[str, Location] = {}
+        # Users whose latest location still has to be written
+        self._dirty = set()
+        # Every ping, in arrival order, for the history table: (user id, latitude, longitude, updated_at)
+        self._history: Deque[Tuple[str, float, float, datetime]] = deque(maxlen=LOCATION_HISTORY_MAX_PENDING)
+        # Sync routes record from the threadpool while the flusher runs on the event loop
+        self._lock = threading.Lock()
+
+        self.recorded = 0
+        self.flushed_rows = 0
+        self.flushes = 0
+
+    def record(self, user_id: str, latitude: float, longitude: float, updated_at: datetime):
+        with self._lock:
+            self._latest[user_id] = (latitude, longitude, updated_at)
+            self._dirty.add(user_id)
+            self._history.append((user_id, latitude, longitude, updated_at))
+            self.recorded += 1
+
+    def get(self, user_id: str) -> Optional[Location]:
+        with self._lock:
+            return self._latest.get(user_id)
+
+    def drain(self) -> Dict[str, Location]:
+        """Take every pending location for writing. Pass the result to flushed() or restore()."""
+        with self._lock:
+            batch = {user_id: self._latest[user_id] for user_id in self._dirty}
+            self._dirty.clear()
+            return batch
+
+    def flushed(self, batch: Dict[str, Location]):
+        """The batch is in the database: stop serving entries that haven't been superseded since."""
+        with self._lock:
+            for user_id, location in batch.items():
+                if self._latest.get(user_id) is location:
+                    del self._latest[user_id]
+            self.flushed_rows += len(batch)
+            self.flushes += 1
+
+    def restore(self, batch: Dict[str, Location]):
+        """The write failed: mark the batch pending again so the next flush retries it."""
+        with self._lock:
+            for user_id in batch:
+                if user_id in self._latest:
+                    self._dirty.add(user_id)
+
+    def drain_history(self) -> List[Tuple[str, float, float, datetime]]:
+        with self._lock:
+            points = list(self._history)
+            self._history.clear()
+            return points
+
+    def restore_history(self, points: List[Tuple[str, float, float, datetime]]):
+        """Put points back in front of anything recorded since, so a failed insert is retried."""
+        with self._lock:
+            pending = list(self._history)
+            self._history.clear()
+            self._history.extend(points)
+            self._history.extend(pending)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "buffered": len(self._latest),
+                "pending": len(self._dirty),
+                "pendingHistoryPoints": len(self._history),
+                "recorded": self.recorded,
+                "flushes": self.flushes,
+                "flushedRows": self.flushed_rows,
+                "flushIntervalSeconds": LOCATION_FLUSH_INTERVAL_SECONDS,
+            }
+
+
+class LocationPushTracker:
+    """What each user's partner was last told about them: (latitude, longitude, distance bucket)."""
+
+    def __init__(self, max_users: int = LOCATION_PUSH_TRACKER_MAX_USERS):
+        self.max_users = max_users
+        # user id -> last pushed state, in LRU order; a forgotten user just gets pushed again
+        self._last: "OrderedDict[str, Tuple[float, float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def last(self, user_id: str) -> Optional[Tuple[float, float, str]]:
+        with self._lock:
+            return self._last.get(user_id)
+
+    def mark(self, user_id: str, latitude: float, longitude: float, bucket: str):
+        with self._lock:
+            self._last[user_id] = (latitude, longitude, bucket)
+            self._last.move_to_end(user_id)
+            while len(self._last) > self.max_users:
+                self._last.popitem(last=False)
+
+
+location_buffer = LocationBuffer()
+location_push_tracker = LocationPushTracker()
@@ -1,8 +1,11 @@
-from fastapi import FastAPI, Depends, HTTPException, Header, Request, UploadFile, File, Form
-from fastapi.responses import StreamingResponse, HTMLResponse
-from sqlalchemy import create_engine, Column, String, DateTime, Boolean, Integer, ForeignKey, Float, Text
+from fastapi import FastAPI, Depends, HTTPException, Header, Request, UploadFile, File, Form, BackgroundTasks
+from fastapi.responses import StreamingResponse, HTMLResponse, FileResponse, Response
+from sqlalchemy import create_engine, Column, String, DateTime, Boolean, Integer, ForeignKey, Float, Text, Index, select, union_all, text, update, bindparam, or_, and_, event, literal
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy.orm import sessionmaker, Session, relationship, aliased, make_transient_to_detached
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.sql.expression import func
 from datetime import datetime, timedelta, timezone
 import os
@@ -12,10 +15,32 @@ import random
 import string
 import json
 import asyncio
+import time
 import httpx
-from sse_manager import manager
-from s3_client import upload_file_to_s3, get_presigned_url, delete_file_from_s3
-from llm_service import generate_questions
+import numpy as np
+import tempfile
+from sse_manager import manager, create_event_backend
+from auth_cache import auth_cache, hash_token
+from question_pool import (
+    question_pool, QUESTION_POOL_LOW_WATER, QUESTION_POOL_ACTIVE_COUPLES, QUESTION_POOL_ACTIVE_DAYS,
+    QUESTION_POOL_CHECK_SECONDS, QUESTION_POOL_REQUEST_POLL_SECONDS, QUESTION_POOL_MAX_CONCURRENT_REFILLS
+)
+from location_buffer import location_buffer, location_push_tracker, LOCATION_FLUSH_INTERVAL_SECONDS, PARTNER_LOCATION_PUSH_MILES
+from s3_client import (
+    get_presigned_url, get_presigned_url_cache_stats,
+    upload_file_to_s3_async, delete_file_from_s3_async, get_storage_metrics,
+    generate_presigned_put_url, head_object_async,
+    delete_files_from_s3_async, list_objects_async, get_local_storage
+)
+from image_renditions import create_renditions
+from llm_service import generate_questions, llm_stats
+from question_store import insert_question_texts, merge_duplicate_questions
+from schemas import FinalizeMemoryRequest
+from memory_cursor import after_cursor, decode_cursor, encode_cursor, page_order
+from storage_backends import is_valid_key
+from storage_gc import STORAGE_GC_BATCH_SIZE, STORAGE_GC_INTERVAL_SECONDS, retry_delay_seconds
+from geo import geohash_encode, covering_cells, radius_boxes, split_at_antimeridian, PREFIX_RANGE_END, GEOHASH_PRECISION
+from proximity import EARTH_RADIUS_MILES, WITH_YOU_MILES, NEARBY_MILES, haversine_many, sample_on_grid, together_stats
 import ast
 
 
@@ -24,8 +49,24 @@ SQLALCHEMY_DATABASE_URL = "postgresql://postgres:IwVFaHIwQfulvssagcqReUsKLrEZcUc
 
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async path for `async def` handlers so DB round trips don't block the event loop (and every SSE stream)
+ASYNC_SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
+# expire_on_commit=False: lazy attribute refreshes aren't possible on an AsyncSession
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
+class UTCDateTime(TypeDecorator):
+    """`timestamp` column that accepts aware datetimes by storing them as naive UTC (asyncpg rejects aware values)."""
+    impl = DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
 # --- Models ---
 
 class DbSession(Base):
@@ -33,7 +74,7 @@ class DbSession(Base):
     id = Column(String, primary_key=True)
     userId = Column(String)
     token = Column(String)
-    expiresAt = Column(DateTime)
+    expiresAt = Column(UTCDateTime)
 
 class User(Base):
     __tablename__ = "user"
@@ -42,8 +83,8 @@ class User(Base):
     email = Column(String)
     image = Column(String)
     emailVerified = Column(Boolean)
-    createdAt = Column(DateTime)
-    updatedAt = Column(DateTime)
+    createdAt = Column(UTCDateTime)
+    updatedAt = Column(UTCDateTime)
     isAnonymous = Column(Boolean) 
 
 class NearishUser(Base):
@@ -54,7 +95,7 @@ class NearishUser(Base):
     # Profile Data (from onboarding)
     display_name = Column(String, nullable=True)
     partner_name = Column(String, nullable=True)
-    relationship_date = Column(DateTime, nullable=True)
+    relationship_date = Column(UTCDateTime, nullable=True)
     goals = Column(Text, nullable=True)  # JSON string array
 
     # Partner Connection
@@ -64,12 +105,12 @@ class NearishUser(Base):
     # Location Tracking
     lastLatitude = Column(Float, nullable=True)
     lastLongitude = Column(Float, nullable=True)
-    lastLocationUpdate = Column(DateTime, nullable=True)
+    lastLocationUpdate = Column(UTCDateTime, nullable=True)
 
     # Status
     status_emoji = Column(String, nullable=True)
     status_text = Column(String, nullable=True)
-    status_updated_at = Column(DateTime, nullable=True)
+    status_updated_at = Column(UTCDateTime, nullable=True)
 
     # Push Notifications
     push_token = Column(String, nullable=True)
@@ -78,8 +119,8 @@ class NearishUser(Base):
     is_pro = Column(Boolean, default=False)
     is_pro_via_partner = Column(Boolean, default=False)  # True if pro access granted via partner's subscription
 
-    createdAt = Column(DateTime, default=datetime.now(timezone.utc))
-    updatedAt = Column(DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    createdAt = Column(UTCDateTime, default=datetime.now(timezone.utc))
+    updatedAt = Column(UTCDateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
 
     # Relationship for accessing the partner object easily
     partner = relationship("NearishUser", remote_side=[id])
@@ -89,22 +130,97 @@ class Streak(Base):
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     nearish_user_id = Column(String, ForeignKey("nearish_user.id"), unique=True) 
     currentStreak = Column(Integer, default=0)
-    lastLoginDate = Column(DateTime)
-    createdAt = Column(DateTime, default=datetime.now(timezone.utc))
-    updatedAt = Column(DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    lastLoginDate = Column(UTCDateTime)
+    createdAt = Column(UTCDateTime, default=datetime.now(timezone.utc))
+    updatedAt = Column(UTCDateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
 
 class Memory(Base):
     __tablename__ = "memory"
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     nearish_user_id = Column(String, ForeignKey("nearish_user.id"))
     imagePath = Column(String, nullable=True)
+    # Downscaled renditions of imagePath, filled in after upload
+    thumbnailPath = Column(String, nullable=True)
+    previewPath = Column(String, nullable=True)
     title = Column(String)
     description = Column(String, nullable=True)
-    date = Column(DateTime)
+    date = Column(UTCDateTime)
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
     locationName = Column(String, nullable=True)
-    createdAt = Column(DateTime, default=datetime.now(timezone.utc))
+    # Derived from latitude/longitude on every flush; C collation so prefix ranges sort bytewise
+    geohash = Column(String(GEOHASH_PRECISION, collation="C"), nullable=True)
+    createdAt = Column(UTCDateTime, default=datetime.now(timezone.utc))
+
+    __table_args__ = (
+        # Keyset pagination of the memories feed: per author, newest first
+        Index("ix_memory_user_date_id", nearish_user_id, date.desc(), id.desc()),
+        # Map queries: per author, one range scan per geohash cell
+        Index("ix_memory_user_geohash", nearish_user_id, geohash),
+    )
+
+@event.listens_for(Memory, "before_insert")
+@event.listens_for(Memory, "before_update")
+def set_memory_geohash(mapper, connection, memory):
+    if memory.latitude is not None and memory.longitude is not None:
+        memory.geohash = geohash_encode(memory.latitude, memory.longitude)
+    else:
+        memory.geohash = None
+
+class PendingStorageDeletion(Base):
+    """Bucket objects to delete, queued in the same transaction that drops the last reference to them."""
+    __tablename__ = "pending_storage_deletion"
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    object_key = Column(String, nullable=False)
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    # NULL once the key is parked after STORAGE_GC_MAX_ATTEMPTS failures
+    next_attempt_at = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc), index=True)
+    createdAt = Column(UTCDateTime, default=datetime.now(timezone.utc))
+
+# Coordinates are stored as integers in units of 1e-5 degrees (~1.1 m)
+LOCATION_HISTORY_SCALE = 100_000
+LOCATION_HISTORY_RETENTION_DAYS = int(os.getenv("LOCATION_HISTORY_RETENTION_DAYS", "90"))
+LOCATION_HISTORY_PARTITIONS_AHEAD = 2
+
+class LocationHistory(Base):
+    """
+    Append-only location pings. Two int4 coordinates take half the space of two floats, and the
+    table is range-partitioned by day so retention drops whole partitions instead of deleting rows.
+    No foreign key, to keep ingest to a plain insert.
+    """
+    __tablename__ = "location_history"
+    nearish_user_id = Column(String, primary_key=True)
+    recorded_at = Column(UTCDateTime, primary_key=True)
+    latitude_e5 = Column(Integer, nullable=False)
+    longitude_e5 = Column(Integer, nullable=False)
+
+    __table_args__ = {"postgresql_partition_by": "RANGE (recorded_at)"}
+
+def location_partition_name(day):
+    return f"location_history_{day:%Y%m%d}"
+
+def ensure_location_partitions(conn):
+    """Create the daily partitions from yesterday through LOCATION_HISTORY_PARTITIONS_AHEAD days out."""
+    today = datetime.now(timezone.utc).date()
+    for offset in range(-1, LOCATION_HISTORY_PARTITIONS_AHEAD + 1):
+        day = today + timedelta(days=offset)
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {location_partition_name(day)} PARTITION OF location_history "
+            f"FOR VALUES FROM ('{day}') TO ('{day + timedelta(days=1)}')"
+        ))
+
+def drop_expired_location_partitions(conn):
+    cutoff = location_partition_name(datetime.now(timezone.utc).date() - timedelta(days=LOCATION_HISTORY_RETENTION_DAYS))
+    partitions = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'location_history'"
+    )).scalars().all()
+    # Names embed the day as YYYYMMDD, so they compare chronologically
+    for name in partitions:
+        if name < cutoff:
+            conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
 
 class Games(Base):
     __tablename__ = "games"
@@ -115,9 +231,14 @@ class Games(Base):
 class GameQuestion(Base):
     __tablename__ = "game_questions"
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    game_id = Column(Integer, ForeignKey("games.id"))
+    game_id = Column(Integer, ForeignKey("games.id"), index=True)
     question_text = Column(Text)
-    createdAt = Column(DateTime, default=datetime.now(timezone.utc))
+    createdAt = Column(UTCDateTime, default=datetime.now(timezone.utc))
+
+    __table_args__ = (
+        # Duplicate check for generated questions (insert_question_texts); md5 keeps index entries small
+        Index("uq_game_questions_game_text", game_id, func.md5(question_text), unique=True),
+    )
 
 class CoupleGameSession(Base):
     __tablename__ = "couple_game_sessions"
@@ -129,12 +250,28 @@ class CoupleGameSession(Base):
     
     is_active = Column(Boolean, default=True)
     
-    # We store the list of question IDs for this session as a JSON string (e.g. "['id1', 'id2']")
-    # In a more normalized schema we might use a link table, but this is simpler for "Session" scope. 
+    # Legacy JSON list of question IDs (e.g. '["id1", "id2"]'), only set on sessions from before
+    # CoupleSessionQuestion, which is the source of truth; migrate_session_question_lists moves them over.
     question_ids = Column(Text) 
     
-    createdAt = Column(DateTime, default=datetime.now(timezone.utc))
-    completedAt = Column(DateTime, nullable=True)
+    createdAt = Column(UTCDateTime, default=datetime.now(timezone.utc))
+    completedAt = Column(UTCDateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_couple_game_sessions_couple_game", user_1_id, user_2_id, game_id),
+    )
+
+class CoupleSessionQuestion(Base):
+    """The questions of a game session, in order."""
+    __tablename__ = "couple_session_questions"
+    session_id = Column(String, ForeignKey("couple_game_sessions.id"), primary_key=True)
+    question_id = Column(String, ForeignKey("game_questions.id"), primary_key=True)
+    position = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # "Has this couple seen this question" probes in the unused-question anti-join
+        Index("ix_couple_session_questions_question", question_id, session_id),
+    )
 
 class GameAnswer(Base):
     __tablename__ = "game_answers"
@@ -143,7 +280,7 @@ class GameAnswer(Base):
     question_id = Column(String, ForeignKey("game_questions.id"))
     user_id = Column(String, ForeignKey("nearish_user.id"))
     answer_text = Column(Text)
-    createdAt = Column(DateTime, default=datetime.now(timezone.utc))
+    createdAt = Column(UTCDateTime, default=datetime.now(timezone.utc))
 
 # --- Question Tab Models ---
 
@@ -154,14 +291,24 @@ class QuestionCategory(Base):
     emoji = Column(String)
     backgroundColor = Column(String)
     accentColor = Column(String)
-    createdAt = Column(DateTime, default=datetime.now(timezone.utc))
+    createdAt = Column(UTCDateTime, default=datetime.now(timezone.utc))
 
 class Question(Base):
     __tablename__ = "questions"
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     category_id = Column(String, ForeignKey("question_categories.id"))
     text = Column(Text)
-    createdAt = Column(DateTime, default=datetime.now(timezone.utc))
+    createdAt = Column(UTCDateTime, default=datetime.now(timezone.utc))
+
+    __table_args__ = (
+        Index("uq_questions_category_text", category_id, func.md5(text), unique=True),
+    )
+
+class AppliedMigration(Base):
+    """Data migrations that have already run (see run_migration_once)."""
+    __tablename__ = "applied_migrations"
+    name = Column(String, primary_key=True)
+    appliedAt = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc))
 
 class UserQuestionAnswer(Base):
     __tablename__ = "user_question_answers"
@@ -170,11 +317,85 @@ class UserQuestionAnswer(Base):
     question_id = Column(String, ForeignKey("questions.id"))
     answer_text = Column(Text, nullable=True) # Can be just "read" or actual text
     is_read = Column(Boolean, default=True)
-    createdAt = Column(DateTime, default=datetime.now(timezone.utc))
+    createdAt = Column(UTCDateTime, default=datetime.now(timezone.utc))
 
 # Create tables
 Base.metadata.create_all(bind=engine)
 
+# create_all doesn't add columns to existing tables, so add the ones introduced since the table was first created
+with engine.begin() as conn:
+    conn.execute(text('ALTER TABLE memory ADD COLUMN IF NOT EXISTS "thumbnailPath" VARCHAR'))
+    conn.execute(text('ALTER TABLE memory ADD COLUMN IF NOT EXISTS "previewPath" VARCHAR'))
+    conn.execute(text(f'ALTER TABLE memory ADD COLUMN IF NOT EXISTS geohash VARCHAR({GEOHASH_PRECISION}) COLLATE "C"'))
+    ensure_location_partitions(conn)
+    merge_duplicate_questions(conn, "uq_game_questions_game_text")
+    merge_duplicate_questions(conn, "uq_questions_category_text")
+
+    # Memories created before the geohash column existed
+    missing = conn.execute(
+        select(Memory.id, Memory.latitude, Memory.longitude)
+        .where(Memory.geohash.is_(None), Memory.latitude.isnot(None), Memory.longitude.isnot(None))
+    ).all()
+    if missing:
+        conn.execute(
+            update(Memory.__table__).where(Memory.__table__.c.id == bindparam("b_id")).values(geohash=bindparam("b_geohash")),
+            [{"b_id": memory_id, "b_geohash": geohash_encode(lat, lon)} for memory_id, lat, lon in missing]
+        )
+
+# ...or indexes, so add any that are missing
+for table in Base.metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+def run_migration_once(conn, name: str, migrate):
+    """
+    Run a data migration the first time any worker starts with it, rather than rescanning on every
+    start. Workers starting together take turns on an advisory lock, so only the first one runs it.
+    """
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": name})
+    if conn.execute(select(AppliedMigration.name).where(AppliedMigration.name == name)).first():
+        return
+    migrate(conn)
+    conn.execute(pg_insert(AppliedMigration).values(name=name).on_conflict_do_nothing())
+    print(f"Applied data migration '{name}'")
+
+def migrate_session_question_lists(conn):
+    """
+    Move session question lists from the JSON column into couple_session_questions (IDs of questions
+    that no longer exist are skipped). Parsed here rather than cast in SQL, so one malformed legacy
+    value is skipped and logged instead of failing startup. New sessions only write the link table,
+    so one pass covers every legacy session.
+    """
+    sessions = conn.execute(text("""
+        SELECT s.id, s.question_ids FROM couple_game_sessions s
+        WHERE s.question_ids IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM couple_session_questions l WHERE l.session_id = s.id)
+    """)).all()
+
+    links, skipped = [], []
+    for session_id, question_ids in sessions:
+        try:
+            ids = json.loads(question_ids)
+        except ValueError:
+            ids = None
+        if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+            skipped.append(session_id)
+            continue
+        links.extend({"session_id": session_id, "question_id": question_id, "position": position}
+                     for position, question_id in enumerate(ids))
+
+    if links:
+        conn.execute(text("""
+            INSERT INTO couple_session_questions (session_id, question_id, position)
+            SELECT :session_id, gq.id, :position FROM game_questions gq WHERE gq.id = :question_id
+            ON CONFLICT DO NOTHING
+        """), links)
+    if skipped:
+        print(f"Skipped {len(skipped)} sessions with unreadable question_ids: {', '.join(skipped)}")
+
+with engine.begin() as conn:
+    run_migration_once(conn, "session_question_links", migrate_session_question_lists)
+
 # --- Dependencies ---
 
 def get_db():
@@ -184,7 +405,13 @@ def get_db():
     finally:
         db.close()
 
-def get_current_user(authorization: str = Header(None), db: Session = Depends(get_db)):
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+USER_CACHE_COLUMNS = ("id", "name", "email", "image", "emailVerified", "createdAt", "updatedAt", "isAnonymous")
+
+def parse_bearer_token(authorization: str):
     if not authorization:
         raise HTTPException(status_code=401, detail="Missing Authorization Header")
     try:
@@ -193,32 +420,124 @@ def get_current_user(authorization: str = Header(None), db: Session = Depends(ge
             raise HTTPException(status_code=401, detail="Invalid Authorization Scheme")
     except ValueError:
         raise HTTPException(status_code=401, detail="Invalid Authorization Format")
+    return token
 
-    session_record = db.query(DbSession).filter(DbSession.token == token).first()
-    if not session_record:
-        raise HTTPException(status_code=401, detail="Invalid Session")
-    
-    expires_at = session_record.expiresAt
+class Identity:
+    """The authenticated caller: their better-auth User, NearishUser row and partner row (if connected)."""
+    def __init__(self, user: User, nearish_user: NearishUser, partner: NearishUser = None):
+        self.user = user
+        self.nearish_user = nearish_user
+        self.partner = partner
+
+PartnerUser = aliased(NearishUser)
+
+# Statements are shared by the sync and async identity dependencies; only execution differs.
+
+def identity_select(token: str):
+    return select(DbSession.expiresAt, User, NearishUser, PartnerUser).join(
+        User, User.id == DbSession.userId
+    ).outerjoin(
+        NearishUser, NearishUser.better_auth_id == User.id
+    ).outerjoin(
+        PartnerUser, PartnerUser.id == NearishUser.partner_id
+    ).where(DbSession.token == token)
+
+def cached_identity_select(cached):
+    stmt = select(NearishUser, PartnerUser).outerjoin(PartnerUser, PartnerUser.id == NearishUser.partner_id)
+    if cached.nearish_user_id:
+        return stmt.where(NearishUser.id == cached.nearish_user_id)
+    return stmt.where(NearishUser.better_auth_id == cached.user_id)
+
+def nearish_user_upsert(user_id: str):
+    # Single round trip; concurrent first requests for the same user race on the unique better_auth_id
+    return pg_insert(NearishUser).values(
+        better_auth_id=user_id
+    ).on_conflict_do_nothing(
+        index_elements=[NearishUser.better_auth_id]
+    ).returning(NearishUser)
+
+def attach_cached_user(cached, db):
+    # Re-attach the cached user row to this session without hitting the DB
+    user = User(**cached.user_data)
+    make_transient_to_detached(user)
+    db.add(user)
+    return user
+
+def check_session_expiry(expires_at: datetime):
     if expires_at.tzinfo is None:
         expires_at = expires_at.replace(tzinfo=timezone.utc)
-        
     if expires_at < datetime.now(timezone.utc):
         raise HTTPException(status_code=401, detail="Session Expired")
-        
-    user = db.query(User).filter(User.id == session_record.userId).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User Not Found")
-    return user
+    return expires_at
+
+def cache_identity(token: str, expires_at: datetime, user: User):
+    auth_cache.put(token, expires_at, user.id, {c: getattr(user, c) for c in USER_CACHE_COLUMNS})
+
+def get_identity(authorization: str = Header(None), db: Session = Depends(get_db)):
+    token = parse_bearer_token(authorization)
 
-# Helper to find/create NearishUser
-def get_nearish_user(user: User, db: Session):
-    nearish_user = db.query(NearishUser).filter(NearishUser.better_auth_id == user.id).first()
-    if not nearish_user:
-        nearish_user = NearishUser(better_auth_id=user.id)
-        db.add(nearish_user)
+    cached = auth_cache.get(token)
+    if cached:
+        user = attach_cached_user(cached, db)
+        row = db.execute(cached_identity_select(cached)).first()
+        nearish_user, partner = row if row else (None, None)
+
+        if nearish_user is not None and nearish_user.better_auth_id != user.id:
+            # Row was relinked (e.g. anonymous account upgrade); resolve from scratch
+            auth_cache.invalidate_user(user.id)
+            return get_identity(authorization, db)
+    else:
+        row = db.execute(identity_select(token)).first()
+        if not row:
+            # Distinguish a dangling session from an unknown token
+            if db.query(DbSession.id).filter(DbSession.token == token).first():
+                raise HTTPException(status_code=401, detail="User Not Found")
+            raise HTTPException(status_code=401, detail="Invalid Session")
+
+        expires_at, user, nearish_user, partner = row
+        cache_identity(token, check_session_expiry(expires_at), user)
+
+    if nearish_user is None:
+        nearish_user = db.scalars(nearish_user_upsert(user.id)).first()
         db.commit()
-        db.refresh(nearish_user)
-    return nearish_user
+        if not nearish_user:
+            nearish_user = db.query(NearishUser).filter(NearishUser.better_auth_id == user.id).first()
+        partner = None
+    auth_cache.set_nearish_user_id(user.id, nearish_user.id)
+
+    return Identity(user, nearish_user, partner)
+
+async def get_identity_async(authorization: str = Header(None), db: AsyncSession = Depends(get_async_db)):
+    token = parse_bearer_token(authorization)
+
+    cached = auth_cache.get(token)
+    if cached:
+        user = attach_cached_user(cached, db)
+        row = (await db.execute(cached_identity_select(cached))).first()
+        nearish_user, partner = row if row else (None, None)
+
+        if nearish_user is not None and nearish_user.better_auth_id != user.id:
+            auth_cache.invalidate_user(user.id)
+            return await get_identity_async(authorization, db)
+    else:
+        row = (await db.execute(identity_select(token))).first()
+        if not row:
+            if (await db.execute(select(DbSession.id).where(DbSession.token == token))).first():
+                raise HTTPException(status_code=401, detail="User Not Found")
+            raise HTTPException(status_code=401, detail="Invalid Session")
+
+        expires_at, user, nearish_user, partner = row
+        cache_identity(token, check_session_expiry(expires_at), user)
+
+    if nearish_user is None:
+        nearish_user = (await db.scalars(nearish_user_upsert(user.id))).first()
+        await db.commit()
+        if not nearish_user:
+            nearish_user = (await db.scalars(select(NearishUser).where(NearishUser.better_auth_id == user.id))).first()
+        partner = None
+    auth_cache.set_nearish_user_id(user.id, nearish_user.id)
+
+    return Identity(user, nearish_user, partner)
 
 def verify_admin(authorization: str = Header(None)):
     admin_secret = os.getenv("ADMIN_SECRET", "nearish-admin-2026")
@@ -241,42 +560,267 @@ def get_couple_ids(nearish_user: NearishUser):
 
 app = FastAPI()
 
+# SSE event bus: "memory" (single worker, default) or "postgres" (LISTEN/NOTIFY across workers/nodes)
+SSE_BACKEND = os.getenv("SSE_BACKEND", "memory")
+
+@app.on_event("startup")
+async def start_event_bus():
+    await manager.start(create_event_backend(SSE_BACKEND, SQLALCHEMY_DATABASE_URL))
+
+@app.on_event("shutdown")
+async def stop_event_bus():
+    await manager.stop()
+
+# Each worker caches identities separately, so invalidations go to all of them over the event bus
+def apply_auth_invalidation(data: dict):
+    for key in data.get("tokens", ()):
+        auth_cache.invalidate_token_hash(key)
+    for nearish_user_id in data.get("nearishUsers", ()):
+        auth_cache.invalidate_nearish_user(nearish_user_id)
+
+manager.on_control("auth_invalidate", apply_auth_invalidation)
+
+async def invalidate_identities(tokens=(), nearish_user_ids=()):
+    # Applied here first, so this worker never serves a stale entry even if the broadcast fails
+    data = {"tokens": [hash_token(token) for token in tokens], "nearishUsers": list(nearish_user_ids)}
+    apply_auth_invalidation(data)
+    await manager.broadcast("auth_invalidate", data)
+
+# --- Location write-behind ---
+
+# One statement per flush, executed for every buffered user in a single batch. The timestamp guard
+# keeps an older ping (e.g. buffered on another worker) from overwriting a newer one.
+location_flush_statement = update(NearishUser.__table__).where(
+    NearishUser.__table__.c.id == bindparam("b_id"),
+    or_(NearishUser.__table__.c.lastLocationUpdate.is_(None),
+        NearishUser.__table__.c.lastLocationUpdate < bindparam("b_updated_at", type_=UTCDateTime))
+).values(
+    lastLatitude=bindparam("b_latitude"),
+    lastLongitude=bindparam("b_longitude"),
+    lastLocationUpdate=bindparam("b_updated_at", type_=UTCDateTime)
+)
+
+async def flush_locations():
+    batch = location_buffer.drain()
+    if not batch:
+        return
+    params = [
+        {"b_id": user_id, "b_latitude": lat, "b_longitude": lon, "b_updated_at": updated_at}
+        for user_id, (lat, lon, updated_at) in batch.items()
+    ]
+    try:
+        async with async_engine.begin() as conn:
+            await conn.execute(location_flush_statement, params)
+    except Exception:
+        location_buffer.restore(batch)
+        raise
+    location_buffer.flushed(batch)
+
+async def flush_location_history():
+    points = location_buffer.drain_history()
+    if not points:
+        return
+    rows = [
+        {"nearish_user_id": user_id, "recorded_at": recorded_at,
+         "latitude_e5": round(lat * LOCATION_HISTORY_SCALE), "longitude_e5": round(lon * LOCATION_HISTORY_SCALE)}
+        for user_id, lat, lon, recorded_at in points
+    ]
+    try:
+        # executemany of one INSERT is sent as multi-row VALUES batches
+        async with async_engine.begin() as conn:
+            await conn.execute(pg_insert(LocationHistory).on_conflict_do_nothing(), rows)
+    except Exception:
+        location_buffer.restore_history(points)
+        raise
+
+async def run_location_flusher():
+    while True:
+        await asyncio.sleep(LOCATION_FLUSH_INTERVAL_SECONDS)
+        for flush in (flush_locations, flush_location_history):
+            try:
+                await flush()
+            except Exception as e:
+                print(f"Location flush error ({flush.__name__}): {e}")
+
+# History older than a day keeps only the first point per user per LOCATION_HISTORY_DOWNSAMPLE_MINUTES.
+# Each run rewrites the last LOCATION_HISTORY_DOWNSAMPLE_LOOKBACK_HOURS past the raw window, which is
+# idempotent, so missed runs are caught up as long as the gap is shorter than the lookback.
+LOCATION_HISTORY_RAW_HOURS = 24
+LOCATION_HISTORY_DOWNSAMPLE_MINUTES = int(os.getenv("LOCATION_HISTORY_DOWNSAMPLE_MINUTES", "5"))
+LOCATION_HISTORY_DOWNSAMPLE_LOOKBACK_HOURS = 48
+LOCATION_HISTORY_MAINTENANCE_SECONDS = 3600
+# pg_try_advisory_xact_lock key, so only one worker/node runs maintenance at a time
+LOCATION_HISTORY_MAINTENANCE_LOCK = 7_301_018
+
+location_downsample_statement = text("""
+    DELETE FROM location_history h
+    USING (
+        SELECT nearish_user_id, recorded_at,
+               row_number() OVER (
+                   PARTITION BY nearish_user_id, floor(extract(epoch FROM recorded_at) / :bucket_seconds)
+                   ORDER BY recorded_at
+               ) AS rn
+        FROM location_history
+        WHERE recorded_at >= :start AND recorded_at < :end
+    ) ranked
+    WHERE h.nearish_user_id = ranked.nearish_user_id AND h.recorded_at = ranked.recorded_at
+      AND ranked.rn > 1 AND h.recorded_at >= :start AND h.recorded_at < :end
+""")
+
+async def maintain_location_history():
+    end = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=LOCATION_HISTORY_RAW_HOURS)
+    start = end - timedelta(hours=LOCATION_HISTORY_DOWNSAMPLE_LOOKBACK_HOURS)
+    async with async_engine.begin() as conn:
+        if not await conn.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": LOCATION_HISTORY_MAINTENANCE_LOCK}):
+            return
+        await conn.run_sync(ensure_location_partitions)
+        await conn.run_sync(drop_expired_location_partitions)
+        result = await conn.execute(location_downsample_statement, {
+            "bucket_seconds": LOCATION_HISTORY_DOWNSAMPLE_MINUTES * 60, "start": start, "end": end
+        })
+        print(f"Location history downsampling removed {result.rowcount} points")
+
+async def run_location_history_maintenance():
+    while True:
+        try:
+            await maintain_location_history()
+        except Exception as e:
+            print(f"Location history maintenance error: {e}")
+        await asyncio.sleep(LOCATION_HISTORY_MAINTENANCE_SECONDS)
+
+location_tasks = []
+
+@app.on_event("startup")
+async def start_location_flusher():
+    location_tasks.append(asyncio.create_task(run_location_flusher()))
+    location_tasks.append(asyncio.create_task(run_location_history_maintenance()))
+
+@app.on_event("shutdown")
+async def stop_location_flusher():
+    for task in location_tasks:
+        task.cancel()
+    await asyncio.gather(*location_tasks, return_exceptions=True)
+    # Don't lose the last interval's pings
+    await flush_locations()
+    await flush_location_history()
+
+def current_location(user: NearishUser):
+    """(latitude, longitude, updated_at): a buffered ping if there is one, else the row's last flushed values."""
+    return location_buffer.get(user.id) or (user.lastLatitude, user.lastLongitude, user.lastLocationUpdate)
+
+# --- Storage garbage collection ---
+
+# Unreferenced objects younger than this may belong to a presigned upload that hasn't been finalized yet
+STORAGE_RECONCILE_GRACE = timedelta(hours=24)
+
+def queue_object_deletions(db, object_keys):
+    """Stage bucket deletes on db (sync or async session); they happen only if the transaction commits."""
+    db.add_all([PendingStorageDeletion(object_key=key) for key in object_keys])
+
+async def drain_pending_deletions():
+    """Delete one batch of due objects. Returns how many rows were processed."""
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as db:
+        # SKIP LOCKED lets every worker/node run the drainer without double-deleting
+        rows = (await db.execute(
+            select(PendingStorageDeletion)
+            .where(PendingStorageDeletion.next_attempt_at <= now)
+            .order_by(PendingStorageDeletion.next_attempt_at)
+            .limit(STORAGE_GC_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )).scalars().all()
+        if not rows:
+            return 0
+
+        failures = await delete_files_from_s3_async(list({row.object_key for row in rows}))
+        for row in rows:
+            error = failures.get(row.object_key)
+            if error is None:
+                await db.delete(row)
+            else:
+                row.attempts = (row.attempts or 0) + 1
+                row.last_error = error
+                delay = retry_delay_seconds(row.attempts)
+                if delay is None:
+                    row.next_attempt_at = None
+                    print(f"Giving up on deleting {row.object_key} after {row.attempts} attempts: {error}")
+                else:
+                    row.next_attempt_at = now + timedelta(seconds=delay)
+        await db.commit()
+        return len(rows)
+
+async def run_storage_gc():
+    while True:
+        try:
+            processed = await drain_pending_deletions()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Storage GC error: {e}")
+            processed = 0
+        # Keep draining while there's a backlog
+        if processed < STORAGE_GC_BATCH_SIZE:
+            await asyncio.sleep(STORAGE_GC_INTERVAL_SECONDS)
+
+storage_gc_task = None
+
+@app.on_event("startup")
+async def start_storage_gc():
+    global storage_gc_task
+    storage_gc_task = asyncio.create_task(run_storage_gc())
+
+@app.on_event("shutdown")
+async def stop_storage_gc():
+    if storage_gc_task:
+        storage_gc_task.cancel()
+        await asyncio.gather(storage_gc_task, return_exceptions=True)
+
 # --- Endpoints ---
 
 @app.get("/")
 def read_root():
     return {"message": "Nearish API is running!"}
 
+@app.post("/api/auth/logout")
+async def logout(authorization: str = Header(None)):
+    """Drop the cached identity for this bearer token on every worker. Call alongside the auth server's sign-out."""
+    token = parse_bearer_token(authorization)
+    await invalidate_identities(tokens=[token])
+    return {"success": True}
+
 @app.get("/api/events")
-async def event_stream(request: Request, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def event_stream(
+    request: Request,
+    last_event_id: str = Header(None),
+    identity: Identity = Depends(get_identity_async),
+    db: AsyncSession = Depends(get_async_db)
+):
     # Identify the NearishUser stable ID
-    nearish_user = get_nearish_user(user, db)
+    nearish_user = identity.nearish_user
     user_id = nearish_user.id
+
+    # Don't pin a pooled DB connection for the lifetime of the stream
+    await db.close()
     
-    queue = await manager.connect(user_id)
-    
-    async def event_generator():
+    # Resume after a reconnect: replay whatever was sent since the client's Last-Event-ID
+    resume_from = None
+    if last_event_id:
         try:
-            while True:
-                if await request.is_disconnected():
-                    break
-                
-                # Wait for data from the queue
-                data = await queue.get()
-                
-                # Format as SSE
-                yield f"event: {data['event']}\n"
-                yield f"data: {json.dumps(data['data'])}\n\n"
-        except asyncio.CancelledError:
+            resume_from = int(last_event_id)
+        except ValueError:
             pass
-        finally:
-            await manager.disconnect(user_id, queue)
 
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+    connection = await manager.connect(user_id, resume_from)
+
+    return StreamingResponse(manager.stream(connection, request), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        # Stop nginx-style proxies from buffering the stream
+        "X-Accel-Buffering": "no"
+    })
 
 @app.get("/api/user/me")
-def get_me(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    nearish_user = get_nearish_user(user, db)
+def get_me(identity: Identity = Depends(get_identity), db: Session = Depends(get_db)):
+    user, nearish_user = identity.user, identity.nearish_user
 
     # Parse goals from JSON string if exists
     goals = []
@@ -310,9 +854,9 @@ def get_me(user: User = Depends(get_current_user), db: Session = Depends(get_db)
     }
 
 @app.post("/api/user/onboarding")
-def save_onboarding(payload: dict, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def save_onboarding(payload: dict, identity: Identity = Depends(get_identity), db: Session = Depends(get_db)):
     """Save onboarding data to the user's profile"""
-    nearish_user = get_nearish_user(user, db)
+    nearish_user = identity.nearish_user
 
     # Extract data from payload
     display_name = payload.get("yourName")
@@ -351,9 +895,9 @@ def save_onboarding(payload: dict, user: User = Depends(get_current_user), db: S
     }
 
 @app.put("/api/user/profile")
-def update_profile(payload: dict, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def update_profile(payload: dict, identity: Identity = Depends(get_identity), db: Session = Depends(get_db)):
     """Update user profile data"""
-    nearish_user = get_nearish_user(user, db)
+    nearish_user = identity.nearish_user
 
     print("hello")
 
@@ -400,8 +944,8 @@ def update_profile(payload: dict, user: User = Depends(get_current_user), db: Se
     }
 
 @app.post("/api/status")
-async def update_status(payload: dict, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    nearish_user = get_nearish_user(user, db)
+async def update_status(payload: dict, identity: Identity = Depends(get_identity_async), db: AsyncSession = Depends(get_async_db)):
+    nearish_user = identity.nearish_user
     
     emoji = payload.get("emoji")
     text_status = payload.get("text")
@@ -410,7 +954,7 @@ async def update_status(payload: dict, user: User = Depends(get_current_user), d
     nearish_user.status_text = text_status
     nearish_user.status_updated_at = datetime.now(timezone.utc)
     
-    db.commit()
+    await db.commit()
     
     # Notify partner
     if nearish_user.partner_id:
@@ -423,13 +967,13 @@ async def update_status(payload: dict, user: User = Depends(get_current_user), d
     return {"success": True}
 
 @app.get("/api/status/partner")
-def get_partner_status(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    me = get_nearish_user(user, db)
+def get_partner_status(identity: Identity = Depends(get_identity), db: Session = Depends(get_db)):
+    me = identity.nearish_user
     
     if not me.partner_id:
         return {"success": False, "message": "No partner connected"}
         
-    partner = db.query(NearishUser).filter(NearishUser.id == me.partner_id).first()
+    partner = identity.partner
     
     if not partner:
         return {"success": False, "message": "Partner not found"}
@@ -437,19 +981,15 @@ def get_partner_status(user: User = Depends(get_current_user), db: Session = Dep
     # Calculate distance info here too, to keep it centralized for the UI
     distance_str = None
     dist_miles = None
+    my_lat, my_lon, _ = current_location(me)
+    partner_lat, partner_lon, partner_updated_at = current_location(partner)
     
-    if me.lastLatitude is not None and me.lastLongitude is not None and \
-       partner.lastLatitude is not None and partner.lastLongitude is not None:
+    if my_lat is not None and my_lon is not None and \
+       partner_lat is not None and partner_lon is not None:
         
-        dist_miles = haversine(me.lastLatitude, me.lastLongitude, partner.lastLatitude, partner.lastLongitude)
+        dist_miles = haversine(my_lat, my_lon, partner_lat, partner_lon)
         dist_miles = round(dist_miles, 2)
-        
-        if dist_miles < 0.5:
-            distance_str = "With You ❤️"
-        elif dist_miles < 5:
-            distance_str = "Nearby"
-        else:
-            distance_str = f"{dist_miles} miles away"
+        distance_str = distance_label(dist_miles)
 
     return {"success": True, "data": {
         "emoji": partner.status_emoji,
@@ -458,13 +998,13 @@ def get_partner_status(user: User = Depends(get_current_user), db: Session = Dep
         "location": {
             "distanceStr": distance_str,
             "distanceMiles": dist_miles,
-            "lastUpdated": partner.lastLocationUpdate
+            "lastUpdated": partner_updated_at
         }
     }}
 
 @app.post("/api/partner/code")
-def generate_code(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    nearish_user = get_nearish_user(user, db)
+def generate_code(identity: Identity = Depends(get_identity), db: Session = Depends(get_db)):
+    nearish_user = identity.nearish_user
     
     if nearish_user.partner_id:
         raise HTTPException(status_code=400, detail="Already connected to a partner")
@@ -482,17 +1022,17 @@ def generate_code(user: User = Depends(get_current_user), db: Session = Depends(
             return {"code": code}
 
 @app.post("/api/partner/connect")
-async def connect_partner(payload: dict, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def connect_partner(payload: dict, identity: Identity = Depends(get_identity_async), db: AsyncSession = Depends(get_async_db)):
     code = payload.get("code")
     if not code:
         raise HTTPException(status_code=400, detail="Code is required")
         
-    me = get_nearish_user(user, db)
+    user, me = identity.user, identity.nearish_user
     
     if me.partner_id:
         raise HTTPException(status_code=400, detail="You already have a partner")
         
-    partner = db.query(NearishUser).filter(NearishUser.connection_code == code).first()
+    partner = (await db.scalars(select(NearishUser).where(NearishUser.connection_code == code))).first()
     
     if not partner:
         raise HTTPException(status_code=404, detail="Invalid connection code")
@@ -511,7 +1051,8 @@ async def connect_partner(payload: dict, user: User = Depends(get_current_user),
     me.connection_code = None
     partner.connection_code = None
     
-    db.commit()
+    await db.commit()
+    await invalidate_identities(nearish_user_ids=[me.id, partner.id])
     
     # Send Real-Time Event to Partner
     await manager.send_event(partner.id, "partner_connected", {
@@ -522,8 +1063,8 @@ async def connect_partner(payload: dict, user: User = Depends(get_current_user),
     return {"message": "Successfully connected!", "partner_id": partner.id}
 
 @app.post("/api/partner/nudge")
-async def send_nudge(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    me = get_nearish_user(user, db)
+async def send_nudge(identity: Identity = Depends(get_identity_async)):
+    user, me = identity.user, identity.nearish_user
     
     if not me.partner_id:
         raise HTTPException(status_code=400, detail="No partner connected")
@@ -537,13 +1078,13 @@ async def send_nudge(user: User = Depends(get_current_user), db: Session = Depen
     return {"success": True, "message": "Nudge sent"}
 
 @app.post("/api/partner/disconnect")
-async def disconnect_partner(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    me = get_nearish_user(user, db)
+async def disconnect_partner(identity: Identity = Depends(get_identity_async), db: AsyncSession = Depends(get_async_db)):
+    user, me = identity.user, identity.nearish_user
     
     if not me.partner_id:
         raise HTTPException(status_code=400, detail="No partner connected")
         
-    partner = db.query(NearishUser).filter(NearishUser.id == me.partner_id).first()
+    partner = identity.partner
     
     if partner:
         # Notify partner about disconnection
@@ -553,13 +1094,14 @@ async def disconnect_partner(user: User = Depends(get_current_user), db: Session
         partner.partner_id = None
     
     me.partner_id = None
-    db.commit()
+    await db.commit()
+    await invalidate_identities(nearish_user_ids=[me.id, partner.id] if partner else [me.id])
     
     return {"success": True, "message": "Disconnected from partner"}
 
 @app.post("/api/streak/check-in")
-def check_in_streak(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    nearish_user = get_nearish_user(user, db)
+def check_in_streak(identity: Identity = Depends(get_identity), db: Session = Depends(get_db)):
+    nearish_user = identity.nearish_user
 
     streak = db.query(Streak).filter(Streak.nearish_user_id == nearish_user.id).first()
     now = datetime.now(timezone.utc)
@@ -588,8 +1130,125 @@ def check_in_streak(user: User = Depends(get_current_user), db: Session = Depend
     db.commit()
     return {"currentStreak": 1, "message": "Streak reset."}
 
+# Direct-to-bucket uploads: the app PUTs the photo to a presigned URL, then finalizes with the key
+MEMORY_IMAGE_CONTENT_TYPES = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/heic": "heic",
+    "image/webp": "webp",
+}
+MEMORY_IMAGE_MAX_BYTES = int(os.getenv("MEMORY_IMAGE_MAX_BYTES", str(20 * 1024 * 1024)))
+MEMORY_UPLOAD_URL_EXPIRATION = 900
+
+def memory_object_keys(memory: Memory):
+    """Every bucket object owned by a memory: the original and its renditions."""
+    return [key for key in (memory.imagePath, memory.thumbnailPath, memory.previewPath) if key]
+
+async def generate_memory_renditions(memory_id: str, image_path: str):
+    """Background task: render thumbnail/preview for a memory's image and record them on the row."""
+    keys = await create_renditions(image_path)
+    if not keys:
+        return
+
+    async with AsyncSessionLocal() as db:
+        memory = await db.get(Memory, memory_id)
+        if not memory or memory.imagePath != image_path:
+            # The memory was deleted or its image replaced while we were rendering
+            queue_object_deletions(db, keys.values())
+            await db.commit()
+            return
+        memory.thumbnailPath = keys.get("thumb")
+        memory.previewPath = keys.get("preview")
+        await db.commit()
+
+async def verify_uploaded_image(nearish_user: NearishUser, image_key: str):
+    """Check that a client-uploaded object belongs to this user, exists and is an acceptable image."""
+    # is_valid_key first: "<id>/../<other id>/..." passes the prefix check but isn't under <id>/
+    if not is_valid_key(image_key) or not image_key.startswith(f"{nearish_user.id}/"):
+        raise HTTPException(status_code=403, detail="Not authorized to use this image")
+
+    uploaded = await head_object_async(image_key)
+    if not uploaded:
+        raise HTTPException(status_code=400, detail="Image has not been uploaded")
+
+    if uploaded["size"] > MEMORY_IMAGE_MAX_BYTES or uploaded["contentType"] not in MEMORY_IMAGE_CONTENT_TYPES:
+        await delete_file_from_s3_async(image_key)
+        raise HTTPException(status_code=400, detail="Image is too large or not a supported type")
+
+    return image_key
+
+@app.post("/api/memories/upload-url")
+def create_memory_upload_url(payload: dict, identity: Identity = Depends(get_identity)):
+    nearish_user = identity.nearish_user
+
+    if not nearish_user.is_pro:
+        raise HTTPException(status_code=403, detail="Memories require Nearish Unlimited")
+
+    content_type = payload.get("contentType")
+    if content_type not in MEMORY_IMAGE_CONTENT_TYPES:
+        raise HTTPException(status_code=400, detail="Unsupported image type")
+
+    object_name = f"{nearish_user.id}/{uuid.uuid4()}.{MEMORY_IMAGE_CONTENT_TYPES[content_type]}"
+    upload_url = generate_presigned_put_url(object_name, content_type, expiration=MEMORY_UPLOAD_URL_EXPIRATION)
+    if not upload_url:
+        raise HTTPException(status_code=502, detail="Could not create upload URL")
+
+    return {"success": True, "data": {
+        "uploadUrl": upload_url,
+        "imageKey": object_name,
+        # The signature covers Content-Type, so the PUT must send exactly this header
+        "headers": {"Content-Type": content_type},
+        "expiresIn": MEMORY_UPLOAD_URL_EXPIRATION,
+        "maxBytes": MEMORY_IMAGE_MAX_BYTES
+    }}
+
+@app.post("/api/memories/finalize")
+async def finalize_memory(
+    payload: FinalizeMemoryRequest,
+    background_tasks: BackgroundTasks,
+    identity: Identity = Depends(get_identity_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    user, nearish_user = identity.user, identity.nearish_user
+
+    if not nearish_user.is_pro:
+        raise HTTPException(status_code=403, detail="Memories require Nearish Unlimited")
+
+    image_path = await verify_uploaded_image(nearish_user, payload.imageKey) if payload.imageKey else None
+
+    new_memory = Memory(
+        nearish_user_id=nearish_user.id,
+        title=payload.title,
+        description=payload.description,
+        date=payload.date,
+        imagePath=image_path,
+        latitude=payload.latitude,
+        longitude=payload.longitude,
+        locationName=payload.locationName
+    )
+
+    db.add(new_memory)
+    await db.commit()
+    await db.refresh(new_memory)
+
+    if new_memory.imagePath:
+        background_tasks.add_task(generate_memory_renditions, new_memory.id, new_memory.imagePath)
+
+    return {"success": True, "data": {
+        "id": new_memory.id,
+        "title": new_memory.title,
+        "description": new_memory.description,
+        "date": new_memory.date,
+        "locationName": new_memory.locationName,
+        "latitude": new_memory.latitude,
+        "longitude": new_memory.longitude,
+        "imageUrl": get_presigned_url(new_memory.imagePath) if new_memory.imagePath else None,
+        "authorName": user.name or "Me"
+    }}
+
 @app.post("/api/memories")
 async def add_memory(
+    background_tasks: BackgroundTasks,
     title: str = Form(...),
     description: str = Form(None),
     date: str = Form(...),
@@ -597,10 +1256,10 @@ async def add_memory(
     longitude: float = Form(None),
     locationName: str = Form(None),
     image: UploadFile = File(None),
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    identity: Identity = Depends(get_identity_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    nearish_user = get_nearish_user(user, db)
+    user, nearish_user = identity.user, identity.nearish_user
 
     # Block non-pro users from creating memories
     if not nearish_user.is_pro:
@@ -610,7 +1269,7 @@ async def add_memory(
     if image:
         file_extension = image.filename.split('.')[-1]
         object_name = f"{nearish_user.id}/{uuid.uuid4()}.{file_extension}"
-        image_path = upload_file_to_s3(image.file, object_name)
+        image_path = await upload_file_to_s3_async(image.file, object_name)
         
     new_memory = Memory(
         nearish_user_id=nearish_user.id,
@@ -624,8 +1283,11 @@ async def add_memory(
     )
     
     db.add(new_memory)
-    db.commit()
-    db.refresh(new_memory)
+    await db.commit()
+    await db.refresh(new_memory)
+
+    if new_memory.imagePath:
+        background_tasks.add_task(generate_memory_renditions, new_memory.id, new_memory.imagePath)
     
     response_data = {
         "id": new_memory.id,
@@ -644,6 +1306,7 @@ async def add_memory(
 @app.put("/api/memories/{memory_id}")
 async def update_memory(
     memory_id: str,
+    background_tasks: BackgroundTasks,
     title: str = Form(None),
     description: str = Form(None),
     date: str = Form(None),
@@ -651,13 +1314,14 @@ async def update_memory(
     longitude: float = Form(None),
     locationName: str = Form(None),
     image: UploadFile = File(None),
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    imageKey: str = Form(None),
+    identity: Identity = Depends(get_identity_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    nearish_user = get_nearish_user(user, db)
+    user, nearish_user = identity.user, identity.nearish_user
     
     # Find existing memory
-    memory = db.query(Memory).filter(Memory.id == memory_id).first()
+    memory = await db.get(Memory, memory_id)
     
     if not memory:
         raise HTTPException(status_code=404, detail="Memory not found")
@@ -679,20 +1343,26 @@ async def update_memory(
     if locationName is not None:
         memory.locationName = locationName
         
-    # Handle Image Update
-    if image:
+    # Handle Image Update: either an already-uploaded key (presigned flow) or a legacy multipart file
+    image_path = None
+    if imageKey and imageKey != memory.imagePath:
+        image_path = await verify_uploaded_image(nearish_user, imageKey)
+    elif image:
         file_extension = image.filename.split('.')[-1]
         object_name = f"{nearish_user.id}/{uuid.uuid4()}.{file_extension}"
-        image_path = upload_file_to_s3(image.file, object_name)
-        
-        # Delete old image if exists
-        if memory.imagePath:
-            delete_file_from_s3(memory.imagePath)
-            
+        image_path = await upload_file_to_s3_async(image.file, object_name)
+
+    if image_path:
+        # Old image and its renditions are deleted in the background once this commits
+        queue_object_deletions(db, memory_object_keys(memory))
+
         memory.imagePath = image_path
+        memory.thumbnailPath = None
+        memory.previewPath = None
+        background_tasks.add_task(generate_memory_renditions, memory.id, image_path)
         
-    db.commit()
-    db.refresh(memory)
+    await db.commit()
+    await db.refresh(memory)
     
     return {"success": True, "data": {
         "id": memory.id,
@@ -710,10 +1380,10 @@ async def update_memory(
 @app.delete("/api/memories/{memory_id}")
 def delete_memory(
     memory_id: str,
-    user: User = Depends(get_current_user),
+    identity: Identity = Depends(get_identity),
     db: Session = Depends(get_db)
 ):
-    nearish_user = get_nearish_user(user, db)
+    nearish_user = identity.nearish_user
     memory = db.query(Memory).filter(Memory.id == memory_id).first()
     
     if not memory:
@@ -722,20 +1392,59 @@ def delete_memory(
     if memory.nearish_user_id != nearish_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this memory")
     
-    # Delete from S3 if exists
-    if memory.imagePath:
-        delete_file_from_s3(memory.imagePath)
-        
+    # The image and its renditions are deleted in the background once this commits
+    queue_object_deletions(db, memory_object_keys(memory))
     db.delete(memory)
     db.commit()
     
     return {"success": True, "message": "Memory deleted"}
 
+# --- Local storage backend (STORAGE_BACKEND=local) ---
+# Stands in for the bucket's presigned GET/PUT URLs when objects live on this node's disk.
+
+LOCAL_STORAGE_SPOOL_BYTES = 1024 * 1024
+
+@app.get("/api/storage/{key:path}")
+def get_local_object(key: str, expires: int, signature: str):
+    local = get_local_storage()
+    if not local:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not local.verify("GET", key, expires, signature):
+        raise HTTPException(status_code=403, detail="Invalid or expired signature")
+    try:
+        path = local.path_for(key)
+        stat_result = os.stat(path)
+    except (ValueError, FileNotFoundError):
+        raise HTTPException(status_code=404, detail="Not found")
+    # Keys are immutable (new uploads get new keys), so clients may cache until the URL expires
+    return FileResponse(path, stat_result=stat_result, headers={"Cache-Control": "private, max-age=3600"})
+
+@app.put("/api/storage/{key:path}")
+async def put_local_object(key: str, expires: int, signature: str, request: Request):
+    local = get_local_storage()
+    if not local:
+        raise HTTPException(status_code=404, detail="Not found")
+    content_type = request.headers.get("content-type", "")
+    if not local.verify("PUT", key, expires, signature, content_type):
+        raise HTTPException(status_code=403, detail="Invalid or expired signature")
+
+    with tempfile.SpooledTemporaryFile(max_size=LOCAL_STORAGE_SPOOL_BYTES) as body:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > MEMORY_IMAGE_MAX_BYTES:
+                raise HTTPException(status_code=413, detail="Object too large")
+            body.write(chunk)
+        body.seek(0)
+        if not await upload_file_to_s3_async(body, key, content_type):
+            raise HTTPException(status_code=500, detail="Could not store object")
+    return Response(status_code=200)
+
 import math
 
 def haversine(lat1, lon1, lat2, lon2):
     # Radius of Earth in miles
-    R = 3958.8 
+    R = EARTH_RADIUS_MILES
     
     phi1, phi2 = math.radians(lat1), math.radians(lat2)
     dphi = math.radians(lat2 - lat1)
@@ -746,87 +1455,285 @@ def haversine(lat1, lon1, lat2, lon2):
     
     return R * c
 
-# ... (Existing endpoints)
+def distance_bucket(dist_miles):
+    """Coarse distance class; a change here is always worth telling the couple about."""
+    if dist_miles is None:
+        return "unknown"
+    if dist_miles < WITH_YOU_MILES:
+        return "with_you"
+    if dist_miles < NEARBY_MILES:
+        return "nearby"
+    return "away"
+
+def distance_label(dist_miles):
+    bucket = distance_bucket(dist_miles)
+    if bucket == "with_you":
+        return "With You ❤️"
+    if bucket == "nearby":
+        return "Nearby"
+    return f"{dist_miles} miles away"
+
+def describe_partner_location(me: NearishUser, partner: NearishUser):
+    """Partner's position and distance as `me` sees it, or None if the partner has no location yet."""
+    partner_lat, partner_lon, partner_updated_at = current_location(partner)
+    if partner_lat is None or partner_lon is None:
+        return None
+
+    distance = None
+    status = "Unknown"
+    my_lat, my_lon, _ = current_location(me)
+
+    if my_lat is not None and my_lon is not None:
+        distance = round(haversine(my_lat, my_lon, partner_lat, partner_lon), 2)
+        status = distance_label(distance)
+
+    # Check if location is stale (> 1 hour old)
+    is_stale = False
+    if partner_updated_at:
+        if (datetime.now(timezone.utc) - partner_updated_at.replace(tzinfo=timezone.utc)) > timedelta(hours=1):
+            is_stale = True
+            status = f"Last seen {status}"
+
+    return {
+        "latitude": partner_lat,
+        "longitude": partner_lon,
+        "updatedAt": partner_updated_at,
+        "distanceMiles": distance,
+        "status": status,
+        "isStale": is_stale
+    }
+
+async def push_partner_location(me: NearishUser, partner: NearishUser):
+    """
+    Tell the partner where `me` is now, but only if `me` moved at least PARTNER_LOCATION_PUSH_MILES
+    since the last push or the distance bucket changed. A bucket change is sent to both, since
+    each side's label changes.
+    """
+    seen_by_partner = describe_partner_location(partner, me)
+    bucket = distance_bucket(seen_by_partner["distanceMiles"])
+    last = location_push_tracker.last(me.id)
+
+    bucket_changed = last is None or last[2] != bucket
+    if not bucket_changed:
+        moved = haversine(last[0], last[1], seen_by_partner["latitude"], seen_by_partner["longitude"])
+        if moved < PARTNER_LOCATION_PUSH_MILES:
+            return
+
+    location_push_tracker.mark(me.id, seen_by_partner["latitude"], seen_by_partner["longitude"], bucket)
+    seen_by_partner["updatedAt"] = seen_by_partner["updatedAt"].isoformat()
+    await manager.send_event(partner.id, "partner_location_update", seen_by_partner)
+
+    if bucket_changed:
+        seen_by_me = describe_partner_location(me, partner)
+        if seen_by_me:
+            location_push_tracker.mark(partner.id, seen_by_me["latitude"], seen_by_me["longitude"], bucket)
+            if seen_by_me["updatedAt"]:
+                seen_by_me["updatedAt"] = seen_by_me["updatedAt"].isoformat()
+            await manager.send_event(me.id, "partner_location_update", seen_by_me)
 
 @app.post("/api/location/update")
-def update_location(
+async def update_location(
     data: dict,
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    identity: Identity = Depends(get_identity_async)
 ):
-    nearish_user = get_nearish_user(user, db)
+    nearish_user = identity.nearish_user
     latitude = data.get("latitude")
     longitude = data.get("longitude")
     
+    # Buffered; written to nearish_user by the location flusher
     if latitude is not None and longitude is not None:
-        nearish_user.lastLatitude = latitude
-        nearish_user.lastLongitude = longitude
-        nearish_user.lastLocationUpdate = datetime.now(timezone.utc)
-        db.commit()
+        # A bad value would fail every batched flush it's part of, so reject it here
+        try:
+            latitude, longitude = float(latitude), float(longitude)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="latitude and longitude must be numbers")
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise HTTPException(status_code=400, detail="latitude or longitude out of range")
+        location_buffer.record(nearish_user.id, latitude, longitude, datetime.now(timezone.utc))
+        if identity.partner:
+            await push_partner_location(nearish_user, identity.partner)
     
     return {"success": True}
 
 @app.get("/api/location/partner")
-def get_partner_location(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    me = get_nearish_user(user, db)
+def get_partner_location(identity: Identity = Depends(get_identity), db: Session = Depends(get_db)):
+    me = identity.nearish_user
     
     if not me.partner_id:
         return {"success": False, "message": "No partner connected"}
         
-    partner = db.query(NearishUser).filter(NearishUser.id == me.partner_id).first()
+    partner = identity.partner
+    data = describe_partner_location(me, partner) if partner else None
     
-    if not partner or partner.lastLatitude is None or partner.lastLongitude is None:
+    if not data:
         return {"success": True, "data": None, "message": "Partner location unavailable"}
-    
-    distance = None
-    status = "Unknown"
-    
-    if me.lastLatitude is not None and me.lastLongitude is not None:
-        dist_miles = haversine(me.lastLatitude, me.lastLongitude, partner.lastLatitude, partner.lastLongitude)
-        distance = round(dist_miles, 2)
-        
-        if dist_miles < 0.5:
-            status = "With You ❤️"
-        elif dist_miles < 5:
-            status = "Nearby"
-        else:
-            status = f"{distance} miles away"
-            
-    # Check if location is stale (> 1 hour old)
-    is_stale = False
-    if partner.lastLocationUpdate:
-        if (datetime.now(timezone.utc) - partner.lastLocationUpdate.replace(tzinfo=timezone.utc)) > timedelta(hours=1):
-            is_stale = True
-            status = f"Last seen {status}"
+
+    return {"success": True, "data": data}
+
+LOCATION_TRACK_MAX_DAYS = 7
+
+def parse_iso_utc(value: str, name: str):
+    """ISO 8601 query parameter -> naive UTC, matching what UTCDateTime columns return."""
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def load_couple_tracks(db: Session, me: NearishUser, start_at: datetime, end_at: datetime, step: timedelta):
+    """
+    History for me (and partner) resampled onto a shared grid of step ends in (start_at, end_at]:
+    each grid point takes the person's latest point within that step. Returns (grid as epoch
+    seconds, {"me"/"partner": (lats, lons)}) with NaN where there was no point.
+    """
+    user_ids = {"me": me.id}
+    if me.partner_id:
+        user_ids["partner"] = me.partner_id
+
+    rows = db.query(
+        LocationHistory.nearish_user_id, LocationHistory.recorded_at,
+        LocationHistory.latitude_e5, LocationHistory.longitude_e5
+    ).filter(
+        LocationHistory.nearish_user_id.in_(user_ids.values()),
+        LocationHistory.recorded_at >= start_at,
+        LocationHistory.recorded_at < end_at
+    ).order_by(LocationHistory.nearish_user_id, LocationHistory.recorded_at).all()
+
+    points = {user_id: ([], [], []) for user_id in user_ids.values()}
+    for user_id, recorded_at, lat_e5, lon_e5 in rows:
+        times, lats, lons = points[user_id]
+        times.append(recorded_at.replace(tzinfo=timezone.utc).timestamp())
+        lats.append(lat_e5)
+        lons.append(lon_e5)
+
+    step_seconds = step.total_seconds()
+    start_ts = start_at.replace(tzinfo=timezone.utc).timestamp()
+    end_ts = end_at.replace(tzinfo=timezone.utc).timestamp()
+    grid = start_ts + step_seconds * np.arange(1, int((end_ts - start_ts) // step_seconds) + 1)
+
+    tracks = {}
+    for role, user_id in user_ids.items():
+        times, lats, lons = points[user_id]
+        lats, lons = sample_on_grid(times, lats, lons, grid, step_seconds)
+        tracks[role] = (lats / LOCATION_HISTORY_SCALE, lons / LOCATION_HISTORY_SCALE)
+    return grid, tracks
+
+def parse_track_range(start: str, end: str, step_minutes: int):
+    start_at, end_at = parse_iso_utc(start, "start"), parse_iso_utc(end, "end")
+    if end_at <= start_at or end_at - start_at > timedelta(days=LOCATION_TRACK_MAX_DAYS):
+        raise HTTPException(status_code=400, detail=f"Range must be positive and at most {LOCATION_TRACK_MAX_DAYS} days")
+    return start_at, end_at, timedelta(minutes=max(1, min(step_minutes, 60)))
+
+@app.get("/api/location/history")
+def get_location_history(
+    start: str,
+    end: str,
+    step_minutes: int = LOCATION_HISTORY_DOWNSAMPLE_MINUTES,
+    identity: Identity = Depends(get_identity),
+    db: Session = Depends(get_db)
+):
+    """
+    The couple's tracks on a shared time grid: for every step, each person's latest point within
+    that step (or null). Points older than a day are already downsampled to one per
+    LOCATION_HISTORY_DOWNSAMPLE_MINUTES, so smaller steps only add detail for the last 24h.
+    """
+    me = identity.nearish_user
+    start_at, end_at, step = parse_track_range(start, end, step_minutes)
+
+    grid, tracks = load_couple_tracks(db, me, start_at, end_at, step)
+
+    def as_points(lats, lons):
+        return [None if np.isnan(lat) else [float(lat), float(lon)] for lat, lon in zip(lats, lons)]
+
+    slots = [datetime.fromtimestamp(t, timezone.utc).replace(tzinfo=None) for t in grid]
+    tracks = {role: as_points(*track) for role, track in tracks.items()}
 
     return {"success": True, "data": {
-        "latitude": partner.lastLatitude,
-        "longitude": partner.lastLongitude,
-        "updatedAt": partner.lastLocationUpdate,
-        "distanceMiles": distance,
-        "status": status,
-        "isStale": is_stale
+        "stepMinutes": int(step.total_seconds() // 60),
+        "timestamps": slots,
+        "me": tracks["me"],
+        "partner": tracks.get("partner")
     }}
 
+@app.get("/api/location/together")
+def get_together_stats(
+    start: str,
+    end: str,
+    step_minutes: int = LOCATION_HISTORY_DOWNSAMPLE_MINUTES,
+    identity: Identity = Depends(get_identity),
+    db: Session = Depends(get_db)
+):
+    """Time together / nearby / apart, times met and distance stats for the couple over a range."""
+    me = identity.nearish_user
+    if not me.partner_id:
+        return {"success": False, "message": "No partner connected"}
+    start_at, end_at, step = parse_track_range(start, end, step_minutes)
+
+    _, tracks = load_couple_tracks(db, me, start_at, end_at, step)
+    distances = haversine_many(*tracks["me"], *tracks["partner"])
+    return {"success": True, "data": dict(together_stats(distances, step.total_seconds()),
+                                          stepMinutes=int(step.total_seconds() // 60))}
+
+MEMORIES_PAGE_SIZE = 50
+MEMORIES_MAX_PAGE_SIZE = 200
+
+def decode_memories_cursor(cursor: str):
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+MEMORY_IMAGE_SIZES = ("thumb", "preview", "original")
+
+def memory_image_url(memory: Memory, size: str):
+    """Presigned URL for the requested rendition, falling back to the original until it's rendered."""
+    key = {"thumb": memory.thumbnailPath, "preview": memory.previewPath}.get(size) or memory.imagePath
+    return get_presigned_url(key) if key else None
+
 @app.get("/api/memories")
-def get_memories(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    nearish_user = get_nearish_user(user, db)
+def get_memories(
+    limit: int = MEMORIES_PAGE_SIZE,
+    cursor: str = None,
+    size: str = "thumb",
+    identity: Identity = Depends(get_identity),
+    db: Session = Depends(get_db)
+):
+    nearish_user = identity.nearish_user
 
     # Return empty for non-pro users with message
     if not nearish_user.is_pro:
-        return {"success": True, "data": [], "is_pro": False, "message": "Upgrade to Nearish Unlimited to access memories"}
+        return {"success": True, "data": [], "is_pro": False, "message": "Upgrade to Nearish Unlimited to access memories", "nextCursor": None}
+
+    if size not in MEMORY_IMAGE_SIZES:
+        raise HTTPException(status_code=400, detail="size must be one of thumb, preview, original")
+    limit = max(1, min(limit, MEMORIES_MAX_PAGE_SIZE))
+    after = decode_memories_cursor(cursor) if cursor else None
 
     user_ids = [nearish_user.id]
     if nearish_user.partner_id:
         user_ids.append(nearish_user.partner_id)
-        
-    query = db.query(Memory, User.name).outerjoin(
-        NearishUser, Memory.nearish_user_id == NearishUser.id
+
+    # One index range scan per author on (nearish_user_id, date desc, id desc), merged and cut to the page.
+    # Fetch one extra row to know whether there's a next page.
+    branches = []
+    for author_id in user_ids:
+        branch = select(Memory).where(Memory.nearish_user_id == author_id)
+        if after:
+            branch = branch.where(after_cursor(Memory.date, Memory.id, after))
+        branches.append(branch.order_by(*page_order(Memory.date, Memory.id)).limit(limit + 1))
+    PageMemory = aliased(Memory, union_all(*branches).subquery())
+
+    query = db.query(PageMemory, User.name).outerjoin(
+        NearishUser, PageMemory.nearish_user_id == NearishUser.id
     ).outerjoin(
         User, NearishUser.better_auth_id == User.id
-    ).filter(Memory.nearish_user_id.in_(user_ids)).order_by(Memory.date.desc())
+    ).order_by(*page_order(PageMemory.date, PageMemory.id)).limit(limit + 1)
     
     memories_with_names = query.all()
+    has_more = len(memories_with_names) > limit
+    memories_with_names = memories_with_names[:limit]
     
     results = []
     for m, author_name in memories_with_names:
@@ -838,25 +1745,303 @@ def get_memories(user: User = Depends(get_current_user), db: Session = Depends(g
             "locationName": m.locationName,
             "latitude": m.latitude,
             "longitude": m.longitude,
-            "imageUrl": get_presigned_url(m.imagePath) if m.imagePath else None,
+            "imageUrl": memory_image_url(m, size),
+            "fullImageUrl": get_presigned_url(m.imagePath) if m.imagePath else None,
             "authorName": author_name or "Partner",
             "isMine": m.nearish_user_id == nearish_user.id
         })
     
-    return {"success": True, "data": results}
+    last = memories_with_names[-1][0]
+    next_cursor = encode_cursor(last.date, last.id) if has_more else None
+    return {"success": True, "data": results, "nextCursor": next_cursor}
+
+MEMORIES_NEAR_MAX_RESULTS = 500
+MEMORIES_NEAR_MAX_RADIUS_MILES = 500
+
+def parse_bounds(min_lat, min_lon, max_lat, max_lon):
+    if None in (min_lat, min_lon, max_lat, max_lon):
+        raise HTTPException(status_code=400, detail="Pass latitude, longitude and radius_miles, or min_lat, min_lon, max_lat and max_lon")
+    # min_lon > max_lon is a box that wraps across the antimeridian; it's queried as two boxes
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        raise HTTPException(status_code=400, detail="Invalid bounding box")
+    return split_at_antimeridian(min_lat, min_lon, max_lat, max_lon)
+
+def distance_miles_sql(latitude: float, longitude: float):
+    """SQL haversine distance in miles from a point to Memory's coordinates (same formula as haversine)."""
+    lat, lon = func.radians(Memory.latitude), func.radians(Memory.longitude)
+    phi = math.radians(latitude)
+    a = (func.power(func.sin((lat - phi) * 0.5), 2)
+         + math.cos(phi) * func.cos(lat) * func.power(func.sin((lon - math.radians(longitude)) * 0.5), 2))
+    return 2 * EARTH_RADIUS_MILES * func.asin(func.sqrt(func.least(a, 1.0)))
+
+def memories_in_box(user_ids, boxes):
+    """
+    Memories of these authors inside any of the boxes: index range scans over covering geohash cells,
+    then an exact bounds check. Returns the filter and the cells of the first box.
+    """
+    conditions = []
+    box_cells = []
+    for min_lat, min_lon, max_lat, max_lon in boxes:
+        cells = covering_cells(min_lat, min_lon, max_lat, max_lon)
+        box_cells.append(cells)
+        conditions.append(and_(
+            or_(*[and_(Memory.geohash >= cell, Memory.geohash < cell + PREFIX_RANGE_END) for cell in cells]),
+            Memory.latitude.between(min_lat, max_lat),
+            Memory.longitude.between(min_lon, max_lon)
+        ))
+    return and_(Memory.nearish_user_id.in_(user_ids), or_(*conditions)), box_cells[0]
+
+@app.get("/api/memories/near")
+def get_memories_near(
+    latitude: float = None,
+    longitude: float = None,
+    radius_miles: float = None,
+    min_lat: float = None,
+    min_lon: float = None,
+    max_lat: float = None,
+    max_lon: float = None,
+    size: str = "thumb",
+    identity: Identity = Depends(get_identity),
+    db: Session = Depends(get_db)
+):
+    """The couple's memories within radius_miles of a point (nearest first) or inside a bounding box (newest first)."""
+    nearish_user = identity.nearish_user
+
+    if not nearish_user.is_pro:
+        return {"success": True, "data": [], "is_pro": False, "message": "Upgrade to Nearish Unlimited to access memories"}
+    if size not in MEMORY_IMAGE_SIZES:
+        raise HTTPException(status_code=400, detail="size must be one of thumb, preview, original")
+
+    by_radius = latitude is not None and longitude is not None and radius_miles is not None
+    if by_radius:
+        if not (0 < radius_miles <= MEMORIES_NEAR_MAX_RADIUS_MILES):
+            raise HTTPException(status_code=400, detail=f"radius_miles must be between 0 and {MEMORIES_NEAR_MAX_RADIUS_MILES}")
+        bounds = radius_boxes(latitude, longitude, radius_miles)
+    else:
+        bounds = parse_bounds(min_lat, min_lon, max_lat, max_lon)
+
+    user_ids = [nearish_user.id]
+    if nearish_user.partner_id:
+        user_ids.append(nearish_user.partner_id)
+
+    in_box, _ = memories_in_box(user_ids, bounds)
+    if by_radius:
+        # Exact distance filter and ordering in SQL, so the limit keeps the nearest memories
+        distance = distance_miles_sql(latitude, longitude)
+        query = db.query(Memory, User.name, distance).filter(in_box, distance <= radius_miles).order_by(distance, Memory.id)
+    else:
+        query = db.query(Memory, User.name, literal(None)).filter(in_box).order_by(Memory.date.desc(), Memory.id.desc())
+    rows = query.outerjoin(
+        NearishUser, Memory.nearish_user_id == NearishUser.id
+    ).outerjoin(
+        User, NearishUser.better_auth_id == User.id
+    ).limit(MEMORIES_NEAR_MAX_RESULTS).all()
+
+    results = []
+    for m, author_name, distance in rows:
+        results.append({
+            "id": m.id,
+            "title": m.title,
+            "description": m.description,
+            "date": m.date,
+            "locationName": m.locationName,
+            "latitude": m.latitude,
+            "longitude": m.longitude,
+            "distanceMiles": round(distance, 2) if distance is not None else None,
+            "imageUrl": memory_image_url(m, size),
+            "authorName": author_name or "Partner",
+            "isMine": m.nearish_user_id == nearish_user.id
+        })
+
+    return {"success": True, "data": results, "truncated": len(rows) == MEMORIES_NEAR_MAX_RESULTS}
+
+@app.get("/api/memories/clusters")
+def get_memory_clusters(
+    min_lat: float = None,
+    min_lon: float = None,
+    max_lat: float = None,
+    max_lon: float = None,
+    precision: int = None,
+    identity: Identity = Depends(get_identity),
+    db: Session = Depends(get_db)
+):
+    """
+    Memory counts per geohash cell inside the map viewport, for drawing clusters. By default cells
+    are two levels finer than the ones covering the viewport (roughly a 6x6 grid per cover cell).
+    """
+    nearish_user = identity.nearish_user
+
+    if not nearish_user.is_pro:
+        return {"success": True, "data": [], "is_pro": False, "message": "Upgrade to Nearish Unlimited to access memories"}
+
+    bounds = parse_bounds(min_lat, min_lon, max_lat, max_lon)
+    user_ids = [nearish_user.id]
+    if nearish_user.partner_id:
+        user_ids.append(nearish_user.partner_id)
+
+    in_box, cells = memories_in_box(user_ids, bounds)
+    if precision is None:
+        precision = len(cells[0]) + 2
+    precision = max(1, min(precision, GEOHASH_PRECISION))
+
+    cell = func.substr(Memory.geohash, 1, precision).label("cell")
+    rows = db.query(
+        cell, func.count(Memory.id), func.avg(Memory.latitude), func.avg(Memory.longitude)
+    ).filter(in_box).group_by(cell).all()
+
+    return {"success": True, "precision": precision, "data": [
+        {"cell": cell_hash, "count": count, "latitude": lat, "longitude": lon}
+        for cell_hash, count, lat, lon in rows
+    ]}
 
 @app.get("/api/games")
-def get_games(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_games(identity: Identity = Depends(get_identity), db: Session = Depends(get_db)):
     games = db.query(Games).all()
     return {"success": True, "data": [{"id": g.id, "name": g.name} for g in games]}
 
+GAME_SESSION_SIZE = 10
+
+def unused_questions_filter(game_id: int, couple_ids):
+    """Questions of this game that the couple hasn't had in any session (an anti-join on the link table)."""
+    seen = select(CoupleSessionQuestion.question_id).join(
+        CoupleGameSession, CoupleGameSession.id == CoupleSessionQuestion.session_id
+    ).where(
+        CoupleSessionQuestion.question_id == GameQuestion.id,
+        CoupleGameSession.user_1_id == couple_ids[0],
+        CoupleGameSession.user_2_id == couple_ids[1]
+    )
+    return and_(GameQuestion.game_id == game_id, ~seen.exists())
+
+def unused_questions_select(game_id: int, couple_ids, limit: int = GAME_SESSION_SIZE):
+    """Up to `limit` random unused questions, sampled in the database, so cost doesn't grow with history."""
+    return select(GameQuestion).where(
+        unused_questions_filter(game_id, couple_ids)
+    ).order_by(func.random()).limit(limit)
+
+def store_generated_questions(db: Session, game_id: int, items) -> int:
+    """Add LLM-generated items to a game's pool, skipping ones it already has. Returns how many were added."""
+    return len(insert_question_texts(db, GameQuestion.game_id, GameQuestion.question_text, game_id, items))
+
+# --- Question pool replenisher ---
+# Blocking work (DB counts, the LLM call) runs in worker threads with its own sync session.
+
+def measure_question_pool(game_id: int, requesting_couples=()):
+    """
+    (fewest unused questions among the most active couples and the couples that asked for a refill,
+    total pool size) for a game.
+    """
+    db = SessionLocal()
+    try:
+        pool_size = db.query(func.count(GameQuestion.id)).filter(GameQuestion.game_id == game_id).scalar()
+        since = datetime.now(timezone.utc) - timedelta(days=QUESTION_POOL_ACTIVE_DAYS)
+        active_couples = db.query(CoupleGameSession.user_1_id, CoupleGameSession.user_2_id).filter(
+            CoupleGameSession.game_id == game_id,
+            CoupleGameSession.createdAt >= since
+        ).group_by(
+            CoupleGameSession.user_1_id, CoupleGameSession.user_2_id
+        ).order_by(func.count().desc()).limit(QUESTION_POOL_ACTIVE_COUPLES).all()
+
+        # A couple that hasn't played yet sees the whole pool
+        min_unused = pool_size
+        for couple_ids in set(map(tuple, active_couples)) | set(requesting_couples):
+            unused = db.query(func.count(GameQuestion.id)).filter(unused_questions_filter(game_id, couple_ids)).scalar()
+            min_unused = min(min_unused, unused)
+        return min_unused, pool_size
+    finally:
+        db.close()
+
+def refill_question_pool(game_id: int):
+    """(items the LLM generated, how many were new), or None if the game has nothing to generate from."""
+    db = SessionLocal()
+    try:
+        game = db.query(Games).filter(Games.id == game_id).first()
+        if not game or not game.system_prompt:
+            return None
+        # A cached response would only repeat questions the pool already has
+        items = generate_questions(game.system_prompt, cache=False)
+        added = store_generated_questions(db, game_id, items)
+        db.commit()
+        return len(items), added
+    finally:
+        db.close()
+
+def games_with_prompts():
+    db = SessionLocal()
+    try:
+        return [game_id for (game_id,) in db.query(Games.id).filter(Games.system_prompt.isnot(None)).all()]
+    finally:
+        db.close()
+
+async def check_question_pool(game_id: int, requesting_couples, semaphore: asyncio.Semaphore):
+    async with semaphore:
+        try:
+            min_unused, pool_size = await asyncio.to_thread(measure_question_pool, game_id, requesting_couples)
+            question_pool.record_depth(game_id, min_unused, pool_size)
+            if min_unused >= QUESTION_POOL_LOW_WATER:
+                return
+
+            started = time.perf_counter()
+            try:
+                result = await asyncio.to_thread(refill_question_pool, game_id)
+            except Exception:
+                question_pool.record_refill(time.perf_counter() - started, 0, False)
+                raise
+            if result is None:
+                return
+            generated, added = result
+            # generate_questions returns [] when the LLM call fails; an all-duplicate batch isn't an error
+            question_pool.record_refill(time.perf_counter() - started, added, generated > 0)
+            question_pool.record_depth(game_id, min_unused + added, pool_size + added)
+        except Exception as e:
+            print(f"Error refilling question pool for game {game_id}: {e}")
+
+async def run_question_pool_replenisher():
+    semaphore = asyncio.Semaphore(QUESTION_POOL_MAX_CONCURRENT_REFILLS)
+    # game id -> running check, so a game is never refilled twice at once
+    in_flight = {}
+    next_full_check = 0.0
+
+    while True:
+        try:
+            requests = question_pool.take_requests()
+            if time.monotonic() >= next_full_check:
+                for game_id in await asyncio.to_thread(games_with_prompts):
+                    requests.setdefault(game_id, set())
+                next_full_check = time.monotonic() + QUESTION_POOL_CHECK_SECONDS
+
+            for game_id, couples in requests.items():
+                if game_id in in_flight:
+                    # Check again once the running one is done, so the requesting couples aren't lost
+                    if couples:
+                        question_pool.request_refill(game_id, couples)
+                    continue
+                task = asyncio.create_task(check_question_pool(game_id, couples, semaphore))
+                in_flight[game_id] = task
+                task.add_done_callback(lambda t, game_id=game_id: in_flight.pop(game_id, None))
+        except Exception as e:
+            print(f"Question pool replenisher error: {e}")
+        await asyncio.sleep(QUESTION_POOL_REQUEST_POLL_SECONDS)
+
+question_pool_task = None
+
+@app.on_event("startup")
+async def start_question_pool_replenisher():
+    global question_pool_task
+    question_pool_task = asyncio.create_task(run_question_pool_replenisher())
+
+@app.on_event("shutdown")
+async def stop_question_pool_replenisher():
+    if question_pool_task:
+        question_pool_task.cancel()
+        await asyncio.gather(question_pool_task, return_exceptions=True)
+
 @app.post("/api/games/{game_id}/start")
 def start_game(
     game_id: int,
-    user: User = Depends(get_current_user),
+    identity: Identity = Depends(get_identity),
     db: Session = Depends(get_db)
 ):
-    me = get_nearish_user(user, db)
+    me = identity.nearish_user
     
     if not me.partner_id:
         raise HTTPException(status_code=400, detail="Partner connection required")
@@ -877,82 +2062,51 @@ def start_game(
     
     if session:
         # Session exists, fetch questions
-        q_ids = json.loads(session.question_ids)
-        questions = db.query(GameQuestion).filter(GameQuestion.id.in_(q_ids)).all()
-    else:
-        # 2. No active session. Check question pool.
-        # Find questions NOT answered by this couple
-        # For now, let's just find questions not in previous sessions?
-        # Simpler: Get all questions for this game.
-        # Filter out questions that are in any PAST completed sessions for this couple.
-        
-        # Get all question IDs used in past sessions
-        past_sessions = db.query(CoupleGameSession).filter(
-            CoupleGameSession.game_id == game_id,
-            CoupleGameSession.user_1_id == couple_ids[0],
-            CoupleGameSession.user_2_id == couple_ids[1]
+        questions = db.scalars(
+            select(GameQuestion).join(
+                CoupleSessionQuestion, CoupleSessionQuestion.question_id == GameQuestion.id
+            ).where(
+                CoupleSessionQuestion.session_id == session.id
+            ).order_by(CoupleSessionQuestion.position)
         ).all()
+    else:
+        # 2. No active session. Pick questions this couple hasn't had in any session yet
+        candidates = db.scalars(unused_questions_select(game_id, couple_ids)).all()
         
-        used_q_ids = set()
-        for s in past_sessions:
-            try:
-                ids = json.loads(s.question_ids)
-                used_q_ids.update(ids)
-            except:
-                pass
-        
-        # Get potential questions
-        # We limit to finding 10 unused ones.
-        
-        all_questions_query = db.query(GameQuestion).filter(GameQuestion.game_id == game_id)
-        # SQLAlchemy doesn't have a clean "NOT IN JSON" easily without native JSON types,
-        # but we can fetch candidates and filter in python if the pool isn't massive.
-        # Assuming the pool is < 1000 for now.
-        
-        all_candidates = all_questions_query.all()
-        candidates = [q for q in all_candidates if q.id not in used_q_ids]
-        
-        if len(candidates) < 10:
-            # 3. Call LLM to generate more
+        if len(candidates) < GAME_SESSION_SIZE:
+            # 3. Not enough for a full session: the replenisher keeps pools well above a session's worth,
+            # so this couple has outrun it. Have it measure them from now on, and generate inline so this
+            # session isn't short (as start_game always has)
+            question_pool.request_refill(game_id, [couple_ids])
             game = db.query(Games).filter(Games.id == game_id).first()
             if not game:
                 raise HTTPException(status_code=404, detail="Game not found")
                 
             if game.system_prompt:
-                # Generate new questions
-                new_items = generate_questions(game.system_prompt, [q.question_text for q in candidates])
-                
-                new_questions = []
-                for item in new_items:
-                    # Ensure we store a string
-                    if isinstance(item, (dict, list)):
-                        text_val = json.dumps(item)
-                    else:
-                        text_val = str(item)
-                        
-                    # Check dupe text locally to be safe
-                    if not db.query(GameQuestion).filter(GameQuestion.game_id == game_id, GameQuestion.question_text == text_val).first():
-                        nq = GameQuestion(game_id=game_id, question_text=text_val)
-                        db.add(nq)
-                        new_questions.append(nq)
-                
+                question_pool.record_inline_fallback()
+                store_generated_questions(db, game_id, generate_questions(game.system_prompt, cache=False))
                 db.commit()
                 # Refresh candidates
-                candidates.extend(new_questions)
+                candidates = db.scalars(unused_questions_select(game_id, couple_ids)).all()
         
-        # 4. Select 10 questions (or fewer if we still don't have enough)
-        selected_questions = random.sample(candidates, min(len(candidates), 10))
+        # 4. The sample is already random (or smaller if we still don't have enough)
+        selected_questions = candidates
         selected_ids = [q.id for q in selected_questions]
         
         # 5. Create Session
         new_session = CoupleGameSession(
+            id=str(uuid.uuid4()),
             game_id=game_id,
             user_1_id=couple_ids[0],
             user_2_id=couple_ids[1],
-            question_ids=json.dumps(selected_ids),
             is_active=True
         )
         db.add(new_session)
+        db.flush()
+        db.add_all([
+            CoupleSessionQuestion(session_id=new_session.id, question_id=question_id, position=position)
+            for position, question_id in enumerate(selected_ids)
+        ])
         db.commit()
         db.refresh(new_session)
         
@@ -1000,10 +2154,10 @@ def start_game(
 async def answer_question(
     game_id: int,
     payload: dict,
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    identity: Identity = Depends(get_identity_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    me = get_nearish_user(user, db)
+    me = identity.nearish_user
     
     session_id = payload.get("sessionId")
     question_id = payload.get("questionId")
@@ -1012,16 +2166,16 @@ async def answer_question(
     if not session_id or not question_id or not answer_text:
         raise HTTPException(status_code=400, detail="Missing fields")
         
-    session = db.query(CoupleGameSession).filter(CoupleGameSession.id == session_id).first()
+    session = await db.get(CoupleGameSession, session_id)
     if not session or not session.is_active:
         raise HTTPException(status_code=400, detail="Invalid session")
         
     # Check if answer exists
-    existing = db.query(GameAnswer).filter(
+    existing = (await db.scalars(select(GameAnswer).where(
         GameAnswer.session_id == session_id,
         GameAnswer.question_id == question_id,
         GameAnswer.user_id == me.id
-    ).first()
+    ))).first()
     
     if existing:
         existing.answer_text = answer_text
@@ -1034,14 +2188,14 @@ async def answer_question(
         )
         db.add(new_ans)
     
-    db.commit()
+    await db.commit()
     
     # Check if this completes the question (both answered)
-    partner_ans = db.query(GameAnswer).filter(
+    partner_ans = (await db.scalars(select(GameAnswer).where(
         GameAnswer.session_id == session_id,
         GameAnswer.question_id == question_id,
         GameAnswer.user_id == me.partner_id
-    ).first()
+    ))).first()
     
     if partner_ans:
         # Notify Partner that I answered (and now it's revealed!)
@@ -1064,10 +2218,10 @@ async def answer_question(
 @app.post("/api/games/{game_id}/restart")
 def restart_game(
     game_id: int,
-    user: User = Depends(get_current_user),
+    identity: Identity = Depends(get_identity),
     db: Session = Depends(get_db)
 ):
-    me = get_nearish_user(user, db)
+    me = identity.nearish_user
     
     if not me.partner_id:
         raise HTTPException(status_code=400, detail="Partner connection required")
@@ -1098,8 +2252,8 @@ def restart_game(
 # --- Questions Feature Endpoints ---
 
 @app.get("/api/questions/categories")
-def get_question_categories(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    me = get_nearish_user(user, db)
+def get_question_categories(identity: Identity = Depends(get_identity), db: Session = Depends(get_db)):
+    me = identity.nearish_user
     categories = db.query(QuestionCategory).all()
     
     data = []
@@ -1127,8 +2281,8 @@ def get_question_categories(user: User = Depends(get_current_user), db: Session
     return {"success": True, "data": data}
 
 @app.get("/api/questions/categories/{category_id}/questions")
-def get_questions_by_category(category_id: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    me = get_nearish_user(user, db)
+def get_questions_by_category(category_id: str, identity: Identity = Depends(get_identity), db: Session = Depends(get_db)):
+    me = identity.nearish_user
     partner_id = me.partner_id
 
     questions = db.query(Question).filter(Question.category_id == category_id).all()
@@ -1184,8 +2338,8 @@ def get_questions_by_category(category_id: str, user: User = Depends(get_current
     }
 
 @app.post("/api/questions/{question_id}/answer")
-def answer_question_card(question_id: str, payload: dict = {}, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    me = get_nearish_user(user, db)
+def answer_question_card(question_id: str, payload: dict = {}, identity: Identity = Depends(get_identity), db: Session = Depends(get_db)):
+    me = identity.nearish_user
 
     # Check if already answered
     existing = db.query(UserQuestionAnswer).filter(
@@ -1206,12 +2360,12 @@ def answer_question_card(question_id: str, payload: dict = {}, user: User = Depe
     return {"success": True}
 
 @app.get("/api/questions/daily")
-def get_daily_question(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_daily_question(identity: Identity = Depends(get_identity), db: Session = Depends(get_db)):
     """
     Returns the daily question for the couple.
     The question is deterministic based on the current date so both partners get the same question.
     """
-    me = get_nearish_user(user, db)
+    me = identity.nearish_user
     partner_id = me.partner_id
 
     # Get total count of questions to cycle through
@@ -1306,9 +2460,9 @@ async def send_expo_push_notification(push_tokens: list, title: str, body: str,
             return {"success": False, "error": str(e)}
 
 @app.post("/api/push-token")
-def register_push_token(payload: dict, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def register_push_token(payload: dict, identity: Identity = Depends(get_identity), db: Session = Depends(get_db)):
     """Register or update push token for the current user"""
-    nearish_user = get_nearish_user(user, db)
+    nearish_user = identity.nearish_user
     token = payload.get("token")
 
     if not token:
@@ -1320,19 +2474,19 @@ def register_push_token(payload: dict, user: User = Depends(get_current_user), d
     return {"success": True, "message": "Push token registered"}
 
 @app.post("/api/user/subscription")
-def update_subscription_status(payload: dict, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def update_subscription_status(payload: dict, identity: Identity = Depends(get_identity), db: Session = Depends(get_db)):
     """Update user's subscription status (synced from RevenueCat)
 
     When a user subscribes, their partner automatically gets pro access too.
     """
-    nearish_user = get_nearish_user(user, db)
+    nearish_user = identity.nearish_user
     client_has_sub = payload.get("isPro", False)
 
     # Check if partner has a valid subscription that can be shared
     partner_has_sharable_sub = False
     partner = None
     if nearish_user.partner_id:
-        partner = db.query(NearishUser).filter(NearishUser.id == nearish_user.partner_id).first()
+        partner = identity.partner
         if partner and partner.is_pro and not partner.is_pro_via_partner:
             partner_has_sharable_sub = True
 
@@ -1391,7 +2545,7 @@ async def send_notification_to_user(
     user_id: str,
     payload: dict,
     is_admin: bool = Depends(verify_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Send notification to a specific user"""
     title = payload.get("title", "Nearish")
@@ -1402,7 +2556,7 @@ async def send_notification_to_user(
         raise HTTPException(status_code=400, detail="Body is required")
 
     # Find user by ID
-    target_user = db.query(NearishUser).filter(NearishUser.id == user_id).first()
+    target_user = await db.get(NearishUser, user_id)
     if not target_user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -1416,7 +2570,7 @@ async def send_notification_to_user(
 async def send_notification_to_all(
     payload: dict,
     is_admin: bool = Depends(verify_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Send notification to all users with push tokens"""
     title = payload.get("title", "Nearish")
@@ -1427,8 +2581,8 @@ async def send_notification_to_all(
         raise HTTPException(status_code=400, detail="Body is required")
 
     # Get all users with push tokens
-    users = db.query(NearishUser).filter(NearishUser.push_token.isnot(None)).all()
-    tokens = [u.push_token for u in users if u.push_token]
+    tokens = (await db.scalars(select(NearishUser.push_token).where(NearishUser.push_token.isnot(None)))).all()
+    tokens = [t for t in tokens if t]
 
     if not tokens:
         return {"success": False, "message": "No users with push tokens found"}
@@ -1456,10 +2610,70 @@ def get_admin_metrics(is_admin: bool = Depends(verify_admin), db: Session = Depe
             "activeUsers": active_users,
             "totalMemories": total_memories,
             "totalGameSessions": total_sessions,
-            "totalQuestionsAnswered": total_answers
+            "totalQuestionsAnswered": total_answers,
+            "authCache": auth_cache.stats(),
+            "sse": manager.stats(),
+            "presignedUrlCache": get_presigned_url_cache_stats(),
+            "storage": get_storage_metrics(),
+            "pendingStorageDeletions": db.query(PendingStorageDeletion).count(),
+            "parkedStorageDeletions": db.query(PendingStorageDeletion).filter(PendingStorageDeletion.next_attempt_at.is_(None)).count(),
+            "locationBuffer": location_buffer.stats(),
+            "questionPool": question_pool.stats(),
+            "llm": llm_stats.stats()
         }
     }
 
+RENDITION_BACKFILL_CONCURRENCY = 4
+
+async def backfill_memory_renditions(limit: int):
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(Memory.id, Memory.imagePath)
+            .where(Memory.imagePath.isnot(None), Memory.thumbnailPath.is_(None))
+            .limit(limit)
+        )).all()
+
+    semaphore = asyncio.Semaphore(RENDITION_BACKFILL_CONCURRENCY)
+
+    async def render(memory_id, image_path):
+        async with semaphore:
+            await generate_memory_renditions(memory_id, image_path)
+
+    await asyncio.gather(*(render(memory_id, image_path) for memory_id, image_path in rows))
+    print(f"Rendition backfill processed {len(rows)} memories")
+
+@app.post("/api/admin/memories/renditions/backfill")
+async def backfill_renditions(background_tasks: BackgroundTasks, limit: int = 500, is_admin: bool = Depends(verify_admin)):
+    """Render thumbnails/previews for memories uploaded before the rendition pipeline. Call repeatedly until pending is 0."""
+    async with AsyncSessionLocal() as db:
+        pending = await db.scalar(
+            select(func.count()).select_from(Memory)
+            .where(Memory.imagePath.isnot(None), Memory.thumbnailPath.is_(None))
+        )
+    background_tasks.add_task(backfill_memory_renditions, limit)
+    return {"success": True, "pending": pending, "queued": min(pending, limit)}
+
+@app.post("/api/admin/storage/reconcile")
+async def reconcile_storage(dry_run: bool = True, is_admin: bool = Depends(verify_admin)):
+    """Queue deletion of bucket objects that no memory references (e.g. leaked before the deletion queue existed)."""
+    # List first: anything uploaded after this point is simply not considered
+    objects = await list_objects_async()
+    cutoff = datetime.now(timezone.utc) - STORAGE_RECONCILE_GRACE
+
+    async with AsyncSessionLocal() as db:
+        referenced = set()
+        for row in await db.execute(select(Memory.imagePath, Memory.thumbnailPath, Memory.previewPath)):
+            referenced.update(row)
+        referenced.update(await db.scalars(select(PendingStorageDeletion.object_key)))
+
+        orphans = [key for key, last_modified in objects if key not in referenced and last_modified < cutoff]
+        if not dry_run and orphans:
+            queue_object_deletions(db, orphans)
+            await db.commit()
+
+    return {"success": True, "dryRun": dry_run, "objects": len(objects), "orphans": len(orphans),
+            "sample": orphans[:20]}
+
 @app.get("/api/admin/users")
 def get_all_users(is_admin: bool = Depends(verify_admin), db: Session = Depends(get_db)):
     """Get all users"""
@@ -0,0 +1,43 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, or_, tuple_
+
+# Keyset pagination of the memories feed on (date, id), newest first. date is nullable: undated
+# memories sort first, which is where Postgres puts NULLs for DESC anyway, so the feed order is
+# unchanged and ix_memory_user_date_id (date DESC, id DESC) serves both the order and the ranges.
+
+Cursor = Tuple[Optional[datetime], str]
+
+
+def page_order(date_column, id_column):
+    return date_column.desc().nulls_first(), id_column.desc()
+
+
+def after_cursor(date_column, id_column, after: Cursor):
+    """Condition for rows that come after `after` in page_order."""
+    date, memory_id = after
+    if date is None:
+        # The rest of the undated memories, then every dated one
+        return or_(and_(date_column.is_(None), id_column < memory_id), date_column.isnot(None))
+    # Undated rows came earlier; a NULL date makes the comparison unknown, so they drop out here
+    return tuple_(date_column, id_column) < tuple_(date, memory_id)
+
+
+def encode_cursor(date: Optional[datetime], memory_id: str) -> str:
+    raw = json.dumps([date.isoformat() if date is not None else None, memory_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Inverse of encode_cursor. Raises ValueError for anything it didn't produce."""
+    try:
+        date_str, memory_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        date = datetime.fromisoformat(date_str) if date_str is not None else None
+    except TypeError as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+    if not isinstance(memory_id, str):
+        raise ValueError("Invalid cursor: id must be a string")
+    return date, memory_id
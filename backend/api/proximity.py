@@ -0,0 +1,88 @@
+import numpy as np
+
+# Shared with the scalar haversine and the "With You / Nearby / N miles" labels in main.py
+EARTH_RADIUS_MILES = 3958.8
+WITH_YOU_MILES = 0.5
+NEARBY_MILES = 5
+
+# Being apart for less than this doesn't end a meeting (GPS jitter around the 0.5 mi line,
+# a quick errand), so it isn't counted as meeting again
+MEETING_MIN_GAP_SECONDS = 30 * 60
+
+
+def haversine_many(lat1, lon1, lat2, lon2):
+    """Element-wise great-circle distance in miles between arrays of points (NaN in, NaN out)."""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(np.asarray(lon2) - np.asarray(lon1))
+
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    # arcsin(sqrt(a)) == atan2(sqrt(a), sqrt(1 - a)) for a in [0, 1], and is cheaper
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def sample_on_grid(times, lats, lons, grid, max_age):
+    """
+    Resample a track onto grid: for each grid time, the latest point at or before it that is less
+    than max_age seconds old. Times are sorted epoch seconds. Returns (lats, lons) with NaN gaps.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    grid = np.asarray(grid, dtype=np.float64)
+    if times.size == 0:
+        empty = np.full(grid.shape, np.nan)
+        return empty, empty.copy()
+
+    index = np.searchsorted(times, grid, side="right") - 1
+    safe_index = np.clip(index, 0, None)
+    valid = (index >= 0) & (grid - times[safe_index] < max_age)
+    return (np.where(valid, np.asarray(lats, dtype=np.float64)[safe_index], np.nan),
+            np.where(valid, np.asarray(lons, dtype=np.float64)[safe_index], np.nan))
+
+
+def count_meetings(together, min_gap_steps):
+    """Starts of together-runs that follow at least min_gap_steps samples that weren't together."""
+    together = np.asarray(together, dtype=bool)
+    if together.size == 0:
+        return 0
+    # recent[i]: was any of the min_gap_steps samples before i together?
+    cumulative = np.concatenate(([0], np.cumsum(together)))
+    index = np.arange(together.size)
+    recent = cumulative[index] - cumulative[np.clip(index - min_gap_steps, 0, None)] > 0
+    return int(np.count_nonzero(together & ~recent))
+
+
+def together_stats(distances, step_seconds, meeting_min_gap_seconds=MEETING_MIN_GAP_SECONDS):
+    """
+    Summarize a couple's distance series sampled every step_seconds (NaN where either location
+    is unknown) into time together/nearby/apart, meetings and distance distribution.
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    known = ~np.isnan(distances)
+    # NaN compares False, so unknown samples fall out of every bucket
+    with np.errstate(invalid="ignore"):
+        together = distances < WITH_YOU_MILES
+        nearby = (distances >= WITH_YOU_MILES) & (distances < NEARBY_MILES)
+        apart = distances >= NEARBY_MILES
+
+    minutes = step_seconds / 60
+    stats = {
+        "togetherMinutes": round(float(np.count_nonzero(together)) * minutes, 1),
+        "nearbyMinutes": round(float(np.count_nonzero(nearby)) * minutes, 1),
+        "apartMinutes": round(float(np.count_nonzero(apart)) * minutes, 1),
+        "unknownMinutes": round(float(np.count_nonzero(~known)) * minutes, 1),
+        "timesMet": count_meetings(together, max(1, int(round(meeting_min_gap_seconds / step_seconds)))),
+        "distanceMiles": None,
+    }
+
+    known_distances = distances[known]
+    if known_distances.size:
+        p10, p50, p90 = np.percentile(known_distances, [10, 50, 90])
+        stats["distanceMiles"] = {
+            "min": round(float(known_distances.min()), 2),
+            "p10": round(float(p10), 2),
+            "median": round(float(p50), 2),
+            "p90": round(float(p90), 2),
+            "max": round(float(known_distances.max()), 2),
+            "mean": round(float(known_distances.mean()), 2),
+        }
+    return stats
@@ -0,0 +1,81 @@
+import os
+import threading
+from typing import Dict, Iterable, Set, Tuple
+
+# A background task keeps every game's pool topped up so that even the most active couples have at
+# least QUESTION_POOL_LOW_WATER questions they haven't seen, and start_game normally only reads them.
+# It generates inline only for a couple left with less than a full session (an inline fallback).
+QUESTION_POOL_LOW_WATER = int(os.getenv("QUESTION_POOL_LOW_WATER", "30"))
+# Depth is measured against the couples with the most sessions in the last QUESTION_POOL_ACTIVE_DAYS
+QUESTION_POOL_ACTIVE_COUPLES = int(os.getenv("QUESTION_POOL_ACTIVE_COUPLES", "20"))
+QUESTION_POOL_ACTIVE_DAYS = int(os.getenv("QUESTION_POOL_ACTIVE_DAYS", "30"))
+QUESTION_POOL_CHECK_SECONDS = float(os.getenv("QUESTION_POOL_CHECK_SECONDS", "60"))
+# How often to look for refills requested by start_game between full checks
+QUESTION_POOL_REQUEST_POLL_SECONDS = 2
+QUESTION_POOL_MAX_CONCURRENT_REFILLS = int(os.getenv("QUESTION_POOL_MAX_CONCURRENT_REFILLS", "2"))
+
+
+class QuestionPoolState:
+    """Refill requests from start_game, and depth/latency metrics for the admin dashboard."""
+
+    def __init__(self):
+        # start_game runs in the threadpool, the replenisher on the event loop
+        self._lock = threading.Lock()
+        # game id -> couples (sorted user id pairs) that ran low; measured on top of the most active couples
+        self._requested: Dict[int, Set[Tuple[str, str]]] = {}
+        self._depth: Dict[int, dict] = {}
+
+        self.refills = 0
+        self.refill_errors = 0
+        # Refills where the LLM answered but everything it generated was already in the pool
+        self.refills_all_duplicates = 0
+        self.questions_added = 0
+        self.inline_fallbacks = 0
+        self.total_refill_seconds = 0.0
+        self.max_refill_seconds = 0.0
+
+    def request_refill(self, game_id: int, couples: Iterable[Tuple[str, str]] = ()):
+        with self._lock:
+            self._requested.setdefault(game_id, set()).update(tuple(couple) for couple in couples)
+
+    def take_requests(self) -> Dict[int, Set[Tuple[str, str]]]:
+        with self._lock:
+            requested, self._requested = self._requested, {}
+            return requested
+
+    def record_depth(self, game_id: int, min_unused: int, pool_size: int):
+        with self._lock:
+            self._depth[game_id] = {"minUnused": min_unused, "poolSize": pool_size}
+
+    def record_refill(self, seconds: float, added: int, ok: bool):
+        """ok: the LLM produced items (added may still be 0 if they were all duplicates)."""
+        with self._lock:
+            self.refills += 1
+            if not ok:
+                self.refill_errors += 1
+            elif not added:
+                self.refills_all_duplicates += 1
+            self.questions_added += added
+            self.total_refill_seconds += seconds
+            self.max_refill_seconds = max(self.max_refill_seconds, seconds)
+
+    def record_inline_fallback(self):
+        with self._lock:
+            self.inline_fallbacks += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "lowWater": QUESTION_POOL_LOW_WATER,
+                "depth": {str(game_id): depth for game_id, depth in self._depth.items()},
+                "refills": self.refills,
+                "refillErrors": self.refill_errors,
+                "refillsAllDuplicates": self.refills_all_duplicates,
+                "questionsAdded": self.questions_added,
+                "inlineFallbacks": self.inline_fallbacks,
+                "avgRefillSeconds": round(self.total_refill_seconds / self.refills, 3) if self.refills else 0.0,
+                "maxRefillSeconds": round(self.max_refill_seconds, 3),
+            }
+
+
+question_pool = QuestionPoolState()
@@ -0,0 +1,95 @@
+import json
+from typing import Iterable, List
+
+from sqlalchemy import Index, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+# Shared by main.py and the seed scripts, which each declare their own models for the same tables.
+# Duplicates are caught by unique (group, md5(text)) indexes, so adding a batch of generated questions
+# is one INSERT instead of a SELECT per item. Every script that inserts declares the index on its
+# models and builds it with create_question_text_index, so it works whichever runs first.
+
+# index name -> (table, group column, text column, [(referencing table, column)])
+QUESTION_TEXT_INDEXES = {
+    "uq_game_questions_game_text": (
+        "game_questions", "game_id", "question_text",
+        [("game_answers", "question_id"), ("couple_session_questions", "question_id")]
+    ),
+    "uq_questions_category_text": (
+        "questions", "category_id", "text", [("user_question_answers", "question_id")]
+    ),
+}
+
+
+def question_text(item) -> str:
+    """Text to store for an LLM-generated item: JSON for structured items, else the stripped string."""
+    if isinstance(item, (dict, list)):
+        return json.dumps(item)
+    return str(item).strip()
+
+
+def merge_duplicate_questions(conn, index_name: str):
+    """
+    Before a unique (group, md5(text)) index can be built, fold duplicate questions into the oldest
+    copy, repointing anything that references them. Does nothing once the index exists.
+    """
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": index_name}).scalar() is not None:
+        return
+    table, group_column, text_column, references = QUESTION_TEXT_INDEXES[index_name]
+    conn.execute(text(f"""
+        CREATE TEMP TABLE duplicate_questions ON COMMIT DROP AS
+        SELECT id, keep_id FROM (
+            SELECT id, first_value(id) OVER (
+                PARTITION BY {group_column}, md5({text_column}) ORDER BY "createdAt", id
+            ) AS keep_id
+            FROM {table} WHERE {text_column} IS NOT NULL
+        ) ranked
+        WHERE id <> keep_id
+    """))
+    for ref_table, ref_column in references:
+        # The seed scripts don't create the tables that reference questions
+        if conn.execute(text("SELECT to_regclass(:name)"), {"name": ref_table}).scalar() is None:
+            continue
+        if ref_table == "couple_session_questions":
+            # question_id is part of the primary key: a session may already hold the copy we keep
+            conn.execute(text("""
+                INSERT INTO couple_session_questions (session_id, question_id, position)
+                SELECT l.session_id, d.keep_id, min(l.position)
+                FROM couple_session_questions l JOIN duplicate_questions d ON l.question_id = d.id
+                GROUP BY l.session_id, d.keep_id
+                ON CONFLICT DO NOTHING
+            """))
+            conn.execute(text("DELETE FROM couple_session_questions l USING duplicate_questions d WHERE l.question_id = d.id"))
+        else:
+            conn.execute(text(
+                f"UPDATE {ref_table} r SET {ref_column} = d.keep_id FROM duplicate_questions d WHERE r.{ref_column} = d.id"
+            ))
+    conn.execute(text(f"DELETE FROM {table} q USING duplicate_questions d WHERE q.id = d.id"))
+    conn.execute(text("DROP TABLE duplicate_questions"))
+
+
+def create_question_text_index(engine, index: Index):
+    """Build one of QUESTION_TEXT_INDEXES on a table create_all found already there, merging duplicates first."""
+    with engine.begin() as conn:
+        merge_duplicate_questions(conn, index.name)
+    index.create(bind=engine, checkfirst=True)
+
+
+def insert_question_texts(db: Session, group_column, text_column, group_id, items: Iterable) -> List[str]:
+    """
+    Insert items as questions of group_id (a game or category), skipping any whose text the group
+    already has. Returns the ids of the rows actually inserted. The caller commits.
+    The table needs its QUESTION_TEXT_INDEXES entry (see create_question_text_index).
+    """
+    # Drop repeats and blanks within the batch first; ON CONFLICT can't resolve two rows in one statement
+    texts = [text for text in dict.fromkeys(question_text(item) for item in items) if text]
+    if not texts:
+        return []
+
+    table = text_column.table
+    stmt = pg_insert(table).values([{group_column.key: group_id, text_column.key: text} for text in texts])
+    stmt = stmt.on_conflict_do_nothing(
+        index_elements=[table.c[group_column.key], func.md5(table.c[text_column.key])]
+    ).returning(table.c.id)
+    return list(db.execute(stmt).scalars())
@@ -1,53 +1,209 @@
-import boto3
-from botocore.exceptions import NoCredentialsError
-from botocore.config import Config
 import os
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from storage_backends import create_storage, LocalStorage
 
 # Load env from sibling directory if not found locally
 env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'auth', '.env')
 load_dotenv(env_path)
 
-# Initialize S3 client for Backblaze B2
-s3_client = boto3.client(
-    's3',
-    endpoint_url=os.getenv('B2_ENDPOINT_URL'),
-    aws_access_key_id=os.getenv('B2_KEY_ID'),
-    aws_secret_access_key=os.getenv('B2_APP_KEY'),
-    config=Config(signature_version='s3v4')
+# boto3 is blocking, so async callers run storage calls on a dedicated, bounded pool instead of
+# the event loop (or the shared threadpool that sync routes use). Uploads get a smaller cap so a
+# burst of large photos can't starve deletes.
+S3_MAX_WORKERS = int(os.getenv('S3_MAX_WORKERS', '8'))
+S3_MAX_CONCURRENT_UPLOADS = int(os.getenv('S3_MAX_CONCURRENT_UPLOADS', '4'))
+S3_CONNECT_TIMEOUT_SECONDS = float(os.getenv('S3_CONNECT_TIMEOUT_SECONDS', '5'))
+S3_READ_TIMEOUT_SECONDS = float(os.getenv('S3_READ_TIMEOUT_SECONDS', '60'))
+
+# "b2" (Backblaze bucket, default) or "local" (files on this node's disk, see storage_backends)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'b2')
+
+storage = create_storage(
+    STORAGE_BACKEND,
+    connect_timeout=S3_CONNECT_TIMEOUT_SECONDS,
+    read_timeout=S3_READ_TIMEOUT_SECONDS,
+    # Every storage worker (plus sync routes) may hold a connection at once
+    max_pool_connections=S3_MAX_WORKERS * 2
 )
 
-BUCKET_NAME = os.getenv('B2_BUCKET_NAME')
+# Presigned GET URLs are reused until only this fraction of their lifetime is left,
+# so a feed page load doesn't SigV4-sign every image again.
+PRESIGNED_URL_CACHE_SIZE = int(os.getenv('PRESIGNED_URL_CACHE_SIZE', '10000'))
+PRESIGNED_URL_MIN_REMAINING_FRACTION = float(os.getenv('PRESIGNED_URL_MIN_REMAINING_FRACTION', '0.25'))
+
+# (object_name, expiration) -> (url, expires_at), in LRU order
+_presigned_url_cache = OrderedDict()
+_presigned_url_cache_lock = threading.Lock()
+_presigned_url_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+_storage_executor = ThreadPoolExecutor(max_workers=S3_MAX_WORKERS, thread_name_prefix='storage')
+_upload_semaphore = asyncio.Semaphore(S3_MAX_CONCURRENT_UPLOADS)
+
+_storage_metrics_lock = threading.Lock()
+_storage_metrics = {}
 
-def upload_file_to_s3(file_obj, object_name):
+def upload_file_to_s3(file_obj, object_name, content_type=None):
     """Upload a file to an S3 bucket and return the object key"""
     try:
-        s3_client.upload_fileobj(file_obj, BUCKET_NAME, object_name)
+        storage.upload(file_obj, object_name, content_type)
         return object_name # Return the key, not the URL
-    except NoCredentialsError:
-        print("Credentials not available")
-        return None
     except Exception as e:
         print(f"Error uploading to S3: {e}")
         return None
 
+def download_file_from_s3(object_name):
+    """Read an object's bytes, or None on failure"""
+    try:
+        return storage.download(object_name)
+    except Exception as e:
+        print(f"Error downloading from S3: {e}")
+        return None
+
 def get_presigned_url(object_name, expiration=3600):
-    """Generate a presigned URL to share an S3 object"""
+    """Generate a presigned URL to share an S3 object, reusing a cached one while it's still fresh"""
+    cache_key = (object_name, expiration)
+    now = time.time()
+    with _presigned_url_cache_lock:
+        cached = _presigned_url_cache.get(cache_key)
+        if cached and cached[1] - now > expiration * PRESIGNED_URL_MIN_REMAINING_FRACTION:
+            _presigned_url_cache.move_to_end(cache_key)
+            _presigned_url_cache_stats["hits"] += 1
+            return cached[0]
+        _presigned_url_cache_stats["misses"] += 1
+
     try:
-        response = s3_client.generate_presigned_url('get_object',
-                                                    Params={'Bucket': BUCKET_NAME,
-                                                            'Key': object_name},
-                                                    ExpiresIn=expiration)
-        return response
+        response = storage.presign_get(object_name, expiration)
     except Exception as e:
         print(f"Error generating presigned URL: {e}")
         return None
 
+    with _presigned_url_cache_lock:
+        _presigned_url_cache[cache_key] = (response, now + expiration)
+        _presigned_url_cache.move_to_end(cache_key)
+        while len(_presigned_url_cache) > PRESIGNED_URL_CACHE_SIZE:
+            _presigned_url_cache.popitem(last=False)
+            _presigned_url_cache_stats["evictions"] += 1
+    return response
+
+def generate_presigned_put_url(object_name, content_type, expiration=900):
+    """Presigned PUT so clients upload straight to the bucket. The Content-Type header must match."""
+    try:
+        return storage.presign_put(object_name, content_type, expiration)
+    except Exception as e:
+        print(f"Error generating presigned PUT URL: {e}")
+        return None
+
+def head_object(object_name):
+    """Return size/content type/etag of an object, or None if it doesn't exist. Other errors raise."""
+    return storage.head(object_name)
+
+def get_local_storage():
+    """The LocalStorage backend when it's active (its files are served by the API), else None"""
+    return storage if isinstance(storage, LocalStorage) else None
+
+def invalidate_presigned_url(object_name):
+    """Forget cached URLs for an object (any expiration)"""
+    with _presigned_url_cache_lock:
+        for cache_key in [k for k in _presigned_url_cache if k[0] == object_name]:
+            del _presigned_url_cache[cache_key]
+
+def get_presigned_url_cache_stats():
+    with _presigned_url_cache_lock:
+        return dict(_presigned_url_cache_stats, entries=len(_presigned_url_cache), maxEntries=PRESIGNED_URL_CACHE_SIZE)
+
 def delete_file_from_s3(object_name):
     """Delete a file from an S3 bucket"""
+    invalidate_presigned_url(object_name)
     try:
-        s3_client.delete_object(Bucket=BUCKET_NAME, Key=object_name)
+        storage.delete(object_name)
         return True
     except Exception as e:
         print(f"Error deleting from S3: {e}")
         return False
+
+def delete_files_from_s3(object_names):
+    """Delete up to 1000 objects in one request. Returns {key: error message} for keys that failed."""
+    for object_name in object_names:
+        invalidate_presigned_url(object_name)
+    try:
+        return storage.delete_many(object_names)
+    except Exception as e:
+        print(f"Error batch deleting from S3: {e}")
+        return {name: str(e) for name in object_names}
+
+def list_objects(prefix=''):
+    """Yield (key, last_modified) for every object in the bucket under prefix"""
+    return storage.list(prefix)
+
+def _record_storage_metric(operation, seconds, ok, queued_seconds=0.0):
+    with _storage_metrics_lock:
+        m = _storage_metrics.setdefault(operation, {
+            "count": 0, "errors": 0, "totalSeconds": 0.0, "maxSeconds": 0.0, "totalQueuedSeconds": 0.0
+        })
+        m["count"] += 1
+        if not ok:
+            m["errors"] += 1
+        m["totalSeconds"] += seconds
+        m["maxSeconds"] = max(m["maxSeconds"], seconds)
+        m["totalQueuedSeconds"] += queued_seconds
+
+def get_storage_metrics():
+    with _storage_metrics_lock:
+        result = {}
+        for operation, m in _storage_metrics.items():
+            result[operation] = dict(
+                m,
+                avgSeconds=round(m["totalSeconds"] / m["count"], 4) if m["count"] else 0.0,
+                avgQueuedSeconds=round(m["totalQueuedSeconds"] / m["count"], 4) if m["count"] else 0.0,
+            )
+        return result
+
+async def _run_storage_call(operation, fn, *args):
+    submitted = time.perf_counter()
+
+    def timed():
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = fn(*args)
+            if operation == "batch_delete":
+                # Returns the keys that failed
+                ok = not result
+            else:
+                # The sync helpers mostly report failure as None/False rather than raising
+                ok = operation == "head" or result not in (None, False)
+            return result
+        finally:
+            _record_storage_metric(operation, time.perf_counter() - started, ok,
+                                   queued_seconds=started - submitted)
+
+    return await asyncio.get_running_loop().run_in_executor(_storage_executor, timed)
+
+async def upload_file_to_s3_async(file_obj, object_name, content_type=None):
+    """Upload without blocking the event loop. Returns the object key, or None on failure."""
+    async with _upload_semaphore:
+        return await _run_storage_call("upload", upload_file_to_s3, file_obj, object_name, content_type)
+
+async def download_file_from_s3_async(object_name):
+    """Download without blocking the event loop. Returns the bytes, or None on failure."""
+    return await _run_storage_call("download", download_file_from_s3, object_name)
+
+async def delete_file_from_s3_async(object_name):
+    """Delete without blocking the event loop."""
+    return await _run_storage_call("delete", delete_file_from_s3, object_name)
+
+async def head_object_async(object_name):
+    """head_object without blocking the event loop."""
+    return await _run_storage_call("head", head_object, object_name)
+
+async def delete_files_from_s3_async(object_names):
+    """Batch delete without blocking the event loop. Returns {key: error} for failures."""
+    return await _run_storage_call("batch_delete", delete_files_from_s3, object_names)
+
+async def list_objects_async(prefix=''):
+    """Full bucket listing without blocking the event loop."""
+    return await _run_storage_call("list", lambda: list(list_objects(prefix)))
@@ -0,0 +1,17 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+# Request bodies validated by FastAPI: malformed input is a 422 with field details instead of a 500
+
+
+class FinalizeMemoryRequest(BaseModel):
+    """Body of POST /api/memories/finalize, sent after the photo was PUT to the presigned URL."""
+    title: str = Field(..., min_length=1)
+    date: datetime
+    description: Optional[str] = None
+    imageKey: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+    locationName: Optional[str] = None
@@ -1,11 +1,12 @@
 import os
 import json
 import uuid
-from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import sessionmaker, declarative_base
 from datetime import datetime, timezone
 from dotenv import load_dotenv
-from llm_service import generate_questions
+from llm_service import generate_many
+from question_store import create_question_text_index, insert_question_texts
 
 # Load env
 env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'auth', '.env')
@@ -37,6 +38,11 @@ class Question(Base):
     text = Column(Text)
     createdAt = Column(DateTime, default=datetime.now(timezone.utc))
 
+    __table_args__ = (
+        # Same as main.py's model: insert_question_texts needs it to skip duplicates
+        Index("uq_questions_category_text", category_id, func.md5(text), unique=True),
+    )
+
 CATEGORIES = [
   {
     "id": 'getting-started',
@@ -106,6 +112,9 @@ CATEGORIES = [
 
 # Create tables if they don't exist
 Base.metadata.create_all(bind=engine)
+# create_all skips tables that already exist, indexes included
+for index in Question.__table__.indexes:
+    create_question_text_index(engine, index)
 
 def seed_categories():
     db = SessionLocal()
@@ -128,53 +137,46 @@ def seed_categories():
         db.commit()
         
         # Generate Questions
+        target = 60
+        needed = {}
         for cat_data in CATEGORIES:
-            print(f"\n--- Processing Category: {cat_data['title']} ---")
-            
             count = db.query(Question).filter(Question.category_id == cat_data["id"]).count()
-            target = 60
-            needed = target - count
-            
-            if needed <= 0:
-                print("Enough questions.")
+            if target - count <= 0:
+                print(f"{cat_data['title']}: enough questions.")
                 continue
-                
-            print(f"Generating {needed} more questions...")
-            
-            existing_qs = db.query(Question.text).filter(Question.category_id == cat_data["id"]).limit(100).all()
-            existing_texts = [q[0] for q in existing_qs]
-            
-            while needed > 0:
-                batch_size = min(needed, 10)
-                print(f"Requesting batch of {batch_size}...")
-                
-                try:
-                    # Reuse generate_questions from llm_service
-                    new_texts = generate_questions(cat_data["prompt"], existing_texts, count=batch_size)
-                    
-                    added_count = 0
-                    for text in new_texts:
-                        text_val = str(text).strip()
-                        if text_val in existing_texts: continue
-                        
-                        # DB Check
-                        if not db.query(Question).filter(Question.category_id == cat_data["id"], Question.text == text_val).first():
-                            q = Question(category_id=cat_data["id"], text=text_val)
-                            db.add(q)
-                            existing_texts.append(text_val)
-                            added_count += 1
-                            
-                    db.commit()
-                    print(f"Added {added_count} questions.")
-                    needed -= added_count
-                    
-                    if added_count == 0:
-                        print("No unique questions. Stopping.")
-                        break
-                        
-                except Exception as e:
-                    print(f"Error: {e}")
-                    break
+            print(f"{cat_data['title']}: generating {target - count} more questions...")
+            needed[cat_data["id"]] = target - count
+
+        # Each round requests one batch for every category that still needs questions, in parallel.
+        # Rounds are numbered so each gets its own cached responses (LLM_CACHE_MODE)
+        round_number = 0
+        while needed:
+            pending = [cat_data for cat_data in CATEGORIES if cat_data["id"] in needed]
+            print(f"\nRequesting batches for {len(pending)} categories...")
+            results = generate_many([(cat_data["prompt"], min(needed[cat_data["id"]], 10)) for cat_data in pending],
+                                    batch=round_number)
+            round_number += 1
+
+            for cat_data, new_texts in zip(pending, results):
+                cat_id = cat_data["id"]
+                if isinstance(new_texts, Exception):
+                    print(f"{cat_data['title']}: error: {new_texts}")
+                    del needed[cat_id]
+                    continue
+
+                # Duplicates (in the batch or already in the DB) are skipped by the unique index.
+                # Stored as str(), as this script always has, rather than JSON for structured items
+                added_count = len(insert_question_texts(db, Question.category_id, Question.text, cat_id,
+                                                        [str(text) for text in new_texts]))
+                db.commit()
+                print(f"{cat_data['title']}: added {added_count} questions.")
+                needed[cat_id] -= added_count
+
+                if added_count == 0:
+                    print(f"{cat_data['title']}: no unique questions. Stopping.")
+                    del needed[cat_id]
+                elif needed[cat_id] <= 0:
+                    del needed[cat_id]
 
     finally:
         db.close()
@@ -1,11 +1,11 @@
 import os
-import json
 import uuid
-from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import sessionmaker, declarative_base
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 from llm_service import generate_questions
+from question_store import create_question_text_index, insert_question_texts
 
 # Load env
 env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'auth', '.env')
@@ -35,6 +35,15 @@ class GameQuestion(Base):
     question_text = Column(Text)
     createdAt = Column(DateTime, default=datetime.now(timezone.utc))
 
+    __table_args__ = (
+        # Same as main.py's model: insert_question_texts needs it to skip duplicates
+        Index("uq_game_questions_game_text", game_id, func.md5(question_text), unique=True),
+    )
+
+# The tables come from main.py, which may not have run since the index was added
+for index in GameQuestion.__table__.indexes:
+    create_question_text_index(engine, index)
+
 def seed_games():
     db = SessionLocal()
     try:
@@ -64,42 +73,22 @@ def seed_games():
             existing_qs = db.query(GameQuestion.question_text).filter(GameQuestion.game_id == game.id).limit(100).all()
             existing_texts = [q[0] for q in existing_qs]
             
-            # Generate in batches of 10
+            # Generate in batches of 10, numbered so each gets its own cached response (LLM_CACHE_MODE)
+            batch = 0
             while needed > 0:
                 batch_size = min(needed, 10)
                 print(f"Requesting batch of {batch_size}...")
                 
                 try:
-                    new_items = generate_questions(game.system_prompt, existing_texts, count=batch_size)
+                    new_items = generate_questions(game.system_prompt, existing_texts, count=batch_size, batch=batch)
+                    batch += 1
                     
                     if not new_items:
                         print("LLM returned no items. Retrying or skipping.")
                         break
 
-                    added_count = 0
-                    for item in new_items:
-                        # Serialize if dict
-                        if isinstance(item, (dict, list)):
-                            text_val = json.dumps(item)
-                        else:
-                            text_val = str(item).strip()
-                        
-                        # Check duplicate locally in this run
-                        if text_val in existing_texts:
-                            continue
-                            
-                        # Check duplicate in DB
-                        exists = db.query(GameQuestion).filter(
-                            GameQuestion.game_id == game.id, 
-                            GameQuestion.question_text == text_val
-                        ).first()
-                        
-                        if not exists:
-                            nq = GameQuestion(game_id=game.id, question_text=text_val)
-                            db.add(nq)
-                            existing_texts.append(text_val)
-                            added_count += 1
-                    
+                    # Duplicates (in the batch or already in the DB) are skipped by the unique index
+                    added_count = len(insert_question_texts(db, GameQuestion.game_id, GameQuestion.question_text, game.id, new_items))
                     db.commit()
                     print(f"Added {added_count} new questions.")
                     needed -= added_count
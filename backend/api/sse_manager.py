@@ -1,37 +1,533 @@
 import asyncio
-from typing import Dict, List
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
 from fastapi import Request
 
-class ConnectionManager:
+# Per-connection outbound limits. A stream over the limit drops coalescible events for up to
+# SSE_SLOW_CONSUMER_GRACE_SECONDS; anything else (or lagging longer) evicts it.
+SSE_QUEUE_MAX_EVENTS = int(os.getenv("SSE_QUEUE_MAX_EVENTS", "100"))
+SSE_QUEUE_MAX_BYTES = int(os.getenv("SSE_QUEUE_MAX_BYTES", str(256 * 1024)))
+SSE_SLOW_CONSUMER_GRACE_SECONDS = float(os.getenv("SSE_SLOW_CONSUMER_GRACE_SECONDS", "30"))
+
+# Idle streams get a comment frame so proxies/load balancers don't cut them
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_HEARTBEAT_FRAME = (os.getenv("SSE_HEARTBEAT_FRAME", ": keep-alive") + "\n\n").encode("utf-8")
+
+# Recent events are kept per user so a reconnecting client can resume from Last-Event-ID
+SSE_REPLAY_MAX_EVENTS = int(os.getenv("SSE_REPLAY_MAX_EVENTS", "50"))
+SSE_REPLAY_TTL_SECONDS = float(os.getenv("SSE_REPLAY_TTL_SECONDS", "300"))
+SSE_REPLAY_MAX_USERS = int(os.getenv("SSE_REPLAY_MAX_USERS", "10000"))
+
+# Returned by SSEConnection.get when nothing arrived before the timeout
+IDLE = object()
+
+# deliver(user_id, event_type, data, event_id) -> number of local queues the event reached
+DeliverFn = Callable[[str, str, dict, int], Awaitable[int]]
+# control(kind, data): a message for every worker rather than a user's streams (e.g. cache invalidation)
+ControlFn = Callable[[str, dict], None]
+# lost(): the bus may have dropped events for this worker (e.g. while reconnecting)
+LostFn = Callable[[], None]
+
+
+class InMemoryBackend:
+    """Single-process bus: events only reach streams held by this worker."""
+
     def __init__(self):
-        # Maps user_id -> List of active queues (one per device/tab)
-        self.active_connections: Dict[str, List[asyncio.Queue]] = {}
+        self._last_event_id = 0
+
+    async def start(self, deliver: DeliverFn, control: ControlFn, lost: LostFn):
+        self._deliver = deliver
+        self._control = control
+
+    async def stop(self):
+        pass
+
+    async def publish(self, user_id: str, event_type: str, data: dict):
+        await self._deliver(user_id, event_type, data, self._next_event_id())
+
+    def _next_event_id(self) -> int:
+        # Microsecond clock, forced monotonic, so ids keep increasing across restarts and a client's
+        # Last-Event-ID from before one never matches a new event
+        self._last_event_id = max(self._last_event_id + 1, time.time_ns() // 1000)
+        return self._last_event_id
+
+    async def broadcast(self, kind: str, data: dict):
+        self._control(kind, data)
+
+
+class PostgresNotifyBackend:
+    """
+    Cross-process bus on Postgres LISTEN/NOTIFY.
+    Every worker holds one LISTEN connection and fans incoming events out to its own queues,
+    so an event published on any worker reaches the user's streams wherever they live.
+    Event ids come from a sequence, so they are unique across workers, and every worker receives
+    notifications in the same order, which is what replay relies on.
+    Events too large for a notification are stored in a table and notified by reference.
+    """
+
+    # NOTIFY payloads must be shorter than 8000 bytes in the default Postgres build
+    MAX_PAYLOAD_BYTES = 7999
+    # Stored payloads only need to outlive delivery to every listening worker
+    STORED_PAYLOAD_RETENTION = "5 minutes"
+    RECONNECT_DELAY_SECONDS = 1.0
+    MAX_RECONNECT_DELAY_SECONDS = 30.0
+
+    def __init__(self, dsn: str, channel: str = "nearish_events", sequence: str = "nearish_event_ids",
+                 payload_table: str = "nearish_event_payloads", pool_size: int = 4):
+        self.dsn = dsn
+        self.channel = channel
+        self.sequence = sequence
+        self.payload_table = payload_table
+        self.pool_size = pool_size
+        self._listen_conn = None
+        self._pool = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        # Notified events, delivered one at a time so a by-reference event (which needs a fetch)
+        # can't be overtaken by the ones notified after it
+        self._notified: Optional[asyncio.Queue] = None
+        self._delivery_task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def start(self, deliver: DeliverFn, control: ControlFn, lost: LostFn):
+        import asyncpg
+
+        self._deliver = deliver
+        self._control = control
+        self._lost = lost
+        self._closing = False
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=self.pool_size)
+        await self._pool.execute(f"CREATE SEQUENCE IF NOT EXISTS {self.sequence}")
+        await self._pool.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.payload_table} (id BIGINT PRIMARY KEY, user_id TEXT NOT NULL,"
+            f" event TEXT NOT NULL, data JSON NOT NULL, created_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+        )
+        self._notified = asyncio.Queue()
+        self._delivery_task = asyncio.create_task(self._deliver_notified())
+        await self._listen()
+
+    async def stop(self):
+        self._closing = True
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+        if self._delivery_task:
+            self._delivery_task.cancel()
+        if self._listen_conn is not None:
+            await self._listen_conn.close()
+            self._listen_conn = None
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def publish(self, user_id: str, event_type: str, data: dict):
+        data_json = json.dumps(data)
+        payload = json.dumps({"id": 0, "user_id": user_id, "event": event_type, "data": data})
+        # json_build_object spaces things out a little more and the id has up to 19 digits
+        if len(payload.encode("utf-8")) + 40 > self.MAX_PAYLOAD_BYTES:
+            # Too large for NOTIFY: store it and notify the row id, which is also the event id
+            print(f"Event '{event_type}' for {user_id} exceeds NOTIFY payload limit; sending it by reference.")
+            await self._pool.execute(
+                f"WITH stored AS (INSERT INTO {self.payload_table} (id, user_id, event, data)"
+                f" VALUES (nextval('{self.sequence}'), $2, $3, $4::json) RETURNING id)"
+                f" SELECT pg_notify($1, json_build_object('ref', id)::text) FROM stored",
+                self.channel, user_id, event_type, data_json
+            )
+            await self._pool.execute(
+                f"DELETE FROM {self.payload_table} WHERE created_at < now() - interval '{self.STORED_PAYLOAD_RETENTION}'"
+            )
+            return
+        # Id and notification in one round trip
+        await self._pool.execute(
+            f"SELECT pg_notify($1, json_build_object('id', nextval('{self.sequence}'), 'user_id', $2::text,"
+            f" 'event', $3::text, 'data', $4::json)::text)",
+            self.channel, user_id, event_type, data_json
+        )
+
+    async def broadcast(self, kind: str, data: dict):
+        # Reaches this worker too, through its own LISTEN connection
+        await self._pool.execute("SELECT pg_notify($1, $2)", self.channel, json.dumps({"control": kind, "data": data}))
+
+    async def _listen(self):
+        import asyncpg
+
+        self._listen_conn = await asyncpg.connect(self.dsn)
+        self._listen_conn.add_termination_listener(self._on_terminated)
+        await self._listen_conn.add_listener(self.channel, self._on_notify)
+        print(f"Subscribed to Postgres channel '{self.channel}'")
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            print(f"Ignoring malformed event payload on '{channel}'")
+            return
+        if "control" in message:
+            self._control(message["control"], message["data"])
+            return
+        self._notified.put_nowait(message)
+
+    async def _deliver_notified(self):
+        while True:
+            message = await self._notified.get()
+            try:
+                if "ref" in message:
+                    message = await self._fetch_stored(message["ref"])
+                    if message is None:
+                        continue
+                await self._deliver(message["user_id"], message["event"], message["data"], message["id"])
+            except Exception as e:
+                print(f"Error delivering event '{message.get('event')}' from '{self.channel}': {e!r}")
+
+    async def _fetch_stored(self, event_id: int) -> Optional[dict]:
+        row = await self._pool.fetchrow(
+            f"SELECT user_id, event, data FROM {self.payload_table} WHERE id = $1", event_id
+        )
+        if row is None:
+            # Cleaned up before we got to it: whoever it was for missed an event
+            print(f"Stored event {event_id} on '{self.channel}' is gone; asking streams to resync")
+            self._lost()
+            return None
+        return {"id": event_id, "user_id": row["user_id"], "event": row["event"], "data": json.loads(row["data"])}
+
+    def _on_terminated(self, connection):
+        if self._closing:
+            return
+        print(f"Lost LISTEN connection on '{self.channel}', reconnecting...")
+        self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        delay = self.RECONNECT_DELAY_SECONDS
+        while not self._closing:
+            try:
+                await self._listen()
+                # Anything published while we were away never reached this worker
+                self._lost()
+                return
+            except Exception as e:
+                print(f"Event bus reconnect failed: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.MAX_RECONNECT_DELAY_SECONDS)
+
+
+async def wait_for_disconnect(request: Request):
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+def encode_frame(event_type: str, data: dict, event_id: Optional[int] = None) -> bytes:
+    """Encode one complete SSE frame. Done once per event and shared by every device of the user."""
+    id_line = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{id_line}event: {event_type}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+def create_event_backend(name: str, dsn: str = None):
+    if name == "postgres":
+        return PostgresNotifyBackend(dsn)
+    if name == "memory":
+        return InMemoryBackend()
+    raise ValueError(f"Unknown SSE backend: {name}")
+
+
+class ReplayBuffer:
+    """Bounded per-user ring buffer of recent events, expired after a TTL."""
 
-    async def connect(self, user_id: str):
-        queue = asyncio.Queue()
+    def __init__(self, max_events: int = SSE_REPLAY_MAX_EVENTS, ttl_seconds: float = SSE_REPLAY_TTL_SECONDS,
+                 max_users: int = SSE_REPLAY_MAX_USERS):
+        self.max_events = max_events
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max_users
+        # user_id -> deque of (event_id, recorded_at, event_type, frame) in delivery order; users kept in LRU order
+        self._events: "OrderedDict[str, Deque[Tuple[int, float, str, bytes]]]" = OrderedDict()
+
+    def record(self, user_id: str, event_id: int, event_type: str, frame: bytes):
+        events = self._events.get(user_id)
+        if events is None:
+            events = self._events[user_id] = deque()
+            while len(self._events) > self.max_users:
+                self._events.popitem(last=False)
+        else:
+            self._events.move_to_end(user_id)
+        events.append((event_id, time.monotonic(), event_type, frame))
+        while len(events) > self.max_events:
+            events.popleft()
+
+    def since(self, user_id: str, last_event_id: int) -> Tuple[List[Tuple[str, bytes]], bool]:
+        """Events recorded after last_event_id, and whether some the client missed are no longer available."""
+        events = self._events.get(user_id)
+        if events:
+            cutoff = time.monotonic() - self.ttl_seconds
+            while events and events[0][1] < cutoff:
+                events.popleft()
+        events = list(events or ())
+        # By position rather than by comparing ids: the client saw events in delivery order, which is the
+        # same on every worker, while ids from different publishers only need to be unique
+        for position, (event_id, _, _, _) in enumerate(events):
+            if event_id == last_event_id:
+                return [(event_type, frame) for _, _, event_type, frame in events[position + 1:]], False
+        # The client's last event is gone (evicted, expired, or from before a restart or a bus outage),
+        # so there's no telling what it missed: send what we have after it and report a gap
+        return [(event_type, frame) for event_id, _, event_type, frame in events if event_id > last_event_id], True
+
+    def clear(self):
+        self._events.clear()
+
+
+class SSEConnection:
+    """One open /api/events stream (one device/tab) with a bounded outbound queue of encoded frames."""
+
+    def __init__(self, user_id: str, max_events: int, max_bytes: int):
+        self.user_id = user_id
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        # (event_type, frame) in delivery order; event_type is set only for coalescible frames
+        self._frames: Deque[Tuple[Optional[str], bytes]] = deque()
+        # Coalescible event types with a frame in _frames
+        self._latest: Dict[str, bytes] = {}
+        self._ready = asyncio.Event()
+        self.queued_bytes = 0
+        self.dropped_events = 0
+        # When the consumer first fell behind; cleared once it catches up
+        self.over_limit_since: Optional[float] = None
+        self.closed = False
+
+    def qsize(self) -> int:
+        return len(self._frames)
+
+    def has_room(self, size: int, event_type: str = None, coalesce: bool = False) -> bool:
+        if coalesce and event_type in self._latest:
+            # Replaces a frame that's already queued
+            return True
+        if not self._frames:
+            # Always accept one event, however large, for a consumer that is keeping up
+            return True
+        return len(self._frames) < self.max_events and self.queued_bytes + size <= self.max_bytes
+
+    def put(self, frame: bytes, event_type: str = None, coalesce: bool = False) -> bool:
+        """Queue a frame. Returns True if it superseded a pending frame of the same type instead."""
+        superseded = False
+        if coalesce:
+            pending = self._latest.get(event_type)
+            if pending is not None:
+                # Drop the stale frame and queue the new one at the tail, so frames still go out in
+                # event id order and Last-Event-ID never skips past an event the client hasn't seen
+                self._frames.remove((event_type, pending))
+                self.queued_bytes -= len(pending)
+                superseded = True
+            self._latest[event_type] = frame
+            self._frames.append((event_type, frame))
+        else:
+            self._frames.append((None, frame))
+        self.queued_bytes += len(frame)
+        self._ready.set()
+        if not superseded:
+            self.over_limit_since = None
+        return superseded
+
+    async def get(self, timeout: Optional[float] = None):
+        """Next frame, None once the connection has been evicted, or IDLE after `timeout` seconds."""
+        if not self._frames and not self.closed:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return IDLE
+        if self.closed:
+            return None
+        event_type, frame = self._frames.popleft()
+        if event_type is not None:
+            del self._latest[event_type]
+        if not self._frames:
+            self._ready.clear()
+        self.queued_bytes -= len(frame)
+        return frame
+
+    def close(self):
+        self.closed = True
+        # Free whatever the consumer never read and wake it up if it's waiting
+        self._frames.clear()
+        self._latest.clear()
+        self.queued_bytes = 0
+        self._ready.set()
+
+
+class ConnectionManager:
+    # Latest-value events: a client only ever needs the newest one, so pending ones are replaced
+    # in place, and dropping one for a lagging client only loses a superseded update
+    COALESCIBLE_EVENTS = {"partner_status_update", "partner_location_update"}
+
+    def __init__(self, backend=None, max_queue_events: int = SSE_QUEUE_MAX_EVENTS,
+                 max_queue_bytes: int = SSE_QUEUE_MAX_BYTES,
+                 slow_consumer_grace_seconds: float = SSE_SLOW_CONSUMER_GRACE_SECONDS):
+        # Maps user_id -> List of active connections (one per device/tab)
+        self.active_connections: Dict[str, List[SSEConnection]] = {}
+        self.backend = backend or InMemoryBackend()
+        self.max_queue_events = max_queue_events
+        self.max_queue_bytes = max_queue_bytes
+        self.slow_consumer_grace_seconds = slow_consumer_grace_seconds
+        self.dropped_events = 0
+        self.coalesced_events = 0
+        self.evicted_connections = 0
+        self.replay = ReplayBuffer()
+        # control kind -> handler(data), run on every worker for each broadcast
+        self._control_handlers: Dict[str, Callable[[dict], None]] = {}
+
+    async def start(self, backend=None):
+        if backend is not None:
+            self.backend = backend
+        await self.backend.start(self._deliver_local, self._handle_control, self._events_lost)
+
+    async def stop(self):
+        await self.backend.stop()
+
+    async def connect(self, user_id: str, last_event_id: Optional[int] = None) -> SSEConnection:
+        connection = SSEConnection(user_id, self.max_queue_events, self.max_queue_bytes)
+        # Queue the replay before registering, with no await in between, so nothing is missed or duplicated
+        if last_event_id is not None:
+            missed, gap = self.replay.since(user_id, last_event_id)
+            room = self.max_queue_events - 1
+            if len(missed) > room:
+                missed, gap = missed[-room:], True
+            if gap:
+                # Tell the client its view is stale so it refetches instead of trusting the replay
+                connection.put(encode_frame("resync", {}))
+            for event_type, frame in missed:
+                connection.put(frame, event_type, event_type in self.COALESCIBLE_EVENTS)
+            print(f"Replaying {len(missed)} events to user {user_id} after {last_event_id} (gap={gap})")
         if user_id not in self.active_connections:
             self.active_connections[user_id] = []
-        self.active_connections[user_id].append(queue)
+        self.active_connections[user_id].append(connection)
         print(f"User {user_id} connected. Active devices: {len(self.active_connections[user_id])}")
-        return queue
+        return connection
 
-    async def disconnect(self, user_id: str, queue: asyncio.Queue):
-        if user_id in self.active_connections:
-            if queue in self.active_connections[user_id]:
-                self.active_connections[user_id].remove(queue)
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
+    async def disconnect(self, user_id: str, connection: SSEConnection):
+        self._remove(user_id, connection)
         print(f"User {user_id} disconnected.")
 
+    async def stream(self, connection: SSEConnection, request: Request):
+        """
+        Body of an /api/events response: the connection's frames, with heartbeats while idle.
+        Waits on the next frame and the client's disconnect together, so a closed stream gives up
+        its slot and queue as soon as the server hears about it.
+        """
+        disconnected = asyncio.ensure_future(wait_for_disconnect(request))
+        next_frame = None
+        try:
+            while True:
+                next_frame = asyncio.ensure_future(connection.get(timeout=SSE_HEARTBEAT_SECONDS))
+                await asyncio.wait({next_frame, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done():
+                    break
+                frame = next_frame.result()
+                # None means we were evicted as a slow consumer
+                if frame is None:
+                    break
+                # Otherwise a complete SSE frame, encoded once for all of this user's devices
+                yield SSE_HEARTBEAT_FRAME if frame is IDLE else frame
+        finally:
+            disconnected.cancel()
+            if next_frame is not None:
+                next_frame.cancel()
+            await self.disconnect(connection.user_id, connection)
+
     async def send_event(self, user_id: str, event_type: str, data: dict):
+        await self.backend.publish(user_id, event_type, data)
+
+    def on_control(self, kind: str, handler: Callable[[dict], None]):
+        self._control_handlers[kind] = handler
+
+    async def broadcast(self, kind: str, data: dict):
+        """Run the `kind` control handler on every worker (this one included) with data."""
+        await self.backend.broadcast(kind, data)
+
+    def _handle_control(self, kind: str, data: dict):
+        handler = self._control_handlers.get(kind)
+        if handler is None:
+            print(f"Ignoring control message '{kind}' with no handler")
+            return
+        try:
+            handler(data)
+        except Exception as e:
+            print(f"Error handling control message '{kind}': {e!r}")
+
+    def _events_lost(self):
+        # Open streams may have missed something, and so may every buffered history
+        self.replay.clear()
+        streams = 0
+        for connections in self.active_connections.values():
+            for connection in connections:
+                connection.put(encode_frame("resync", {}))
+                streams += 1
+        print(f"Event bus may have dropped events; asked {streams} stream(s) to resync")
+
+    async def _deliver_local(self, user_id: str, event_type: str, data: dict, event_id: int) -> int:
+        frame = encode_frame(event_type, data, event_id)
+        self.replay.record(user_id, event_id, event_type, frame)
+        connections = self.active_connections.get(user_id)
+        if not connections:
+            print(f"User {user_id} has no streams on this worker. Event '{event_type}' buffered for replay.")
+            return 0
+        coalesce = event_type in self.COALESCIBLE_EVENTS
+        delivered = coalesced = dropped = 0
+        for connection in list(connections):
+            if connection.has_room(len(frame), event_type, coalesce):
+                if connection.put(frame, event_type, coalesce):
+                    self.coalesced_events += 1
+                    coalesced += 1
+                delivered += 1
+            elif coalesce and not self._lagging_too_long(connection):
+                connection.dropped_events += 1
+                self.dropped_events += 1
+                dropped += 1
+            else:
+                # _evict logs the eviction itself
+                self._evict(connection, f"queue full on '{event_type}'")
+        if delivered:
+            note = f" ({coalesced} replaced a pending one)" if coalesced else ""
+            print(f"Event '{event_type}' sent to {delivered} stream(s) of user {user_id}{note}")
+        if dropped:
+            print(f"Event '{event_type}' dropped for {dropped} slow stream(s) of user {user_id}")
+        return delivered
+
+    def _lagging_too_long(self, connection: SSEConnection) -> bool:
+        now = time.monotonic()
+        if connection.over_limit_since is None:
+            connection.over_limit_since = now
+        return now - connection.over_limit_since > self.slow_consumer_grace_seconds
+
+    def _evict(self, connection: SSEConnection, reason: str):
+        connection.close()
+        self._remove(connection.user_id, connection)
+        self.evicted_connections += 1
+        print(f"Evicted slow consumer for user {connection.user_id}: {reason}")
+
+    def _remove(self, user_id: str, connection: SSEConnection):
         if user_id in self.active_connections:
-            message = {"event": event_type, "data": data}
-            # We send it as a JSON string mostly, but SSE format is "event: ...\ndata: ...\n\n"
-            # We'll handle the formatting in the generator
-            for queue in self.active_connections[user_id]:
-                await queue.put(message)
-            print(f"Event '{event_type}' sent to user {user_id}")
-        else:
-            print(f"User {user_id} is not connected. Event '{event_type}' dropped.")
+            if connection in self.active_connections[user_id]:
+                self.active_connections[user_id].remove(connection)
+            if not self.active_connections[user_id]:
+                del self.active_connections[user_id]
+
+    def stats(self, top_users: int = 20) -> dict:
+        users = []
+        for user_id, connections in self.active_connections.items():
+            users.append({
+                "userId": user_id,
+                "connections": len(connections),
+                "queuedEvents": sum(c.qsize() for c in connections),
+                "queuedBytes": sum(c.queued_bytes for c in connections),
+            })
+        users.sort(key=lambda u: u["queuedBytes"], reverse=True)
+        return {
+            "users": len(users),
+            "connections": sum(u["connections"] for u in users),
+            "queuedEvents": sum(u["queuedEvents"] for u in users),
+            "queuedBytes": sum(u["queuedBytes"] for u in users),
+            "droppedEvents": self.dropped_events,
+            "coalescedEvents": self.coalesced_events,
+            "evictedConnections": self.evicted_connections,
+            "queueLimits": {"events": self.max_queue_events, "bytes": self.max_queue_bytes},
+            "topUsers": users[:top_users],
+        }
 
 manager = ConnectionManager()
@@ -0,0 +1,216 @@
+import hashlib
+import hmac
+import mimetypes
+import os
+import secrets
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+# Object storage behind s3_client. Every backend raises on unexpected errors; s3_client turns
+# those into the None/False results its callers expect.
+#   upload(file_obj, key, content_type) / download(key) -> bytes
+#   presign_get(key, expiration) / presign_put(key, content_type, expiration) -> url
+#   head(key) -> {"size", "contentType", "etag"} or None if missing
+#   delete(key) / delete_many(keys) -> {key: error} for failures
+#   list(prefix) -> (key, last_modified) pairs
+
+mimetypes.add_type("image/heic", ".heic")
+mimetypes.add_type("image/webp", ".webp")
+
+
+def is_valid_key(key: str) -> bool:
+    """
+    Keys are relative '/'-separated paths with no empty, '.' or '..' segments, so a key that starts
+    with "<user id>/" really is under that user's prefix on every backend (a local path included).
+    """
+    if not key or key.startswith('/') or '\\' in key or '\0' in key:
+        return False
+    return all(part not in ('', '.', '..') for part in key.split('/'))
+
+
+class B2Storage:
+    """Backblaze B2 (or any S3-compatible bucket) through boto3."""
+
+    def __init__(self, max_pool_connections: int, connect_timeout: float, read_timeout: float):
+        import boto3
+        from botocore.config import Config
+
+        self.bucket = os.getenv('B2_BUCKET_NAME')
+        self.client = boto3.client(
+            's3',
+            endpoint_url=os.getenv('B2_ENDPOINT_URL'),
+            aws_access_key_id=os.getenv('B2_KEY_ID'),
+            aws_secret_access_key=os.getenv('B2_APP_KEY'),
+            config=Config(
+                signature_version='s3v4',
+                connect_timeout=connect_timeout,
+                read_timeout=read_timeout,
+                retries={'max_attempts': 3, 'mode': 'standard'},
+                max_pool_connections=max_pool_connections
+            )
+        )
+
+    def upload(self, file_obj, key: str, content_type: Optional[str] = None):
+        extra_args = {'ContentType': content_type} if content_type else None
+        self.client.upload_fileobj(file_obj, self.bucket, key, ExtraArgs=extra_args)
+
+    def download(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+
+    def presign_get(self, key: str, expiration: int) -> str:
+        return self.client.generate_presigned_url('get_object',
+                                                  Params={'Bucket': self.bucket, 'Key': key},
+                                                  ExpiresIn=expiration)
+
+    def presign_put(self, key: str, content_type: str, expiration: int) -> str:
+        return self.client.generate_presigned_url('put_object',
+                                                  Params={'Bucket': self.bucket, 'Key': key,
+                                                          'ContentType': content_type},
+                                                  ExpiresIn=expiration)
+
+    def head(self, key: str) -> Optional[dict]:
+        from botocore.exceptions import ClientError
+
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return {
+            "size": response.get('ContentLength'),
+            "contentType": response.get('ContentType'),
+            "etag": response.get('ETag'),
+        }
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def delete_many(self, keys: List[str]) -> Dict[str, str]:
+        response = self.client.delete_objects(
+            Bucket=self.bucket,
+            Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+        )
+        # Quiet mode only reports failures; deleting a missing key counts as success
+        return {err['Key']: err.get('Message') or err.get('Code') for err in response.get('Errors', [])}
+
+    def list(self, prefix: str = '') -> Iterator[Tuple[str, datetime]]:
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                yield obj['Key'], obj['LastModified']
+
+
+class LocalStorage:
+    """
+    Objects as files under a directory, for dev, benchmarks and single-node self-hosting.
+    Presigned URLs point at the API's own /api/storage route, signed with an HMAC so they
+    expire and can't be forged, just like bucket URLs.
+    """
+
+    def __init__(self, root: str, base_url: str, secret: Optional[str] = None):
+        self.root = os.path.realpath(root)
+        self.base_url = base_url.rstrip('/')
+        if not secret:
+            # URLs won't survive a restart or work across workers; set STORAGE_LOCAL_SECRET for that
+            print("STORAGE_LOCAL_SECRET not set, using a per-process signing key")
+            secret = secrets.token_hex(32)
+        self.secret = secret.encode('utf-8')
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        if not is_valid_key(key):
+            raise ValueError(f"Invalid object key: {key}")
+        path = os.path.realpath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid object key: {key}")
+        return path
+
+    def sign(self, method: str, key: str, expires: int, content_type: str = '') -> str:
+        message = f"{method}\n{key}\n{expires}\n{content_type}".encode('utf-8')
+        return hmac.new(self.secret, message, hashlib.sha256).hexdigest()
+
+    def verify(self, method: str, key: str, expires: int, signature: str, content_type: str = '') -> bool:
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(self.sign(method, key, expires, content_type), signature)
+
+    def _url(self, method: str, key: str, expiration: int, content_type: str = '') -> str:
+        expires = int(time.time()) + expiration
+        query = urlencode({"expires": expires, "signature": self.sign(method, key, expires, content_type)})
+        return f"{self.base_url}/api/storage/{quote(key)}?{query}"
+
+    def upload(self, file_obj, key: str, content_type: Optional[str] = None):
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write next to the target and rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                shutil.copyfileobj(file_obj, f, 1024 * 1024)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def download(self, key: str) -> bytes:
+        with open(self.path_for(key), 'rb') as f:
+            return f.read()
+
+    def presign_get(self, key: str, expiration: int) -> str:
+        return self._url("GET", key, expiration)
+
+    def presign_put(self, key: str, content_type: str, expiration: int) -> str:
+        return self._url("PUT", key, expiration, content_type)
+
+    def head(self, key: str) -> Optional[dict]:
+        try:
+            st = os.stat(self.path_for(key))
+        except FileNotFoundError:
+            return None
+        return {
+            "size": st.st_size,
+            "contentType": mimetypes.guess_type(key)[0] or 'application/octet-stream',
+            "etag": f'"{st.st_mtime_ns:x}-{st.st_size:x}"',
+        }
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            pass
+
+    def delete_many(self, keys: List[str]) -> Dict[str, str]:
+        failures = {}
+        for key in keys:
+            try:
+                self.delete(key)
+            except (OSError, ValueError) as e:
+                failures[key] = str(e)
+        return failures
+
+    def list(self, prefix: str = '') -> Iterator[Tuple[str, datetime]]:
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.startswith('.upload-'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                key = os.path.relpath(path, self.root).replace(os.sep, '/')
+                if key.startswith(prefix):
+                    yield key, datetime.fromtimestamp(os.stat(path).st_mtime, timezone.utc)
+
+
+def create_storage(name: str, **b2_options):
+    if name == "b2":
+        return B2Storage(**b2_options)
+    if name == "local":
+        return LocalStorage(
+            root=os.getenv("STORAGE_LOCAL_ROOT", os.path.join(os.path.dirname(os.path.abspath(__file__)), "local_storage")),
+            base_url=os.getenv("STORAGE_LOCAL_BASE_URL", "http://localhost:8000"),
+            secret=os.getenv("STORAGE_LOCAL_SECRET"),
+        )
+    raise ValueError(f"Unknown storage backend: {name}")
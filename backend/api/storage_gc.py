@@ -0,0 +1,18 @@
+import os
+from typing import Optional
+
+# Deleted images are queued in pending_storage_deletion and removed in batches by a background task
+STORAGE_GC_BATCH_SIZE = int(os.getenv("STORAGE_GC_BATCH_SIZE", "500"))  # delete_objects accepts up to 1000
+STORAGE_GC_INTERVAL_SECONDS = float(os.getenv("STORAGE_GC_INTERVAL_SECONDS", "10"))
+STORAGE_GC_MAX_BACKOFF_SECONDS = 3600
+# A key that still fails after this many attempts is parked (no next attempt) for someone to look at
+STORAGE_GC_MAX_ATTEMPTS = int(os.getenv("STORAGE_GC_MAX_ATTEMPTS", "20"))
+
+
+def retry_delay_seconds(attempts: int) -> Optional[float]:
+    """Seconds to wait after the attempts-th failed delete of a key, or None to stop retrying it."""
+    if attempts >= STORAGE_GC_MAX_ATTEMPTS:
+        return None
+    # Bound the exponent first: the backoff is capped anyway, and 2 ** attempts overflows a float
+    exponent = min(attempts, 32)
+    return min(STORAGE_GC_MAX_BACKOFF_SECONDS, STORAGE_GC_INTERVAL_SECONDS * 2 ** exponent)
@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from auth_cache import AuthCache, hash_token
+from sse_manager import ConnectionManager
+
+
+def cache_with(tokens, ttl_seconds=60):
+    cache = AuthCache(max_entries=10, ttl_seconds=ttl_seconds)
+    expires_at = datetime.now(timezone.utc) + timedelta(days=1)
+    for token, user_id in tokens:
+        cache.put(token, expires_at, user_id, {"id": user_id})
+    return cache
+
+
+def test_hit_after_put_and_miss_after_invalidation():
+    cache = cache_with([("token-a", "user-1")])
+    assert cache.get("token-a").user_id == "user-1"
+    cache.invalidate_token("token-a")
+    assert cache.get("token-a") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_invalidation_by_hash_from_another_worker():
+    cache = cache_with([("token-a", "user-1"), ("token-b", "user-1")])
+    cache.invalidate_token_hash(hash_token("token-a"))
+    assert cache.get("token-a") is None
+    assert cache.get("token-b") is not None
+
+
+def test_invalidate_nearish_user_drops_every_device():
+    cache = cache_with([("token-a", "user-1"), ("token-b", "user-1"), ("token-c", "user-2")])
+    cache.set_nearish_user_id("user-1", "nearish-1")
+    cache.invalidate_nearish_user("nearish-1")
+    assert cache.get("token-a") is None and cache.get("token-b") is None
+    assert cache.get("token-c") is not None
+
+
+def test_entries_expire_with_the_session_and_the_ttl():
+    cache = AuthCache(max_entries=10, ttl_seconds=60)
+    cache.put("expired", datetime.now(timezone.utc) - timedelta(seconds=1), "user-1", {})
+    assert cache.get("expired") is None
+
+    cache = cache_with([("token-a", "user-1")], ttl_seconds=0)
+    assert cache.get("token-a") is None
+
+
+def test_broadcast_runs_the_control_handler():
+    cache = cache_with([("token-a", "user-1")])
+
+    async def scenario():
+        manager = ConnectionManager()
+        await manager.start()
+        manager.on_control("auth_invalidate", lambda data: [cache.invalidate_token_hash(k) for k in data["tokens"]])
+        await manager.broadcast("auth_invalidate", {"tokens": [hash_token("token-a")]})
+        # Unknown kinds and failing handlers are logged, not raised to the publisher
+        await manager.broadcast("unknown", {})
+        manager.on_control("broken", lambda data: data["missing"])
+        await manager.broadcast("broken", {})
+
+    asyncio.run(scenario())
+    assert cache.get("token-a") is None
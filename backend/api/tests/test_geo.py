@@ -0,0 +1,69 @@
+import math
+import random
+
+from geo import covering_cells, geohash_encode, radius_boxes, split_at_antimeridian
+from proximity import EARTH_RADIUS_MILES
+
+
+def destination(latitude, longitude, bearing, miles):
+    """Point reached going `miles` from (latitude, longitude) on `bearing` degrees."""
+    d = miles / EARTH_RADIUS_MILES
+    phi1, lambda1, theta = math.radians(latitude), math.radians(longitude), math.radians(bearing)
+    phi2 = math.asin(math.sin(phi1) * math.cos(d) + math.cos(phi1) * math.sin(d) * math.cos(theta))
+    lambda2 = lambda1 + math.atan2(math.sin(theta) * math.sin(d) * math.cos(phi1),
+                                   math.cos(d) - math.sin(phi1) * math.sin(phi2))
+    return math.degrees(phi2), (math.degrees(lambda2) + 540) % 360 - 180
+
+
+def in_boxes(boxes, latitude, longitude):
+    return any(min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon
+               for min_lat, min_lon, max_lat, max_lon in boxes)
+
+
+def assert_circle_covered(latitude, longitude, miles):
+    boxes = radius_boxes(latitude, longitude, miles)
+    for box in boxes:
+        assert -90 <= box[0] <= box[2] <= 90 and -180 <= box[1] <= box[3] <= 180
+    for bearing in range(0, 360, 2):
+        for fraction in (0.5, 0.999):
+            point = destination(latitude, longitude, bearing, miles * fraction)
+            assert in_boxes(boxes, *point), (latitude, longitude, miles, bearing, point, boxes)
+    return boxes
+
+
+def test_radius_boxes_cover_circle_at_high_latitude():
+    for latitude in (60, 80, -80, 85):
+        boxes = assert_circle_covered(latitude, 10.0, 500)
+        assert len(boxes) == 1
+
+    # The widest point of a 500 mile circle at 80° is ~46.5° of longitude away, not r / (69 cos 80°)
+    (_, min_lon, _, max_lon), = radius_boxes(80, 0, 500)
+    assert 46.4 < max_lon < 46.7 and min_lon == -max_lon
+
+
+def test_radius_boxes_covering_a_pole_take_every_longitude():
+    boxes = assert_circle_covered(89, 120, 200)
+    assert boxes == [(boxes[0][0], -180.0, 90.0, 180.0)]
+
+
+def test_radius_boxes_split_at_antimeridian():
+    for longitude in (179.9, -179.9, 178.5):
+        boxes = assert_circle_covered(-17.0, longitude, 150)
+        assert len(boxes) == 2
+
+
+def test_split_at_antimeridian():
+    assert split_at_antimeridian(0, 170, 10, -170) == [(0, 170, 10, 180.0), (0, -180.0, 10, -170)]
+    assert split_at_antimeridian(0, 190, 10, 200) == [(0, -170, 10, -160)]
+    assert split_at_antimeridian(0, -10, 10, 10) == [(0, -10, 10, 10)]
+
+
+def test_covering_cells_contain_every_point_in_box():
+    rng = random.Random(7)
+    for _ in range(200):
+        lat1, lat2 = sorted(rng.uniform(-89, 89) for _ in range(2))
+        lon1, lon2 = sorted(rng.uniform(-179, 179) for _ in range(2))
+        cells = covering_cells(lat1, lon1, lat2, lon2)
+        for _ in range(20):
+            point_hash = geohash_encode(rng.uniform(lat1, lat2), rng.uniform(lon1, lon2))
+            assert any(point_hash.startswith(cell) for cell in cells)
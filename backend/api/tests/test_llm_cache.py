@@ -0,0 +1,57 @@
+import pytest
+
+from llm_cache import LLMCache, cache_key
+
+MESSAGES = [{"role": "user", "content": "Generate 10 items"}]
+
+
+def make_cache(tmp_path, mode, max_mb=64.0):
+    return LLMCache(path=str(tmp_path / "cache.sqlite3"), mode=mode, max_mb=max_mb)
+
+
+def test_key_depends_on_every_parameter():
+    base = cache_key("model", MESSAGES, {"temperature": 0.7, "batch": 0})
+    assert base == cache_key("model", list(MESSAGES), {"batch": 0, "temperature": 0.7})
+    assert base != cache_key("model", MESSAGES, {"temperature": 0.7, "batch": 1})
+    assert base != cache_key("other", MESSAGES, {"temperature": 0.7, "batch": 0})
+
+
+def test_on_mode_serves_what_it_stored(tmp_path):
+    cache = make_cache(tmp_path, "on")
+    assert cache.get("k") is None
+    cache.put("k", "model", '["a"]')
+    assert cache.get("k") == '["a"]'
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_record_then_replay_across_instances(tmp_path):
+    make_cache(tmp_path, "record").put("k", "model", '["a"]')
+    replay = make_cache(tmp_path, "replay")
+    assert replay.get("k") == '["a"]'
+    # Replay never writes
+    replay.put("other", "model", '["b"]')
+    assert replay.get("other") is None
+
+
+def test_off_mode_neither_reads_nor_writes(tmp_path):
+    cache = make_cache(tmp_path, "off")
+    cache.put("k", "model", '["a"]')
+    assert cache.get("k") is None
+    assert not (tmp_path / "cache.sqlite3").exists()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    # Room for about three 1 KB entries
+    cache = make_cache(tmp_path, "on", max_mb=3.5 / 1024)
+    for key in ("a", "b", "c"):
+        cache.put(key, "model", "x" * 1024)
+    cache.get("a")
+    cache.put("d", "model", "x" * 1024)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("d") is not None
+    assert cache.stats()["evictions"] >= 1
+
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        make_cache(tmp_path, "sometimes")
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+
+from location_buffer import LocationBuffer, LocationPushTracker
+
+NOW = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+
+
+def test_only_the_latest_ping_per_user_is_flushed():
+    buffer = LocationBuffer()
+    buffer.record("u1", 1.0, 1.0, NOW)
+    buffer.record("u1", 2.0, 2.0, NOW + timedelta(seconds=1))
+    buffer.record("u2", 3.0, 3.0, NOW)
+
+    batch = buffer.drain()
+    assert batch == {"u1": (2.0, 2.0, NOW + timedelta(seconds=1)), "u2": (3.0, 3.0, NOW)}
+    assert buffer.drain() == {}
+    # Every ping still goes to the history table
+    assert [point[0] for point in buffer.drain_history()] == ["u1", "u1", "u2"]
+
+
+def test_flushed_entries_stop_being_served_unless_superseded():
+    buffer = LocationBuffer()
+    buffer.record("u1", 1.0, 1.0, NOW)
+    buffer.record("u2", 2.0, 2.0, NOW)
+    batch = buffer.drain()
+    # u2 moves while the batch is being written
+    buffer.record("u2", 5.0, 5.0, NOW + timedelta(seconds=1))
+    buffer.flushed(batch)
+
+    assert buffer.get("u1") is None
+    assert buffer.get("u2") == (5.0, 5.0, NOW + timedelta(seconds=1))
+    assert buffer.drain() == {"u2": (5.0, 5.0, NOW + timedelta(seconds=1))}
+
+
+def test_failed_flush_is_retried_with_the_newest_location():
+    buffer = LocationBuffer()
+    buffer.record("u1", 1.0, 1.0, NOW)
+    batch = buffer.drain()
+    buffer.record("u1", 2.0, 2.0, NOW + timedelta(seconds=1))
+    buffer.restore(batch)
+    assert buffer.drain() == {"u1": (2.0, 2.0, NOW + timedelta(seconds=1))}
+
+
+def test_failed_history_insert_keeps_arrival_order():
+    buffer = LocationBuffer()
+    buffer.record("u1", 1.0, 1.0, NOW)
+    points = buffer.drain_history()
+    buffer.record("u1", 2.0, 2.0, NOW + timedelta(seconds=1))
+    buffer.restore_history(points)
+    assert [point[1] for point in buffer.drain_history()] == [1.0, 2.0]
+
+
+def test_push_tracker_forgets_least_recently_pushed_users():
+    tracker = LocationPushTracker(max_users=2)
+    tracker.mark("u1", 1.0, 1.0, "nearby")
+    tracker.mark("u2", 2.0, 2.0, "nearby")
+    tracker.mark("u1", 1.5, 1.5, "with_you")
+    tracker.mark("u3", 3.0, 3.0, "far")
+    assert tracker.last("u2") is None
+    assert tracker.last("u1") == (1.5, 1.5, "with_you")
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import Column, DateTime, MetaData, String, Table, create_engine, select
+
+from memory_cursor import after_cursor, decode_cursor, encode_cursor, page_order
+
+metadata = MetaData()
+memories = Table(
+    "memory", metadata,
+    Column("id", String, primary_key=True),
+    Column("date", DateTime, nullable=True),
+)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    start = datetime(2026, 1, 1)
+    rows = [{"id": f"m{i:02d}", "date": None if i % 4 == 0 else start + timedelta(days=i % 5)} for i in range(20)]
+    with engine.begin() as conn:
+        conn.execute(memories.insert(), rows)
+    with engine.connect() as conn:
+        yield conn
+
+
+def pages(conn, limit):
+    cursor, seen = None, []
+    while True:
+        query = select(memories.c.date, memories.c.id)
+        if cursor:
+            query = query.where(after_cursor(memories.c.date, memories.c.id, decode_cursor(cursor)))
+        rows = conn.execute(query.order_by(*page_order(memories.c.date, memories.c.id)).limit(limit + 1)).all()
+        seen.append([row.id for row in rows[:limit]])
+        if len(rows) <= limit:
+            return seen
+        # Round trip through the client like the API does
+        cursor = encode_cursor(rows[limit - 1].date, rows[limit - 1].id)
+
+
+@pytest.mark.parametrize("limit", [1, 3, 5, 7])
+def test_paging_covers_every_memory_once_in_feed_order(db, limit):
+    everything = [row.id for row in db.execute(
+        select(memories.c.id).order_by(*page_order(memories.c.date, memories.c.id))
+    )]
+    paged = [memory_id for page in pages(db, limit) for memory_id in page]
+    assert paged == everything
+    assert len(everything) == 20
+
+
+def test_undated_memories_come_first(db):
+    first_page = pages(db, 5)[0]
+    assert first_page == ["m16", "m12", "m08", "m04", "m00"]
+
+
+def test_cursor_round_trips_with_and_without_a_date():
+    date = datetime(2026, 3, 14, 15, 9, 26)
+    assert decode_cursor(encode_cursor(date, "m1")) == (date, "m1")
+    assert decode_cursor(encode_cursor(None, "m1")) == (None, "m1")
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "WzEsMl0=", "bnVsbA==", encode_cursor(None, "m1")[:-4]])
+def test_malformed_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
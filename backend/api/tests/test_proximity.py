@@ -0,0 +1,45 @@
+import math
+
+import numpy as np
+
+from proximity import EARTH_RADIUS_MILES, count_meetings, haversine_many, sample_on_grid, together_stats
+
+
+def test_haversine_matches_known_distances_and_propagates_nan():
+    # One degree of latitude, and a quarter of the way round the equator
+    distances = haversine_many([0.0, 0.0, np.nan], [0.0, 0.0, 0.0], [1.0, 0.0, 1.0], [0.0, 90.0, 0.0])
+    assert math.isclose(distances[0], EARTH_RADIUS_MILES * math.pi / 180, rel_tol=1e-9)
+    assert math.isclose(distances[1], EARTH_RADIUS_MILES * math.pi / 2, rel_tol=1e-9)
+    assert math.isnan(distances[2])
+
+
+def test_sample_on_grid_holds_the_last_point_until_it_is_too_old():
+    lats, lons = sample_on_grid([10, 20], [1.0, 2.0], [5.0, 6.0], grid=[5, 10, 15, 20, 40], max_age=15)
+    np.testing.assert_array_equal(lats, [np.nan, 1.0, 1.0, 2.0, np.nan])
+    np.testing.assert_array_equal(lons, [np.nan, 5.0, 5.0, 6.0, np.nan])
+
+
+def test_sample_on_grid_with_no_points_is_all_gaps():
+    lats, lons = sample_on_grid([], [], [], grid=[1, 2], max_age=10)
+    assert np.isnan(lats).all() and np.isnan(lons).all()
+
+
+def test_short_gaps_do_not_count_as_meeting_again():
+    together = [True, True, False, True, False, False, False, True]
+    assert count_meetings(together, min_gap_steps=3) == 2
+    assert count_meetings([], min_gap_steps=3) == 0
+
+
+def test_together_stats_buckets_minutes_and_skips_unknown_samples():
+    stats = together_stats([0.1, 0.2, 2.0, 50.0, np.nan], step_seconds=60, meeting_min_gap_seconds=60)
+    assert stats["togetherMinutes"] == 2.0
+    assert stats["nearbyMinutes"] == 1.0
+    assert stats["apartMinutes"] == 1.0
+    assert stats["unknownMinutes"] == 1.0
+    assert stats["timesMet"] == 1
+    assert stats["distanceMiles"]["min"] == 0.1 and stats["distanceMiles"]["max"] == 50.0
+
+
+def test_together_stats_with_no_known_distance():
+    stats = together_stats([np.nan, np.nan], step_seconds=300)
+    assert stats["distanceMiles"] is None and stats["unknownMinutes"] == 10.0
@@ -0,0 +1,73 @@
+import json
+import uuid
+
+from sqlalchemy import Column, Index, MetaData, String, Table, Text, func
+from sqlalchemy.dialects import postgresql
+
+from question_store import QUESTION_TEXT_INDEXES, insert_question_texts
+
+metadata = MetaData()
+questions = Table(
+    "questions", metadata,
+    Column("id", String, primary_key=True, default=lambda: str(uuid.uuid4())),
+    Column("category_id", String),
+    Column("text", Text),
+)
+Index("uq_questions_category_text", questions.c.category_id, func.md5(questions.c.text), unique=True)
+
+
+class RecordingSession:
+    """Stands in for a Session: keeps the statement and returns one id per inserted row."""
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, stmt):
+        self.statements.append(stmt)
+        rows = stmt.compile(dialect=postgresql.dialect()).params
+        return Result([f"id-{i}" for i in range(len([key for key in rows if key.startswith("text")]))])
+
+
+class Result:
+    def __init__(self, ids):
+        self.ids = ids
+
+    def scalars(self):
+        return iter(self.ids)
+
+
+def insert(items):
+    db = RecordingSession()
+    ids = insert_question_texts(db, questions.c.category_id, questions.c.text, "deep-talks", items)
+    return db, ids
+
+
+def test_repeats_and_blanks_in_a_batch_are_sent_once():
+    db, ids = insert(["  What makes you laugh? ", "What makes you laugh?", "", "   ", "Where next?"])
+    params = db.statements[0].compile(dialect=postgresql.dialect()).params
+    texts = [value for key, value in sorted(params.items()) if key.startswith("text")]
+    assert texts == ["What makes you laugh?", "Where next?"]
+    assert set(value for key, value in params.items() if key.startswith("category_id")) == {"deep-talks"}
+    assert len(ids) == 2
+
+
+def test_structured_items_are_stored_as_json():
+    item = {"question": "Pick one", "options": ["a", "b"]}
+    db, _ = insert([item, dict(item)])
+    params = db.statements[0].compile(dialect=postgresql.dialect()).params
+    assert [value for key, value in params.items() if key.startswith("text")] == [json.dumps(item)]
+
+
+def test_empty_batch_does_not_touch_the_database():
+    db, ids = insert(["", "  "])
+    assert ids == [] and db.statements == []
+
+
+def test_conflict_target_matches_the_unique_index():
+    # Postgres only accepts ON CONFLICT (cols) when a unique index has exactly those expressions
+    db, _ = insert(["Where next?"])
+    sql = str(db.statements[0].compile(dialect=postgresql.dialect()))
+    index = next(iter(questions.indexes))
+    assert "ON CONFLICT (category_id, md5(text)) DO NOTHING RETURNING questions.id" in sql
+    assert str(index.expressions[1].compile(dialect=postgresql.dialect())) == "md5(questions.text)"
+    assert QUESTION_TEXT_INDEXES[index.name][:3] == ("questions", "category_id", "text")
@@ -0,0 +1,29 @@
+from datetime import timezone
+
+import pytest
+from pydantic import ValidationError
+
+from schemas import FinalizeMemoryRequest
+
+
+def test_finalize_memory_request_parses_valid_body():
+    body = FinalizeMemoryRequest(title="Picnic", date="2024-05-01T12:00:00Z", latitude="40.7", longitude=-73.9)
+    assert body.date.tzinfo is not None and body.date.utcoffset() == timezone.utc.utcoffset(None)
+    assert body.latitude == 40.7 and body.imageKey is None
+
+
+@pytest.mark.parametrize("changes", [
+    {"title": ""},
+    {"title": None},
+    {"date": "yesterday"},
+    {"date": None},
+    {"latitude": 91},
+    {"latitude": "north"},
+    {"longitude": -180.5},
+    {"longitude": [1, 2]},
+])
+def test_finalize_memory_request_rejects_bad_input(changes):
+    body = {"title": "Picnic", "date": "2024-05-01T12:00:00Z", "latitude": 40.7, "longitude": -73.9}
+    body.update(changes)
+    with pytest.raises(ValidationError):
+        FinalizeMemoryRequest(**body)
@@ -0,0 +1,185 @@
+import asyncio
+import re
+
+import sse_manager
+from sse_manager import IDLE, ConnectionManager
+
+
+def frame_ids(frames):
+    return [int(re.match(rb"id: (\d+)\n", frame).group(1)) for frame in frames]
+
+
+async def drain(connection):
+    frames = []
+    while True:
+        frame = await connection.get(timeout=0)
+        if frame is IDLE:
+            return frames
+        frames.append(frame)
+
+
+def test_coalesced_frames_are_delivered_in_event_id_order():
+    async def scenario():
+        manager = ConnectionManager()
+        await manager.start()
+        connection = await manager.connect("u1")
+        await manager.send_event("u1", "partner_status_update", {"status": 1})
+        await manager.send_event("u1", "nudge", {})
+        # Supersedes the first status update, which was queued before the nudge
+        await manager.send_event("u1", "partner_status_update", {"status": 2})
+        await manager.send_event("u1", "nudge", {})
+        return await drain(connection)
+
+    frames = asyncio.run(scenario())
+    ids = frame_ids(frames)
+    assert len(frames) == 3
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    assert b'"status": 2' in frames[1]
+
+
+def new_manager():
+    manager = ConnectionManager()
+    asyncio.run(manager.start())
+    return manager
+
+
+def resume(manager, user_id, last_event_id):
+    async def scenario():
+        connection = await manager.connect(user_id, last_event_id)
+        return await drain(connection)
+    return asyncio.run(scenario())
+
+
+def send(manager, user_id, count):
+    async def scenario():
+        for n in range(count):
+            await manager.send_event(user_id, "nudge", {"n": n})
+    asyncio.run(scenario())
+
+
+def test_resume_after_restart_asks_client_to_resync():
+    frames = resume(new_manager(), "u1", 123)
+    assert len(frames) == 1 and frames[0].startswith(b"event: resync")
+
+
+def test_resume_with_id_older_than_rebuilt_buffer_asks_client_to_resync():
+    manager = new_manager()
+    manager.replay.max_users = 1
+    send(manager, "u1", 2)
+    first_id = manager.backend._last_event_id - 1
+    # u2's events push u1's buffer out; u1's next event starts a new one
+    send(manager, "u2", 1)
+    send(manager, "u1", 1)
+
+    frames = resume(manager, "u1", first_id)
+    assert frames[0].startswith(b"event: resync")
+    assert len(frames) == 2
+
+
+def test_resume_after_size_eviction_asks_client_to_resync():
+    manager = new_manager()
+    manager.replay.max_events = 2
+    send(manager, "u1", 1)
+    seen = manager.backend._last_event_id
+    send(manager, "u1", 3)
+
+    frames = resume(manager, "u1", seen)
+    assert frames[0].startswith(b"event: resync")
+    assert len(frames) == 3
+
+
+def test_resume_without_gap_replays_only_missed_events():
+    manager = new_manager()
+    send(manager, "u1", 2)
+    seen = manager.backend._last_event_id
+    send(manager, "u1", 2)
+
+    frames = resume(manager, "u1", seen)
+    assert len(frames) == 2
+    assert all(frame.startswith(b"id: ") for frame in frames)
+    assert frame_ids(frames) == sorted(frame_ids(frames)) and frame_ids(frames)[0] > seen
+
+
+def test_resume_follows_delivery_order_not_id_order():
+    # Ids from different publishers needn't arrive in numeric order; the client saw them as delivered
+    manager = new_manager()
+
+    async def deliver(*event_ids):
+        for event_id in event_ids:
+            await manager._deliver_local("u1", "nudge", {"id": event_id}, event_id)
+
+    asyncio.run(deliver(500, 300, 700))
+    frames = resume(manager, "u1", 500)
+    assert frame_ids(frames) == [300, 700]
+
+
+def test_lost_events_ask_open_and_resuming_streams_to_resync():
+    manager = new_manager()
+    send(manager, "u1", 1)
+    seen = manager.backend._last_event_id
+
+    async def scenario():
+        connection = await manager.connect("u1")
+        manager._events_lost()
+        return await drain(connection)
+
+    frames = asyncio.run(scenario())
+    assert len(frames) == 1 and frames[0].startswith(b"event: resync")
+    # The buffered history may be missing events too, so resuming from it isn't trusted either
+    frames = resume(manager, "u1", seen)
+    assert frames[0].startswith(b"event: resync")
+
+
+class FakeRequest:
+    """Just the ASGI receive channel; set `gone` to deliver http.disconnect."""
+
+    def __init__(self):
+        self.gone = asyncio.Event()
+
+    async def receive(self):
+        await self.gone.wait()
+        return {"type": "http.disconnect"}
+
+
+def test_stream_ends_as_soon_as_the_client_disconnects(monkeypatch):
+    # Far longer than the test may take: the stream must not wait for a heartbeat to notice
+    monkeypatch.setattr(sse_manager, "SSE_HEARTBEAT_SECONDS", 60)
+
+    async def scenario():
+        manager = ConnectionManager()
+        await manager.start()
+        connection = await manager.connect("u1")
+        request = FakeRequest()
+        stream = manager.stream(connection, request)
+
+        await manager.send_event("u1", "nudge", {})
+        frame = await asyncio.wait_for(stream.__anext__(), 1)
+        next_frame = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        request.gone.set()
+        try:
+            await asyncio.wait_for(next_frame, 1)
+        except StopAsyncIteration:
+            pass
+        return frame, manager.active_connections
+
+    frame, active = asyncio.run(scenario())
+    assert frame.startswith(b"id: ")
+    assert active == {}
+
+
+def test_stream_sends_heartbeats_while_idle(monkeypatch):
+    monkeypatch.setattr(sse_manager, "SSE_HEARTBEAT_SECONDS", 0.01)
+
+    async def scenario():
+        manager = ConnectionManager()
+        await manager.start()
+        connection = await manager.connect("u1")
+        stream = manager.stream(connection, FakeRequest())
+        frame = await asyncio.wait_for(stream.__anext__(), 1)
+        await stream.aclose()
+        return frame, manager.active_connections
+
+    frame, active = asyncio.run(scenario())
+    assert frame == sse_manager.SSE_HEARTBEAT_FRAME
+    assert active == {}
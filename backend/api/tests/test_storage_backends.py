@@ -0,0 +1,39 @@
+import io
+
+import pytest
+
+from storage_backends import LocalStorage, is_valid_key
+
+
+@pytest.mark.parametrize("key", [
+    "user-1/../user-2/photo.webp",
+    "user-1/./photo.webp",
+    "user-1//photo.webp",
+    "/user-1/photo.webp",
+    "user-1/..",
+    "user-1\\..\\user-2\\photo.webp",
+    "",
+])
+def test_keys_that_could_leave_their_prefix_are_invalid(key):
+    assert not is_valid_key(key)
+
+
+def test_normal_keys_are_valid():
+    assert is_valid_key("user-1/memories/2f1c.webp")
+    assert is_valid_key("user-1/memories/2f1c..thumb.webp")
+
+
+def test_local_storage_rejects_a_key_into_another_users_directory(tmp_path):
+    storage = LocalStorage(str(tmp_path), "http://localhost:8000", secret="test")
+    storage.upload(io.BytesIO(b"theirs"), "user-2/photo.webp")
+
+    key = "user-1/../user-2/photo.webp"
+    # Passes a naive ownership check for user-1...
+    assert key.startswith("user-1/")
+    # ...but no operation follows it out of user-1/
+    with pytest.raises(ValueError):
+        storage.download(key)
+    with pytest.raises(ValueError):
+        storage.head(key)
+    assert key in storage.delete_many([key])
+    assert storage.download("user-2/photo.webp") == b"theirs"
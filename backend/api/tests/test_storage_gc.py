@@ -0,0 +1,19 @@
+import storage_gc
+from storage_gc import STORAGE_GC_MAX_BACKOFF_SECONDS, retry_delay_seconds
+
+
+def test_retry_delay_grows_then_caps():
+    delays = [retry_delay_seconds(attempts) for attempts in range(1, 12)]
+    assert delays == sorted(delays)
+    assert delays[-1] == STORAGE_GC_MAX_BACKOFF_SECONDS
+
+
+def test_retry_delay_gives_up_after_max_attempts():
+    assert retry_delay_seconds(storage_gc.STORAGE_GC_MAX_ATTEMPTS - 1) is not None
+    assert retry_delay_seconds(storage_gc.STORAGE_GC_MAX_ATTEMPTS) is None
+
+
+def test_retry_delay_does_not_overflow(monkeypatch):
+    # Rows from before the attempt limit may already have huge attempt counts
+    monkeypatch.setattr(storage_gc, "STORAGE_GC_MAX_ATTEMPTS", 10 ** 6)
+    assert retry_delay_seconds(5000) == STORAGE_GC_MAX_BACKOFF_SECONDS